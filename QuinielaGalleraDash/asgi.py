@@ -0,0 +1,28 @@
+"""
+ASGI config for QuinielaGalleraDash project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django as usual and WebSocket connections to the
+Channels consumers in accounts.routing.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'QuinielaGalleraDash.settings')
+
+# Initialize Django before importing consumers that use the ORM
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from accounts.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': URLRouter(websocket_urlpatterns),
+})
@@ -0,0 +1,52 @@
+import functools
+import logging
+import random
+import sqlite3
+import time
+
+from django.db import OperationalError, connection
+
+logger = logging.getLogger('eventos')
+
+LOCK_ERRORS = (OperationalError, sqlite3.OperationalError)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_locked(attempts=5, base_delay=0.05, max_delay=1.0, in_transaction=None):
+    """
+    Retry a function that runs its own write transaction when SQLite reports
+    "database is locked", with exponential backoff and jitter.
+
+    The busy_timeout already waits for the lock; this covers the spikes
+    where the wait runs out. A call made inside an outer transaction is not
+    retried, since only the outermost transaction can be safely run again.
+    in_transaction tells whether such an outer transaction is open; it
+    defaults to checking Django's default connection.
+
+    The on_commit callbacks of the function's transaction run inside the
+    call, after the commit; they must be registered with robust=True, or a
+    lock error raised by one would run the committed transaction again.
+    """
+    if in_transaction is None:
+        def in_transaction():
+            return connection.in_atomic_block
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except LOCK_ERRORS as e:
+                    if not is_lock_error(e) or attempt == attempts or in_transaction():
+                        raise
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.5)
+                    logger.warning(f"{func.__name__}: database locked, retry {attempt} in {delay:.3f}s")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
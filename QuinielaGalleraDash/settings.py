@@ -41,12 +41,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'dashboard',
     'rest_framework',
+    'channels',
     'accounts',
     'eventos',
     'authapp',
 ]
 
 WSGI_APPLICATION = 'QuinielaGalleraDash.wsgi.application'
+ASGI_APPLICATION = 'QuinielaGalleraDash.asgi.application'
 
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/eventos/'
@@ -91,6 +93,74 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Run on every new connection. WAL lets readers work while a
+            # write is in progress; NORMAL sync is durable across app
+            # crashes in WAL mode; busy_timeout makes a writer wait for the
+            # lock instead of failing with "database is locked".
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=134217728;'  # 128 MB
+                'PRAGMA cache_size=-20000;'    # ~20 MB
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Take the write lock at BEGIN. A deferred transaction that reads
+            # first and then writes can't wait for the lock and fails at once.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file-backed test database (instead of in-memory) lets the
+        # concurrency tests open one connection per thread.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# PostgreSQL for event nights with many concurrent writers: DB_ENGINE=postgresql
+# plus the POSTGRES_* variables. Connections come from a psycopg pool that
+# stays open for the life of the worker (CONN_MAX_AGE must stay 0 with a pool).
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'quiniela'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 20)),
+                'timeout': 10,
+            },
+        },
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# File-based so every web worker on the host shares the same snapshots and
+# version counters (a per-process LocMemCache would serve stale data).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
+
+
+# Channels
+# https://channels.readthedocs.io/en/stable/topics/channel_layers.html
+# The in-memory layer only reaches clients connected to the same process,
+# which is enough for single-node deployments and tests. Multi-node setups
+# should switch to channels_redis.RedisChannelLayer.
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
     }
 }
 
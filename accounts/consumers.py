@@ -1,18 +1,73 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from eventos.realtime import evento_group
+
+
 class TicketConsumer(AsyncWebsocketConsumer):
+    """
+    Event channel for the mobile app.
+
+    Clients subscribe to one or more events, either by connecting to
+    ws/eventos/<evento_id>/ or by sending {"action": "subscribe", "event_id": N},
+    and then receive the compact updates broadcast by eventos.realtime
+    (fight results, rank changes, visibility flags).
+    """
+
     async def connect(self):
+        self.subscriptions = set()
         # Accept the WebSocket connection
         await self.accept()
 
+        evento_id = self.scope.get('url_route', {}).get('kwargs', {}).get('evento_id')
+        if evento_id is not None:
+            await self.subscribe(evento_id)
+
     async def disconnect(self, close_code):
-        # Handle WebSocket disconnection
-        pass
+        # Leave every event group on disconnection
+        for group in self.subscriptions:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.subscriptions.clear()
+
+    async def subscribe(self, evento_id):
+        group = evento_group(evento_id)
+        if group not in self.subscriptions:
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.subscriptions.add(group)
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'event_id': evento_id}))
+
+    async def unsubscribe(self, evento_id):
+        group = evento_group(evento_id)
+        if group in self.subscriptions:
+            await self.channel_layer.group_discard(group, self.channel_name)
+            self.subscriptions.discard(group)
+        await self.send(text_data=json.dumps({'type': 'unsubscribed', 'event_id': evento_id}))
 
     async def receive(self, text_data):
         # Handle messages received from WebSocket
-        data = json.loads(text_data)
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({'error': 'JSON inválido'}))
+            return
+
+        action = data.get('action')
+        if action in ('subscribe', 'unsubscribe'):
+            try:
+                evento_id = int(data.get('event_id'))
+            except (TypeError, ValueError):
+                await self.send(text_data=json.dumps({'error': 'event_id inválido'}))
+                return
+            if action == 'subscribe':
+                await self.subscribe(evento_id)
+            else:
+                await self.unsubscribe(evento_id)
+            return
+
         message = data.get('message', 'No message sent')
         # Echo the message back
         await self.send(text_data=json.dumps({'message': f"Received: {message}"}))
+
+    async def evento_update(self, event):
+        # Group message sent by eventos.realtime.publish_event_update
+        await self.send(text_data=json.dumps(event['payload']))
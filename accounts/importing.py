@@ -0,0 +1,154 @@
+import csv
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from .models import CustomUser
+
+logger = logging.getLogger('accounts')
+
+IMPORT_FIELDS = (
+    'user_id', 'password', 'nombre', 'apellido', 'email',
+    'fecha_nacimiento', 'numero_celular', 'direccion',
+)
+REQUIRED_FIELDS = ('user_id', 'password')
+
+# Below this many passwords the pool start-up costs more than it saves
+PARALLEL_HASH_THRESHOLD = 8
+
+
+# ============================================================================
+# CSV PARSING
+# ============================================================================
+
+def read_user_rows(text):
+    """
+    Parse a users CSV (header row with IMPORT_FIELDS column names).
+    Returns (rows, errors): rows are (line_number, fields) pairs, errors are
+    (line_number, message) pairs for rows that cannot be imported.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    header = [name.strip() for name in (reader.fieldnames or [])]
+    missing = [field for field in REQUIRED_FIELDS if field not in header]
+    if missing:
+        return [], [(1, f"Faltan columnas obligatorias: {', '.join(missing)}")]
+    reader.fieldnames = header
+
+    rows, errors = [], []
+    for line_number, raw in enumerate(reader, start=2):
+        fields = {
+            name: (raw.get(name) or '').strip() or None
+            for name in IMPORT_FIELDS
+        }
+        if not fields['user_id'] or not fields['password']:
+            errors.append((line_number, 'user_id y password son obligatorios'))
+            continue
+        if fields['fecha_nacimiento']:
+            try:
+                fields['fecha_nacimiento'] = parse_date(fields['fecha_nacimiento'])
+            except ValueError:
+                fields['fecha_nacimiento'] = None
+            if fields['fecha_nacimiento'] is None:
+                errors.append((line_number, 'fecha_nacimiento inválida (use AAAA-MM-DD)'))
+                continue
+        rows.append((line_number, fields))
+    return rows, errors
+
+
+# ============================================================================
+# PARALLEL PASSWORD HASHING
+# ============================================================================
+
+def _init_hash_worker():
+    # Workers started with "spawn" import nothing from the parent process
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords with the configured hasher, spread over a process pool.
+    PBKDF2 is CPU-bound, so threads would be serialized by the GIL.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+# ============================================================================
+# IMPORT
+# ============================================================================
+
+def _existing_user_ids(user_ids, batch_size):
+    existing = set()
+    for start in range(0, len(user_ids), batch_size):
+        existing.update(
+            CustomUser.objects.filter(user_id__in=user_ids[start:start + batch_size])
+            .values_list('user_id', flat=True)
+        )
+    return existing
+
+
+def import_users(rows, batch_size=500, workers=None, dry_run=False):
+    """
+    Create users from parsed CSV rows.
+
+    Duplicates are found with one `user_id__in` query per batch (existing
+    users) and a set (repeated ids inside the file); only new users get their
+    password hashed, then everything is inserted with bulk_create in a single
+    transaction. If some user_ids are created by someone else in between,
+    those are moved to `existing` and the rest is inserted once more; a
+    second IntegrityError is raised, with nothing created.
+
+    Returns a dict with created count, duplicated user_ids and skipped lines.
+    """
+    seen = set()
+    unique_rows, repeated = [], []
+    for line_number, fields in rows:
+        if fields['user_id'] in seen:
+            repeated.append((line_number, fields['user_id']))
+        else:
+            seen.add(fields['user_id'])
+            unique_rows.append((line_number, fields))
+
+    existing = _existing_user_ids([fields['user_id'] for _, fields in unique_rows], batch_size)
+    new_rows = [fields for _, fields in unique_rows if fields['user_id'] not in existing]
+
+    created = 0
+    if new_rows and not dry_run:
+        hashes = hash_passwords([fields['password'] for fields in new_rows], workers=workers)
+        users = [
+            CustomUser(**dict(fields, password=password_hash))
+            for fields, password_hash in zip(new_rows, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                created = len(CustomUser.objects.bulk_create(users, batch_size=batch_size))
+        except IntegrityError:
+            taken = _existing_user_ids([user.user_id for user in users], batch_size)
+            if not taken:
+                raise
+            logger.warning(f"{len(taken)} users were created during the import, skipping them")
+            existing |= taken
+            users = [user for user in users if user.user_id not in taken]
+            with transaction.atomic():
+                created = len(CustomUser.objects.bulk_create(users, batch_size=batch_size))
+        logger.info(f"Imported {created} users ({len(existing)} already existed)")
+
+    return {
+        'created': created,
+        'to_create': len(new_rows),
+        'existing': sorted(existing),
+        'repeated': repeated,
+    }
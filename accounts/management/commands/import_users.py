@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from accounts.importing import IMPORT_FIELDS, import_users, read_user_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuarios desde un CSV. Las contraseñas se procesan en paralelo "
+        f"y los usuarios se insertan por lotes. Columnas: {', '.join(IMPORT_FIELDS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Procesos para el hash de contraseñas (por defecto, todos los núcleos).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo valida el archivo y reporta duplicados, sin crear usuarios.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as csv_file:
+                text = csv_file.read()
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"No se pudo leer {options['csv_path']}: {e}")
+
+        rows, errors = read_user_rows(text)
+        for line_number, message in errors:
+            self.stdout.write(self.style.WARNING(f'  línea {line_number}: {message}'))
+
+        started = time.perf_counter()
+        try:
+            result = import_users(
+                rows,
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+            )
+        except IntegrityError as e:
+            raise CommandError(f'No se creó ningún usuario, otro proceso creó usuarios del archivo a la vez: {e}')
+        elapsed = time.perf_counter() - started
+
+        for line_number, user_id in result['repeated']:
+            self.stdout.write(self.style.WARNING(f'  línea {line_number}: {user_id} repetido en el archivo'))
+        if result['existing']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['existing'])} usuarios ya existen: {', '.join(result['existing'])}"
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(f"{result['to_create']} usuarios por crear (sin cambios, --dry-run)")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result['created']} usuarios creados en {elapsed:.2f}s"))
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# The search index as it was when this migration was written; it must not
+# follow later changes to accounts.search. See FtsIndex for how it works.
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS accounts_customuser_fts USING fts5("
+    "user_id, nombre, apellido, numero_celular, "
+    "content='accounts_customuser', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS accounts_customuser_fts_ai AFTER INSERT ON accounts_customuser BEGIN "
+    "INSERT INTO accounts_customuser_fts(rowid, user_id, nombre, apellido, numero_celular) "
+    "VALUES (new.id, new.user_id, new.nombre, new.apellido, new.numero_celular); END",
+    "CREATE TRIGGER IF NOT EXISTS accounts_customuser_fts_ad AFTER DELETE ON accounts_customuser BEGIN "
+    "INSERT INTO accounts_customuser_fts(accounts_customuser_fts, rowid, user_id, nombre, apellido, numero_celular) "
+    "VALUES ('delete', old.id, old.user_id, old.nombre, old.apellido, old.numero_celular); END",
+    "CREATE TRIGGER IF NOT EXISTS accounts_customuser_fts_au "
+    "AFTER UPDATE OF user_id, nombre, apellido, numero_celular ON accounts_customuser BEGIN "
+    "INSERT INTO accounts_customuser_fts(accounts_customuser_fts, rowid, user_id, nombre, apellido, numero_celular) "
+    "VALUES ('delete', old.id, old.user_id, old.nombre, old.apellido, old.numero_celular); "
+    "INSERT INTO accounts_customuser_fts(rowid, user_id, nombre, apellido, numero_celular) "
+    "VALUES (new.id, new.user_id, new.nombre, new.apellido, new.numero_celular); END",
+    "INSERT INTO accounts_customuser_fts(accounts_customuser_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS accounts_customuser_fts_ai",
+    "DROP TRIGGER IF EXISTS accounts_customuser_fts_ad",
+    "DROP TRIGGER IF EXISTS accounts_customuser_fts_au",
+    "DROP TABLE IF EXISTS accounts_customuser_fts",
+]
+
+TRIGRAM_INDEXES = {
+    'accounts_customuser_user_id_trgm': 'user_id',
+    'accounts_customuser_nombre_trgm': 'nombre',
+    'accounts_customuser_apellido_trgm': 'apellido',
+    'accounts_customuser_numero_celular_trgm': 'numero_celular',
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_INSTALL:
+                cursor.execute(sql)
+        elif vendor == 'postgresql':
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                # Server built without contrib: search still works, unindexed
+                return
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, column in TRIGRAM_INDEXES.items():
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON accounts_customuser '
+                    f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_UNINSTALL:
+                cursor.execute(sql)
+        elif vendor == 'postgresql':
+            for name in TRIGRAM_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_apitoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -52,3 +52,13 @@ class CustomUser(AbstractBaseUser):
 
     def has_module_perms(self, app_label):
         return self.is_superuser
+
+
+class ApiToken(models.Model):
+    """Revocable token issued at login for the mobile API."""
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='api_tokens')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.user_id} - {self.key[:8]}…"
@@ -0,0 +1,7 @@
+from django.urls import path
+from .consumers import TicketConsumer
+
+websocket_urlpatterns = [
+    path('ws/eventos/', TicketConsumer.as_asgi()),
+    path('ws/eventos/<int:evento_id>/', TicketConsumer.as_asgi()),
+]
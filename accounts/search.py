@@ -0,0 +1,235 @@
+import base64
+import json
+import logging
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import CustomUser
+
+logger = logging.getLogger('accounts')
+
+# The trigram tokenizer matches any substring of 3+ characters
+TRIGRAM_MIN_LENGTH = 3
+
+
+# ============================================================================
+# FULL-TEXT INDEX
+# ============================================================================
+
+class FtsIndex:
+    """
+    Trigram search index over some text columns of a model.
+
+    On SQLite it is an external-content FTS5 table kept in sync by triggers,
+    so it follows every write path (save, delete, bulk_create, queryset
+    update/delete). On PostgreSQL it is one pg_trgm GIN index per column,
+    built on the same UPPER(column) expression Django generates for
+    icontains, so `filter()` uses plain icontains lookups there (as it does
+    on SQLite for terms too short for trigrams).
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+
+    @property
+    def table(self):
+        return f'{self.model._meta.db_table}_fts'
+
+    @staticmethod
+    def supported(conn):
+        return conn.vendor == 'sqlite'
+
+    def _columns(self, prefix=''):
+        return ', '.join(f'{prefix}{self.model._meta.get_field(field).column}' for field in self.fields)
+
+    def _triggers(self):
+        source = self.model._meta.db_table
+        pk = self.model._meta.pk.column
+        columns = self._columns()
+        new_values = self._columns('new.')
+        old_values = self._columns('old.')
+        delete_old = (
+            f"INSERT INTO {self.table}({self.table}, rowid, {columns}) "
+            f"VALUES ('delete', old.{pk}, {old_values});"
+        )
+        insert_new = f"INSERT INTO {self.table}(rowid, {columns}) VALUES (new.{pk}, {new_values});"
+        return {
+            f'{self.table}_ai': f"AFTER INSERT ON {source} BEGIN {insert_new} END",
+            f'{self.table}_ad': f"AFTER DELETE ON {source} BEGIN {delete_old} END",
+            f'{self.table}_au': f"AFTER UPDATE OF {columns} ON {source} BEGIN {delete_old} {insert_new} END",
+        }
+
+    def _count_schema_objects(self, conn, names):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})",
+                list(names),
+            )
+            return cursor.fetchone()[0]
+
+    def _trigram_indexes(self):
+        source = self.model._meta.db_table
+        return {
+            f'{source}_{field}_trgm': self.model._meta.get_field(field).column
+            for field in self.fields
+        }
+
+    def install(self, conn):
+        """Create the FTS table and triggers (if missing) and index the existing rows."""
+        if conn.vendor == 'postgresql':
+            self._install_trigram_indexes(conn)
+            return
+        if not self.supported(conn):
+            return
+        source = self.model._meta.db_table
+        pk = self.model._meta.pk.column
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{self._columns()}, content='{source}', content_rowid='{pk}', tokenize='trigram')"
+            )
+            for name, body in self._triggers().items():
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def _install_trigram_indexes(self, conn):
+        source = self.model._meta.db_table
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                # Server built without contrib: search still works, unindexed
+                logger.warning(f"pg_trgm not available, {source} search is not indexed")
+                return
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, column in self._trigram_indexes().items():
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {source} '
+                    f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+                )
+
+    def uninstall(self, conn):
+        if conn.vendor == 'postgresql':
+            with conn.cursor() as cursor:
+                for name in self._trigram_indexes():
+                    cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            return
+        if not self.supported(conn):
+            return
+        with conn.cursor() as cursor:
+            for name in self._triggers():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def ensure_installed(self, conn):
+        """
+        Put back the triggers if a later migration dropped them: SQLite
+        rebuilds a table to alter it, which drops the table's triggers.
+        Does nothing if the index itself was never created.
+        """
+        if not self.supported(conn) or not self._count_schema_objects(conn, [self.table]):
+            return
+        if self._count_schema_objects(conn, list(self._triggers())) < len(self._triggers()):
+            self.install(conn)
+
+    def filter(self, queryset, query):
+        terms = query.split()
+        if not terms:
+            return queryset
+
+        if self.supported(connections[queryset.db]) and all(len(term) >= TRIGRAM_MIN_LENGTH for term in terms):
+            match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+            return queryset.filter(pk__in=RawSQL(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [match]
+            ))
+
+        return queryset.filter(reduce(
+            lambda combined, term: combined & term,
+            [
+                reduce(lambda a, b: a | b, [Q(**{f'{field}__icontains': term}) for field in self.fields])
+                for term in terms
+            ],
+        ))
+
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+# Pages are addressed by the sort key of the last row shown instead of an
+# OFFSET, so every page is an index range scan no matter how deep it is.
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _after_q(ordering, values):
+    """Rows strictly after `values` in `ordering` (lexicographic comparison)."""
+    conditions = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {ordering[j].lstrip('-'): values[j] for j in range(i)}
+        conditions.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+    return reduce(lambda a, b: a | b, conditions)
+
+
+def keyset_page(queryset, ordering, cursor=None, size=50):
+    """
+    One page of `queryset` sorted by `ordering` (which must be unique, e.g.
+    end with the pk). Returns (rows, next_cursor); next_cursor is None on
+    the last page.
+    """
+    ordering = tuple(ordering)
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(ordering):
+        try:
+            queryset = queryset.filter(_after_q(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            pass  # Tampered cursor: start from the first page
+
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor([
+        getattr(last, field.lstrip('-')) if not isinstance(last, dict) else last[field.lstrip('-')]
+        for field in ordering
+    ])
+
+
+# ============================================================================
+# USERS
+# ============================================================================
+
+USER_SEARCH_FIELDS = ('user_id', 'nombre', 'apellido', 'numero_celular')
+
+user_search_index = FtsIndex(CustomUser, USER_SEARCH_FIELDS)
+
+
+def search_users(query, cursor=None, size=50):
+    """Users matching `query` (all of its words), in registration order."""
+    users = CustomUser.objects.all()
+    if query:
+        users = user_search_index.filter(users, query)
+    return keyset_page(users, ('pk',), cursor=cursor, size=size)
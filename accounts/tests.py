@@ -1,3 +1,389 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from eventos import leaderboard
+from eventos.models import Evento, EventoUserResult, NombreEquipo, Pelea, Prediccion, Ronda
+from eventos.realtime import publish_event_update
+from .models import CustomUser
+from .importing import import_users, read_user_rows
+from .search import search_users
+from . import tokens
+from .models import ApiToken
+from .routing import websocket_urlpatterns
+from .tickets import (
+    STATUS_INSUFFICIENT, STATUS_NOT_FOUND, STATUS_OK, TicketBatchError, apply_ticket_deltas, parse_ticket_csv,
+)
+
+# Keep tests out of the shared file cache in BASE_DIR/cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UseTicketConcurrencyTests(TransactionTestCase):
+    """Parallel redemptions of the same account must never double-spend."""
+
+    PARALLEL_REQUESTS = 12
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Needs a file-backed test database to share between threads')
+        self.evento = Evento.objects.create(
+            nombre='Evento', fecha=datetime.date.today(), ubicacion='Arena', current=True
+        )
+
+    def _redeem_in_parallel(self, user_id):
+        start = threading.Barrier(self.PARALLEL_REQUESTS)
+        body = json.dumps({'user_id': user_id, 'event_id': self.evento.id})
+
+        def redeem(_):
+            try:
+                start.wait()
+                return Client().post('/api/accounts/use-ticket/', body, content_type='application/json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.PARALLEL_REQUESTS) as pool:
+            return list(pool.map(redeem, range(self.PARALLEL_REQUESTS)))
+
+    def test_single_ticket_is_spent_once(self):
+        user = CustomUser.objects.create(user_id='jugador1', event_tickets=1)
+
+        statuses = self._redeem_in_parallel(user.user_id)
+
+        self.assertEqual(statuses.count(200), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.event_tickets, 0)
+        self.assertEqual(EventoUserResult.objects.filter(user=user, evento=self.evento).count(), 1)
+
+    def test_one_participation_per_event_keeps_remaining_tickets(self):
+        user = CustomUser.objects.create(user_id='jugador2', event_tickets=5)
+
+        statuses = self._redeem_in_parallel(user.user_id)
+
+        self.assertEqual(statuses.count(200), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.event_tickets, 4)
+        self.assertEqual(EventoUserResult.objects.filter(user=user, evento=self.evento).count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UseTicketTests(TransactionTestCase):
+
+    def test_lock_error_after_the_commit_is_not_retried(self):
+        evento = Evento.objects.create(nombre='Evento', fecha=datetime.date.today(), ubicacion='Arena', current=True)
+        user = CustomUser.objects.create(user_id='jugador', event_tickets=2)
+        bump_version = leaderboard.bump_version
+        calls = []
+
+        def locked_once(name):
+            # The leaderboard update runs on commit
+            calls.append(name)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return bump_version(name)
+
+        with mock.patch.object(leaderboard, 'bump_version', locked_once), \
+                self.assertLogs('django.db.backends.base', 'ERROR'):
+            response = self.client.post(
+                reverse('accounts:use_ticket'), json.dumps({'user_id': 'jugador', 'event_id': evento.id}),
+                content_type='application/json',
+            )
+
+        self.assertEqual(response.json()['remaining_tickets'], 1)
+        self.assertEqual(EventoUserResult.objects.filter(user=user, evento=evento).count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UserSearchTests(TestCase):
+    """Indexed user search; runs against SQLite (FTS5) and PostgreSQL (pg_trgm)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                user_id=f'gallero{i:02}',
+                password='x',
+                nombre='José' if i % 2 else 'María',
+                apellido='Núñez',
+                numero_celular=f'809555{i:04}',
+            )
+            for i in range(30)
+        ])
+
+    def user_ids(self, query, **kwargs):
+        return [user.user_id for user in search_users(query, **kwargs)[0]]
+
+    def test_matches_any_indexed_column(self):
+        self.assertEqual(self.user_ids('gallero07'), ['gallero07'])
+        self.assertEqual(self.user_ids('5550012'), ['gallero12'])
+        self.assertEqual(len(self.user_ids('josé')), 15)
+
+    def test_all_words_must_match(self):
+        self.assertEqual(len(self.user_ids('MARÍA núñez')), 15)
+        self.assertEqual(self.user_ids('maría 5550003'), [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        self.assertEqual(self.user_ids('29'), ['gallero29'])
+
+    def test_index_follows_updates_and_deletes(self):
+        user = CustomUser.objects.get(user_id='gallero05')
+        user.nombre = 'Zacarías'
+        user.save()
+        self.assertEqual(self.user_ids('zacar'), ['gallero05'])
+        user.delete()
+        self.assertEqual(self.user_ids('zacar'), [])
+
+    def test_keyset_pages_cover_every_match_once(self):
+        seen = []
+        cursor = None
+        while True:
+            users, cursor = search_users('núñez', cursor=cursor, size=7)
+            seen += [user.user_id for user in users]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f'gallero{i:02}' for i in range(30)])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TicketBatchTests(TestCase):
+
+    def setUp(self):
+        CustomUser.objects.create(user_id='ana', password='x', event_tickets=1)
+        CustomUser.objects.create(user_id='beto', password='x', event_tickets=3)
+
+    def tickets(self, user_id):
+        return CustomUser.objects.values_list('event_tickets', flat=True).get(user_id=user_id)
+
+    def test_repeated_users_are_merged(self):
+        result = apply_ticket_deltas([('ana', 2), ('beto', 1), ('ana', 3)])
+        self.assertEqual(result, [
+            {'user_id': 'ana', 'delta': 5, 'status': STATUS_OK, 'event_tickets': 6},
+            {'user_id': 'beto', 'delta': 1, 'status': STATUS_OK, 'event_tickets': 4},
+        ])
+
+    def test_insufficient_and_unknown_users_are_skipped(self):
+        result = apply_ticket_deltas([('ana', -2), ('beto', -3), ('nadie', 5)])
+        self.assertEqual([(r['user_id'], r['status'], r['event_tickets']) for r in result], [
+            ('ana', STATUS_INSUFFICIENT, 1),
+            ('beto', STATUS_OK, 0),
+            ('nadie', STATUS_NOT_FOUND, None),
+        ])
+
+    def test_csv_header_and_blank_lines_are_skipped(self):
+        pairs = parse_ticket_csv('user_id,cantidad\r\nana,2\r\n\r\nbeto,-1\r\n')
+        self.assertEqual(pairs, [('ana', 2), ('beto', -1)])
+        with self.assertRaises(TicketBatchError):
+            parse_ticket_csv('ana,2\nbeto,mucho\n')
+
+    def test_batch_is_all_or_nothing(self):
+        update = QuerySet.update
+        calls = []
+
+        def fail_on_second_update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise DatabaseError('fallo simulado')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', fail_on_second_update), self.assertRaises(DatabaseError):
+            apply_ticket_deltas([('ana', 1), ('beto', 2)])
+        self.assertEqual((self.tickets('ana'), self.tickets('beto')), (1, 3))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportUsersTests(TestCase):
+
+    CSV = (
+        'user_id,password,nombre,fecha_nacimiento\n'
+        'ana,secreta,Ana,1990-05-01\n'
+        'beto,secreta,Beto,\n'
+        'ana,otra,Ana Bis,\n'
+        'carla,secreta,Carla,01/05/1990\n'
+        'dario,secreta,Darío,\n'
+    )
+
+    def test_rows_duplicates_and_existing_users(self):
+        CustomUser.objects.create(user_id='dario', password='x')
+        rows, errors = read_user_rows(self.CSV)
+        self.assertEqual(errors, [(5, 'fecha_nacimiento inválida (use AAAA-MM-DD)')])
+
+        result = import_users(rows, workers=1)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['existing'], ['dario'])
+        self.assertEqual(result['repeated'], [(4, 'ana')])
+        ana = CustomUser.objects.get(user_id='ana')
+        self.assertEqual((ana.nombre, ana.fecha_nacimiento), ('Ana', datetime.date(1990, 5, 1)))
+        self.assertTrue(ana.check_password('secreta'))
+
+    def test_user_created_during_the_import_is_skipped(self):
+        rows, _ = read_user_rows(self.CSV)
+        CustomUser.objects.create(user_id='beto', password='x')
+        # The existence check ran before "beto" was created
+        with mock.patch('accounts.importing._existing_user_ids', side_effect=[set(), {'beto'}]):
+            result = import_users(rows, workers=1)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['existing'], ['beto'])
+
+    def test_command_reports_an_integrity_error(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(self.CSV)
+        self.addCleanup(os.remove, csv_file.name)
+        with mock.patch('accounts.management.commands.import_users.import_users', side_effect=IntegrityError('x')):
+            with self.assertRaises(CommandError):
+                call_command('import_users', csv_file.name, stdout=io.StringIO())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTokenTests(TestCase):
+
+    def setUp(self):
+        tokens._cache.clear()
+        self.user = CustomUser.objects.create_user(user_id='uno', password='secreta', event_tickets=2)
+
+    def login(self):
+        response = self.client.post(
+            reverse('accounts:login'), {'user_id': 'uno', 'password': 'secreta'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    def tickets(self, token=None, **params):
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        return self.client.get(reverse('accounts:get_user_tickets'), params, headers=headers)
+
+    def test_unknown_token_is_rejected(self):
+        self.assertEqual(self.tickets('no-existe').status_code, 401)
+        # The token wins over user_id
+        self.assertEqual(self.tickets('no-existe', user_id='uno').status_code, 401)
+
+    def test_logout_revokes_the_token(self):
+        token = self.login()
+        self.assertEqual(self.tickets(token).json(), {'event_tickets': 2})
+
+        response = self.client.post(reverse('accounts:logout'), headers={'Authorization': f'Token {token}'})
+        self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(self.tickets(token).status_code, 401)
+        response = self.client.post(reverse('accounts:logout'), headers={'Authorization': f'Token {token}'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_cached_token_runs_no_user_query(self):
+        token = tokens.issue_token(self.user)
+        tokens.resolve_token(token)
+        with self.assertNumQueries(0):
+            user = tokens.resolve_token(token)
+        self.assertEqual((user.pk, user.user_id), (self.user.pk, 'uno'))
+        # Only the deferred ticket count is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tickets(token).json(), {'event_tickets': 2})
+
+    def test_user_id_is_used_without_a_token(self):
+        self.assertEqual(self.tickets(user_id='uno').json(), {'event_tickets': 2})
+        self.assertEqual(self.tickets(user_id='nadie').status_code, 404)
+        self.assertEqual(self.tickets().status_code, 404)
+
+    def test_logins_keep_only_the_newest_tokens(self):
+        keys = [self.login() for _ in range(tokens.MAX_TOKENS_PER_USER + 2)]
+        self.assertEqual(
+            set(ApiToken.objects.filter(user=self.user).values_list('key', flat=True)),
+            set(keys[-tokens.MAX_TOKENS_PER_USER:]),
+        )
+        self.assertEqual(self.tickets(keys[0]).status_code, 401)
+        self.assertEqual(self.tickets(keys[-1]).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TicketConsumerTests(TransactionTestCase):
+    """
+    Event channel over the in-memory channel layer. Consumers close old
+    database connections on every message, which would end TestCase's
+    wrapping transaction, so these tests commit for real.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.evento = Evento.objects.create(
+            nombre='E', fecha='2025-01-01', ubicacion='X', current=True, ranking_visible=True,
+        )
+        ronda = Ronda.objects.create(evento=self.evento, numero=1)
+        self.pelea = Pelea.objects.create(
+            ronda=ronda,
+            equipo1=NombreEquipo.objects.create(evento=self.evento, valor=1, nombre='Rojo'),
+            equipo2=NombreEquipo.objects.create(evento=self.evento, valor=2, nombre='Azul'),
+        )
+        user = CustomUser.objects.create(user_id='uno', password='x')
+        EventoUserResult.objects.create(user=user, evento=self.evento)
+        Prediccion.objects.create(user=user, pelea=self.pelea, prediccion='equipo1')
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_by_type(self, communicator, count):
+        messages = [await communicator.receive_json_from() for _ in range(count)]
+        return {message['type']: message for message in messages}
+
+    def set_result(self, resultado):
+        self.client.post(reverse('update_result', args=[self.pelea.id]), {'resultado': resultado})
+
+    async def test_subscribe_and_unsubscribe(self):
+        publish = sync_to_async(publish_event_update)
+        communicator = await self.connect(f'/ws/eventos/{self.evento.id}/')
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'event_id': self.evento.id})
+        await publish(self.evento.id, {'type': 'result', 'pelea_id': 1})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'result', 'pelea_id': 1})
+
+        await communicator.send_json_to({'action': 'unsubscribe', 'event_id': self.evento.id})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unsubscribed', 'event_id': self.evento.id})
+        await publish(self.evento.id, {'type': 'result', 'pelea_id': 2})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+        communicator = await self.connect('/ws/eventos/')
+        await communicator.send_json_to({'action': 'subscribe', 'event_id': 'x'})
+        self.assertEqual(await communicator.receive_json_from(), {'error': 'event_id inválido'})
+        await communicator.send_json_to({'action': 'subscribe', 'event_id': self.evento.id})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'event_id': self.evento.id})
+        await publish(self.evento.id + 1, {'type': 'result', 'pelea_id': 3})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_result_visibility_and_rank_updates(self):
+        communicator = await self.connect(f'/ws/eventos/{self.evento.id}/')
+        await communicator.receive_json_from()
+
+        await sync_to_async(self.set_result)('equipo1')
+        messages = await self.receive_by_type(communicator, 2)
+        self.assertEqual(messages['result'], {'type': 'result', 'pelea_id': self.pelea.id, 'resultado': 'equipo1'})
+        self.assertEqual(messages['ranks'], {'type': 'ranks', 'changes': [['uno', 1, 1]]})
+
+        await sync_to_async(self.client.post)(reverse('toggle_ranking_visibility', args=[self.evento.id]))
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'visibility', 'results_visible': False, 'ranking_visible': False,
+        })
+
+        # While the ranking is hidden only the result goes out
+        await sync_to_async(self.set_result)('equipo2')
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'result', 'pelea_id': self.pelea.id, 'resultado': 'equipo2',
+        })
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
@@ -0,0 +1,118 @@
+import csv
+import io
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CustomUser
+
+logger = logging.getLogger('accounts')
+
+STATUS_OK = 'ok'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_INSUFFICIENT = 'insufficient'
+
+
+class TicketBatchError(ValueError):
+    pass
+
+
+def parse_ticket_csv(text):
+    """
+    Parse "user_id,delta" lines into (user_id, delta) pairs.
+    A header line and blank lines are skipped.
+    """
+    pairs = []
+    for line_number, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 2:
+            raise TicketBatchError(f'Línea {line_number}: se esperaba "user_id,cantidad"')
+
+        user_id, delta = row[0].strip(), row[1].strip()
+        try:
+            delta = int(delta)
+        except ValueError:
+            if line_number == 1:
+                continue  # Header
+            raise TicketBatchError(f'Línea {line_number}: cantidad inválida "{delta}"')
+        pairs.append((user_id, delta))
+    return pairs
+
+
+def parse_ticket_json(updates):
+    """Validate a list of {"user_id": ..., "delta": ...} objects into pairs."""
+    if not isinstance(updates, list):
+        raise TicketBatchError('updates debe ser una lista')
+
+    pairs = []
+    for index, update in enumerate(updates):
+        try:
+            pairs.append((str(update['user_id']), int(update['delta'])))
+        except (KeyError, TypeError, ValueError):
+            raise TicketBatchError(f'Elemento {index}: se esperaba {{"user_id": ..., "delta": entero}}')
+    return pairs
+
+
+def apply_ticket_deltas(pairs):
+    """
+    Apply many ticket adjustments in one transaction.
+
+    Deltas for the same user are added together, then users are grouped by
+    delta so each group is a single set-based F() UPDATE. A subtraction that
+    would leave a user below zero tickets is skipped for that user.
+
+    Returns one summary dict per user: user_id, delta, status and the
+    resulting event_tickets.
+    """
+    deltas = {}
+    for user_id, delta in pairs:
+        deltas[user_id] = deltas.get(user_id, 0) + delta
+
+    if not deltas:
+        return []
+
+    with transaction.atomic():
+        current = dict(
+            CustomUser.objects.select_for_update()
+            .filter(user_id__in=deltas.keys())
+            .values_list('user_id', 'event_tickets')
+        )
+
+        statuses = {}
+        groups = {}
+        for user_id, delta in deltas.items():
+            if user_id not in current:
+                statuses[user_id] = STATUS_NOT_FOUND
+            elif current[user_id] + delta < 0:
+                statuses[user_id] = STATUS_INSUFFICIENT
+            else:
+                statuses[user_id] = STATUS_OK
+                if delta:
+                    groups.setdefault(delta, []).append(user_id)
+
+        for delta, user_ids in groups.items():
+            users = CustomUser.objects.filter(user_id__in=user_ids)
+            if delta < 0:
+                users = users.filter(event_tickets__gte=-delta)
+            users.update(event_tickets=F('event_tickets') + delta)
+
+        tickets = dict(
+            CustomUser.objects.filter(user_id__in=current.keys())
+            .values_list('user_id', 'event_tickets')
+        )
+
+    logger.info(
+        f"Bulk ticket update: {sum(1 for s in statuses.values() if s == STATUS_OK)} of "
+        f"{len(deltas)} users updated in {len(groups)} UPDATEs"
+    )
+    return [
+        {
+            'user_id': user_id,
+            'delta': delta,
+            'status': statuses[user_id],
+            'event_tickets': tickets.get(user_id),
+        }
+        for user_id, delta in deltas.items()
+    ]
@@ -0,0 +1,154 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+
+from .models import ApiToken, CustomUser
+
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60  # seconds; also how long a revoked token can live on in other workers
+MAX_TOKENS_PER_USER = 5  # one per device; older ones are dropped at login
+
+# Fields kept per cached token, in model field order as Model.from_db()
+# expects. Any other field (event_tickets...) is left deferred on the
+# returned user, so reading it queries its live value.
+CACHED_USER_FIELDS = tuple(
+    field.attname for field in CustomUser._meta.concrete_fields
+    if field.attname in ('id', 'user_id', 'nombre', 'apellido', 'is_staff', 'is_superuser')
+)
+
+
+class InvalidApiToken(Exception):
+    pass
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> user fields, with a per-entry TTL."""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, user values)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, values):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = TokenCache()
+
+
+def issue_token(user):
+    """
+    New token for a login. Each device keeps its own token, so logging out
+    on one doesn't log out the others, but only the newest
+    MAX_TOKENS_PER_USER are kept.
+    """
+    key = secrets.token_hex(32)
+    with transaction.atomic():
+        ApiToken.objects.create(user=user, key=key)
+        stale = list(
+            ApiToken.objects.filter(user=user)
+            .order_by('-created_at', '-id')
+            .values_list('key', flat=True)[MAX_TOKENS_PER_USER:]
+        )
+        if stale:
+            ApiToken.objects.filter(key__in=stale).delete()
+    for stale_key in stale:
+        _cache.discard(stale_key)
+    return key
+
+
+def revoke_token(key):
+    """Delete a token. Returns True if it existed."""
+    _cache.discard(key)
+    deleted, _ = ApiToken.objects.filter(key=key).delete()
+    return bool(deleted)
+
+
+def get_request_token(request):
+    """Token key sent as "Authorization: Token <key>" or "X-Api-Token: <key>"."""
+    header = request.headers.get('Authorization', '')
+    scheme, _, key = header.partition(' ')
+    if scheme.lower() == 'token' and key.strip():
+        return key.strip()
+    return request.headers.get('X-Api-Token') or None
+
+
+def resolve_token(key):
+    """
+    User for a token key, from the in-process cache when possible.
+    Raises InvalidApiToken for unknown or revoked keys.
+    """
+    values = _cache.get(key)
+    if values is None:
+        lookups = tuple(f'user__{field}' for field in CACHED_USER_FIELDS)
+        values = ApiToken.objects.filter(key=key).values_list(*lookups).first()
+        if values is None:
+            raise InvalidApiToken(key)
+        _cache.set(key, values)
+    return CustomUser.from_db(CustomUser.objects.db, CACHED_USER_FIELDS, values)
+
+
+async def aresolve_token(key):
+    """Async resolve_token()."""
+    values = _cache.get(key)
+    if values is None:
+        lookups = tuple(f'user__{field}' for field in CACHED_USER_FIELDS)
+        values = await ApiToken.objects.filter(key=key).values_list(*lookups).afirst()
+        if values is None:
+            raise InvalidApiToken(key)
+        _cache.set(key, values)
+    return CustomUser.from_db(CustomUser.objects.db, CACHED_USER_FIELDS, values)
+
+
+def resolve_api_user(request, user_id=None):
+    """
+    User making an API call: the token owner when a token is sent, otherwise
+    the user named by the legacy `user_id` parameter. Returns None when
+    neither is given.
+    """
+    key = get_request_token(request)
+    if key:
+        return resolve_token(key)
+    if user_id:
+        return CustomUser.objects.get(user_id=user_id)
+    return None
+
+
+async def aresolve_api_user(request, user_id=None):
+    """
+    Async resolve_api_user(). Fields left deferred on a token user can't be
+    lazily loaded in async code; fetch them with arefresh_from_db().
+    """
+    key = get_request_token(request)
+    if key:
+        return await aresolve_token(key)
+    if user_id:
+        return await CustomUser.objects.aget(user_id=user_id)
+    return None
@@ -6,7 +6,11 @@ app_name = 'accounts'
 urlpatterns = [
     path('register/', views.register_user, name='register'),  # Use views.register_user
     path('login/', views.login_user, name='login'),           # Use views.login_user
+    path('logout/', views.logout_user, name='logout'),
     path('manage-users/', views.manage_users, name='manage_users'),
+    path('search-users/', views.search_users_api, name='search_users'),
+    path('import-users/', views.import_users_view, name='import_users'),
+    path('bulk-tickets/', views.bulk_update_tickets, name='bulk_update_tickets'),
     path('update-tickets/<str:user_id>/', views.update_tickets, name='update_tickets'),
     path('delete-user/<str:user_id>/', views.delete_user, name='delete_user'),  # NEW: Delete user
     path('tickets/', views.get_user_tickets, name='get_user_tickets'),
@@ -12,10 +12,18 @@ from django.contrib import messages
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.middleware.csrf import get_token
-from django.db.models import Q
+from django.db.models import F
 import json
 from eventos.models import Evento, EventoUserResult
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from QuinielaGalleraDash.db import retry_on_locked
+from .importing import import_users, read_user_rows
+from .search import search_users
+from .tokens import InvalidApiToken, get_request_token, issue_token, resolve_api_user, revoke_token
+from .tickets import (
+    STATUS_INSUFFICIENT, STATUS_NOT_FOUND, STATUS_OK, TicketBatchError,
+    apply_ticket_deltas, parse_ticket_csv, parse_ticket_json,
+)
 import logging
 
 logger = logging.getLogger('accounts')
@@ -55,27 +63,69 @@ def login_user(request):
 
     user = authenticate(request, username=user_id, password=password)
     if user is not None:
-        return JsonResponse({"message": "Login successful", "user_id": user.user_id}, status=status.HTTP_200_OK)
+        return JsonResponse({
+            "message": "Login successful",
+            "user_id": user.user_id,
+            "token": issue_token(user),
+        }, status=status.HTTP_200_OK)
     else:
         return JsonResponse({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
+@csrf_exempt
+def logout_user(request):
+    """Revoke the API token sent with the request"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método inválido'}, status=405)
+
+    key = get_request_token(request)
+    if not key:
+        return JsonResponse({'error': 'Falta el token'}, status=400)
+    if not revoke_token(key):
+        return JsonResponse({'error': 'Token inválido'}, status=401)
+    return JsonResponse({'success': True})
+
 @login_required
 def dashboard(request):
     return render(request, 'accounts/dashboard.html')
 
+USUARIOS_POR_PAGINA = 50
+
 @login_required
 def manage_users(request):
-    search_query = request.GET.get('search', '')  # Get the search query from the request
-    users = CustomUser.objects.all()
-
-    # Filter users based on search query
-    if search_query:
-        users = users.filter(
-            Q(user_id__icontains=search_query) |  # Match user_id
-            Q(numero_celular__icontains=search_query)  # Match phone number
-        )
+    search_query = request.GET.get('search', '').strip()  # Get the search query from the request
+
+    # Indexed search on user id, name and phone, one keyset page at a time
+    users, next_cursor = search_users(search_query, cursor=request.GET.get('after'), size=USUARIOS_POR_PAGINA)
+
+    return render(request, 'accounts/manage_users.html', {
+        'users': users,
+        'search_query': search_query,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
 
-    return render(request, 'accounts/manage_users.html', {'users': users})
+@login_required
+def search_users_api(request):
+    """Incremental search for the users page: ?q=...&after=<cursor>&limit=N"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), USUARIOS_POR_PAGINA)
+    except ValueError:
+        return JsonResponse({'error': 'limit debe ser numérico'}, status=400)
+
+    users, next_cursor = search_users(query, cursor=request.GET.get('after'), size=limit)
+    return JsonResponse({
+        'results': [
+            {
+                'user_id': user.user_id,
+                'nombre': f"{user.nombre or ''} {user.apellido or ''}".strip(),
+                'numero_celular': user.numero_celular,
+                'event_tickets': user.event_tickets,
+            }
+            for user in users
+        ],
+        'next': next_cursor,
+    })
 @login_required
 def update_tickets(request, user_id):
     user = get_object_or_404(CustomUser, user_id=user_id)
@@ -94,14 +144,138 @@ def update_tickets(request, user_id):
         user.save()
 
     return redirect('accounts:manage_users')  # Updated with namespace
+
+@login_required
+def bulk_update_tickets(request):
+    """
+    Add or subtract tickets for many users in one transaction.
+
+    JSON body: {"updates": [{"user_id": "...", "delta": 5}, ...]}
+        -> per-user summary as JSON
+    Form POST (manage users page): a CSV file ("csv_file") or pasted text
+    ("csv_text") with "user_id,cantidad" lines
+        -> summary as messages, back to the users page
+    """
+    if request.method != "POST":
+        return JsonResponse({'error': 'Método inválido'}, status=405)
+
+    is_json = request.content_type == 'application/json'
+    try:
+        if is_json:
+            data = json.loads(request.body)
+            pairs = parse_ticket_json(data.get('updates'))
+        else:
+            csv_file = request.FILES.get('csv_file')
+            text = csv_file.read().decode('utf-8-sig') if csv_file else request.POST.get('csv_text', '')
+            pairs = parse_ticket_csv(text)
+    except (json.JSONDecodeError, AttributeError, UnicodeDecodeError):
+        return _bulk_tickets_error(request, is_json, 'Formato de datos inválido')
+    except TicketBatchError as e:
+        return _bulk_tickets_error(request, is_json, str(e))
+
+    if not pairs:
+        return _bulk_tickets_error(request, is_json, 'No se recibieron actualizaciones')
+
+    summary = apply_ticket_deltas(pairs)
+    updated = [row for row in summary if row['status'] == STATUS_OK]
+    not_found = [row['user_id'] for row in summary if row['status'] == STATUS_NOT_FOUND]
+    insufficient = [row['user_id'] for row in summary if row['status'] == STATUS_INSUFFICIENT]
+
+    if is_json:
+        return JsonResponse({
+            'updated': len(updated),
+            'not_found': len(not_found),
+            'insufficient': len(insufficient),
+            'results': summary,
+        })
+
+    messages.success(request, f"Tickets actualizados para {len(updated)} usuario(s).")
+    if not_found:
+        messages.warning(request, f"Usuarios no encontrados: {', '.join(not_found)}")
+    if insufficient:
+        messages.warning(request, f"Tickets insuficientes para restar: {', '.join(insufficient)}")
+    return redirect('accounts:manage_users')
+
+def _bulk_tickets_error(request, is_json, message):
+    if is_json:
+        return JsonResponse({'error': message}, status=400)
+    messages.error(request, message)
+    return redirect('accounts:manage_users')
+
+@login_required
+def import_users_view(request):
+    """
+    Create users from an uploaded CSV ("csv_file"), same format as
+    `manage.py import_users`. Passwords are hashed in a process pool.
+    """
+    if request.method != "POST":
+        return redirect('accounts:manage_users')
+
+    csv_file = request.FILES.get('csv_file')
+    if not csv_file:
+        messages.error(request, "Seleccione un archivo CSV")
+        return redirect('accounts:manage_users')
+
+    try:
+        rows, errors = read_user_rows(csv_file.read().decode('utf-8-sig'))
+    except UnicodeDecodeError:
+        messages.error(request, "El archivo debe estar en UTF-8")
+        return redirect('accounts:manage_users')
+
+    try:
+        result = import_users(rows)
+    except Exception as e:
+        logger.error(f"Error importing users: {str(e)}")
+        messages.error(request, f"Error al importar usuarios: {str(e)}")
+        return redirect('accounts:manage_users')
+
+    messages.success(request, f"{result['created']} usuario(s) importados.")
+    if result['existing']:
+        messages.warning(request, f"Usuarios que ya existían: {', '.join(result['existing'])}")
+    if result['repeated']:
+        lines = ', '.join(str(line_number) for line_number, _ in result['repeated'])
+        messages.warning(request, f"Usuarios repetidos en el archivo (líneas {lines})")
+    for line_number, message in errors:
+        messages.error(request, f"Línea {line_number}: {message}")
+    return redirect('accounts:manage_users')
+
 def get_user_tickets(request):
     user_id = request.GET.get('user_id')
     try:
-        user = CustomUser.objects.get(user_id=user_id)
+        user = resolve_api_user(request, user_id)
+        if user is None:
+            raise CustomUser.DoesNotExist
         data = {'event_tickets': user.event_tickets}
         return JsonResponse(data, status=200)
     except CustomUser.DoesNotExist:
         return JsonResponse({'error': 'User not found'}, status=404)
+    except InvalidApiToken:
+        return JsonResponse({'error': 'Invalid token'}, status=401)
+
+@retry_on_locked()
+def _redeem_ticket(user, evento):
+    """
+    Spend one ticket and create the participation atomically. The ticket is
+    taken with a conditional UPDATE so concurrent requests can't double-spend
+    it, and the unique (user, evento) constraint rejects a second
+    participation (IntegrityError), rolling the ticket back.
+    Returns False if the user has no tickets left.
+    """
+    with transaction.atomic():
+        redeemed = CustomUser.objects.filter(
+            pk=user.pk,
+            event_tickets__gt=0
+        ).update(event_tickets=F('event_tickets') - 1)
+
+        if not redeemed:
+            return False
+
+        EventoUserResult.objects.create(
+            user=user,
+            evento=evento,
+            total_points=0
+        )
+    return True
 
 @csrf_exempt
 def use_ticket(request):
@@ -116,39 +290,33 @@ def use_ticket(request):
             user_id = data.get('user_id')
             event_id = data.get('event_id')
 
-            if not all([user_id, event_id]):
+            user = resolve_api_user(request, user_id)
+
+            if not all([user, event_id]):
                 return JsonResponse({'error': 'Datos incompletos'}, status=400)
 
-            user = CustomUser.objects.get(user_id=user_id)
             evento = Evento.objects.get(id=event_id, current=True)
 
-            # Check if user has tickets
-            if user.event_tickets < 1:
-                return JsonResponse({'error': 'No tienes tickets disponibles'}, status=400)
-
-            # Check if already participated
-            if EventoUserResult.objects.filter(user=user, evento=evento).exists():
+            try:
+                redeemed = _redeem_ticket(user, evento)
+            except IntegrityError:
                 return JsonResponse({'error': 'Ya has participado en este evento'}, status=400)
 
-            # Use ticket and create participation
-            with transaction.atomic():
-                user.event_tickets -= 1
-                user.save()
+            if not redeemed:
+                return JsonResponse({'error': 'No tienes tickets disponibles'}, status=400)
 
-                EventoUserResult.objects.create(
-                    user=user,
-                    evento=evento,
-                    total_points=0
-                )
+            remaining_tickets = CustomUser.objects.filter(pk=user.pk).values_list('event_tickets', flat=True).get()
 
             return JsonResponse({
                 'success': True,
                 'message': 'Ticket usado exitosamente',
-                'remaining_tickets': user.event_tickets
+                'remaining_tickets': remaining_tickets
             }, status=200)
 
         except CustomUser.DoesNotExist:
             return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+        except InvalidApiToken:
+            return JsonResponse({'error': 'Token inválido'}, status=401)
         except Evento.DoesNotExist:
             return JsonResponse({'error': 'Evento no encontrado o no está activo'}, status=404)
         except Exception as e:
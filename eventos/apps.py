@@ -1,4 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from .search import evento_search_index
+    evento_search_index.ensure_installed(connections[using])
+
 
 class EventosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,3 +14,4 @@ class EventosConfig(AppConfig):
 
     def ready(self):
         import eventos.signals  # Import the signals
+        post_migrate.connect(ensure_search_index, sender=self)
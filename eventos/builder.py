@@ -0,0 +1,192 @@
+from django.db import transaction
+
+from . import equipos
+from .cache import invalidate_current_event
+from .models import Evento, NombreEquipo, Pelea, Ronda
+
+NOMBRE_EQUIPO_MAX_LENGTH = NombreEquipo._meta.get_field('nombre').max_length
+
+
+class CardError(ValueError):
+    """The teams / fights of a card are invalid; `errors` lists every problem found."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+# Payloads are validated completely before anything is written, so a bad
+# card reports all its problems at once and never leaves half an event.
+
+def _parse_valor(value):
+    valor = int(str(value).strip())
+    if valor < 0:
+        raise ValueError(valor)
+    return valor
+
+
+def parse_teams(teams_data):
+    """
+    Validate the teams_data payload ([{"number": "7", "name": "..."}, ...]).
+    Returns {valor: nombre}; raises CardError.
+    """
+    if not isinstance(teams_data, list):
+        raise CardError(['Los equipos deben ser una lista'])
+
+    team_map = {}
+    errors = []
+    for position, team in enumerate(teams_data, start=1):
+        if not isinstance(team, dict):
+            errors.append(f'Equipo {position}: formato inválido')
+            continue
+        nombre = str(team.get('name') or '').strip()
+        try:
+            valor = _parse_valor(team.get('number'))
+        except (TypeError, ValueError):
+            errors.append(f'Equipo {position}: el número "{team.get("number")}" no es válido')
+            continue
+        if not nombre:
+            errors.append(f'Equipo #{valor}: falta el nombre')
+        elif len(nombre) > NOMBRE_EQUIPO_MAX_LENGTH:
+            errors.append(f'Equipo #{valor}: el nombre supera {NOMBRE_EQUIPO_MAX_LENGTH} caracteres')
+        elif valor in team_map:
+            errors.append(f'Equipo #{valor}: número repetido')
+        else:
+            team_map[valor] = nombre
+
+    if errors:
+        raise CardError(errors)
+    return team_map
+
+
+def parse_fights(fights_data, valores, round_number=None):
+    """
+    Validate the fights_data payload ([{"team1": "1", "team2": "2",
+    "round_number": 1, "numero_pelea": 1}, ...]) against the registered
+    team numbers `valores`. With `round_number` every fight goes to that
+    round instead. Returns {ronda: [(valor1, valor2), ...]} in payload
+    order; raises CardError.
+    """
+    if not isinstance(fights_data, list):
+        raise CardError(['Las peleas deben ser una lista'])
+
+    fights_by_round = {}
+    errors = []
+    for position, fight in enumerate(fights_data, start=1):
+        if not isinstance(fight, dict):
+            errors.append(f'Pelea #{position}: formato inválido')
+            continue
+        label = f'Pelea #{fight.get("numero_pelea", position)}'
+
+        numero = round_number
+        if numero is None:
+            try:
+                numero = int(fight.get('round_number', 1))
+            except (TypeError, ValueError):
+                numero = 0
+            if numero < 1:
+                errors.append(f'{label}: número de ronda inválido')
+                continue
+
+        pair = []
+        for lado in ('team1', 'team2'):
+            value = fight.get(lado)
+            try:
+                valor = _parse_valor(value)
+            except (TypeError, ValueError):
+                valor = None
+            if valor not in valores:
+                errors.append(f'{label}: el equipo #{value} no está registrado')
+                valor = None
+            pair.append(valor)
+
+        if None not in pair:
+            fights_by_round.setdefault(numero, []).append(tuple(pair))
+
+    if errors:
+        raise CardError(errors)
+    if not fights_by_round:
+        raise CardError(['Debes crear al menos 1 pelea'])
+    return fights_by_round
+
+
+# ============================================================================
+# BULK WRITES
+# ============================================================================
+# One bulk_create per model level. bulk_create sends no post_save, so the
+# caches the signals would have invalidated are invalidated here on commit.
+
+def team_ids(evento):
+    """{valor: NombreEquipo pk} of an event's teams."""
+    return dict(NombreEquipo.objects.filter(evento=evento).values_list('valor', 'id'))
+
+
+def insert_fights(evento, fights_by_round, equipo_ids):
+    """
+    Write {ronda: [(valor1, valor2), ...]} into `evento`, adding fights to
+    rounds that already exist and creating the missing ones. `equipo_ids`
+    maps team numbers to NombreEquipo pks.
+    Returns the number of fights created. Call inside transaction.atomic().
+    """
+    rondas = {}
+    for ronda in Ronda.objects.filter(evento=evento, numero__in=fights_by_round).order_by('id'):
+        rondas.setdefault(ronda.numero, ronda)
+    nuevas = [Ronda(evento=evento, numero=numero) for numero in sorted(fights_by_round) if numero not in rondas]
+    for ronda in Ronda.objects.bulk_create(nuevas):
+        rondas[ronda.numero] = ronda
+
+    pairs = [
+        (rondas[numero], valor1, valor2)
+        for numero in sorted(fights_by_round)
+        for valor1, valor2 in fights_by_round[numero]
+    ]
+    start = Pelea.next_position(evento.id)
+    peleas = Pelea.objects.bulk_create([
+        Pelea(ronda=ronda, equipo1_id=equipo_ids[valor1], equipo2_id=equipo_ids[valor2], posicion=start + i)
+        for i, (ronda, valor1, valor2) in enumerate(pairs)
+    ])
+    transaction.on_commit(invalidate_current_event, robust=True)
+    return len(peleas)
+
+
+def build_event(nombre, fecha, ubicacion, teams_data, fights_data):
+    """
+    Validate and create an event with its teams, rounds and fights.
+    Returns (evento, num_equipos, num_rondas, num_peleas); raises CardError
+    and writes nothing if the payload is invalid.
+    """
+    team_map = parse_teams(teams_data)
+    if len(team_map) < 2:
+        raise CardError(['Debes registrar al menos 2 equipos'])
+    fights_by_round = parse_fights(fights_data, team_map)
+
+    with transaction.atomic():
+        evento = Evento.objects.create(nombre=nombre, fecha=fecha, ubicacion=ubicacion)
+        created = NombreEquipo.objects.bulk_create([
+            NombreEquipo(evento=evento, valor=valor, nombre=nombre_equipo)
+            for valor, nombre_equipo in team_map.items()
+        ])
+        transaction.on_commit(lambda: equipos.invalidate_team_map(evento.id), robust=True)
+        num_peleas = insert_fights(evento, fights_by_round, {equipo.valor: equipo.id for equipo in created})
+
+    return evento, len(team_map), len(fights_by_round), num_peleas
+
+
+def build_round(evento, round_number, fights_data, equipo_ids=None):
+    """
+    Validate and add a new round with its fights to `evento`. `equipo_ids`
+    ({valor: NombreEquipo pk}) is loaded from the event if not given.
+    Returns the number of fights created; raises CardError if the payload
+    is invalid or the round already exists.
+    """
+    if equipo_ids is None:
+        equipo_ids = team_ids(evento)
+    fights_by_round = parse_fights(fights_data, equipo_ids, round_number=round_number)
+
+    with transaction.atomic():
+        if Ronda.objects.filter(evento=evento, numero=round_number).exists():
+            raise CardError([f'La ronda {round_number} ya existe'])
+        return insert_fights(evento, fights_by_round, equipo_ids)
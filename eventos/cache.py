@@ -0,0 +1,151 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Prefetch
+
+from .models import ContadorVersion, Evento, Ronda, Pelea
+
+CURRENT_EVENT_VERSION = 'current_event'
+
+
+# ============================================================================
+# VERSIONED CACHE KEYS
+# ============================================================================
+
+# Versions live in ContadorVersion rows and are copied to the cache, where
+# readers find them without touching the database. Only bump_version()
+# writes the cached copy, and it does so while holding the counter's row
+# lock, so the cached value never moves backwards and no two bumps return
+# the same number. bump_version() is meant to run outside any transaction
+# (on commit), so the row lock is released right after the cache write.
+
+def _version_key(name):
+    return f'eventos:version:{name}'
+
+
+def get_version(name):
+    """
+    Current version number for a cached dataset. If the cache lost it
+    (flushed, evicted) the dataset is bumped to a fresh version, since its
+    cached data went with it.
+    """
+    version = cache.get(_version_key(name))
+    if version is None:
+        version = bump_version(name)
+    return version
+
+
+async def aget_version(name):
+    """Async get_version(), for async views."""
+    version = await cache.aget(_version_key(name))
+    if version is None:
+        version = await sync_to_async(bump_version)(name)
+    return version
+
+
+def bump_version(name):
+    """
+    Invalidate a cached dataset by moving it to a new version. Returns the
+    new version, unique and increasing across every worker. New counters
+    are seeded from the clock, so they start above any version cached
+    before the counter existed.
+    """
+    counter = ContadorVersion.objects.filter(nombre=name)
+    with transaction.atomic():
+        if not counter.update(valor=F('valor') + 1):
+            ContadorVersion.objects.bulk_create(
+                [ContadorVersion(nombre=name, valor=time.time_ns() // 1_000_000)],
+                ignore_conflicts=True,
+            )
+            counter.update(valor=F('valor') + 1)
+        version = counter.values_list('valor', flat=True).get()
+        cache.set(_version_key(name), version, timeout=None)
+    return version
+
+
+# ============================================================================
+# CURRENT EVENT SNAPSHOT
+# ============================================================================
+
+def build_current_event_snapshot():
+    """
+    Serialize the current event with all its rounds and fights.
+    Returns (status_code, json_bytes) so it can be cached as-is.
+    """
+    try:
+        current_event = Evento.objects.prefetch_related(
+            Prefetch('rondas', queryset=Ronda.objects.order_by('numero')),
+            Prefetch('rondas__peleas', queryset=Pelea.objects.select_related('equipo1', 'equipo2').order_by('id')),
+        ).get(current=True)
+    except Evento.DoesNotExist:
+        return 404, json.dumps({'error': 'No hay evento activo'}).encode()
+
+    rounds_data = [
+        {
+            'id': ronda.id,
+            'numero': ronda.numero,
+            'peleas': [
+                {
+                    'id': pelea.id,
+                    'equipo1': pelea.equipo1.nombre,
+                    'equipo2': pelea.equipo2.nombre,
+                    'resultado': pelea.resultado if pelea.resultado else None
+                }
+                for pelea in ronda.peleas.all()
+            ]
+        }
+        for ronda in current_event.rondas.all()
+    ]
+
+    data = {
+        'id': current_event.id,
+        'nombre': current_event.nombre,
+        'fecha': str(current_event.fecha),
+        'ubicacion': current_event.ubicacion,
+        'rondas': rounds_data,
+        'results_visible': current_event.results_visible,
+        'ranking_visible': current_event.ranking_visible
+    }
+    return 200, json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def current_event_etag(version):
+    """ETag of the current event snapshot with the given version."""
+    return f'"evento-{version}"'
+
+
+def get_current_event_snapshot():
+    """
+    Return the materialized (status_code, json_bytes) snapshot of the current
+    event, building and caching it on first use after an invalidation.
+    """
+    version = get_version(CURRENT_EVENT_VERSION)
+    key = f'eventos:current_event:{version}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_current_event_snapshot()
+        cache.set(key, snapshot, timeout=24 * 60 * 60)
+    return snapshot
+
+
+async def aget_current_event_snapshot(version=None):
+    """
+    Async get_current_event_snapshot(); a rebuild runs in the ORM thread.
+    Pass the `version` already read for the ETag so both always match.
+    """
+    if version is None:
+        version = await aget_version(CURRENT_EVENT_VERSION)
+    key = f'eventos:current_event:{version}'
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = await sync_to_async(build_current_event_snapshot)()
+        await cache.aset(key, snapshot, timeout=24 * 60 * 60)
+    return snapshot
+
+
+def invalidate_current_event():
+    bump_version(CURRENT_EVENT_VERSION)
@@ -0,0 +1,104 @@
+import threading
+
+from .cache import CURRENT_EVENT_VERSION, aget_version, bump_version, get_version
+from .models import Evento, NombreEquipo
+
+# Most valores a single batch lookup may ask for
+MAX_BATCH_VALORES = 500
+
+
+# ============================================================================
+# PER-PROCESS TEAM MAPS
+# ============================================================================
+# Team numbers are looked up on every keystroke of the mobile app, so each
+# worker keeps an event's valor -> nombre map in memory. A version counter in
+# the shared cache (bumped whenever a NombreEquipo row changes) tells the
+# other workers to reload theirs.
+
+_team_maps = {}  # evento_id -> (version, {valor: nombre})
+_current_event = None  # (version, evento_id or None)
+_lock = threading.Lock()
+
+
+def _version_name(evento_id):
+    return f'equipos:{evento_id}'
+
+
+def get_team_map(evento_id):
+    """{valor: nombre} of every team of an event."""
+    version = get_version(_version_name(evento_id))
+    with _lock:
+        cached = _team_maps.get(evento_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    team_map = dict(NombreEquipo.objects.filter(evento_id=evento_id).values_list('valor', 'nombre'))
+    with _lock:
+        _team_maps[evento_id] = (version, team_map)
+    return team_map
+
+
+async def aget_team_map(evento_id):
+    """Async get_team_map(), sharing the same per-process maps."""
+    version = await aget_version(_version_name(evento_id))
+    with _lock:
+        cached = _team_maps.get(evento_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    team_map = {
+        valor: nombre
+        async for valor, nombre in NombreEquipo.objects.filter(evento_id=evento_id).values_list('valor', 'nombre')
+    }
+    with _lock:
+        _team_maps[evento_id] = (version, team_map)
+    return team_map
+
+
+def invalidate_team_map(evento_id):
+    with _lock:
+        _team_maps.pop(evento_id, None)
+    bump_version(_version_name(evento_id))
+
+
+def get_current_event_id():
+    """
+    Id of the current event, or None. Reuses the current event snapshot's
+    version, which moves on every Evento save or delete.
+    """
+    global _current_event
+    version = get_version(CURRENT_EVENT_VERSION)
+    with _lock:
+        if _current_event and _current_event[0] == version:
+            return _current_event[1]
+
+    evento_id = Evento.objects.filter(current=True).values_list('id', flat=True).first()
+    with _lock:
+        _current_event = (version, evento_id)
+    return evento_id
+
+
+async def aget_current_event_id():
+    """Async get_current_event_id()."""
+    global _current_event
+    version = await aget_version(CURRENT_EVENT_VERSION)
+    with _lock:
+        if _current_event and _current_event[0] == version:
+            return _current_event[1]
+
+    evento_id = await Evento.objects.filter(current=True).values_list('id', flat=True).afirst()
+    with _lock:
+        _current_event = (version, evento_id)
+    return evento_id
+
+
+def parse_valores(raw):
+    """
+    Team numbers from a list or a comma separated string, in order and
+    without repeats. Raises ValueError if any of them is not a number.
+    """
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list):
+        raise ValueError('valores must be a list')
+    return list(dict.fromkeys(int(str(valor).strip()) for valor in raw))
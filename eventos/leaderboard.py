@@ -0,0 +1,259 @@
+import copy
+import threading
+from bisect import bisect_left, insort
+
+from accounts.models import CustomUser
+from .cache import aget_version, bump_version, get_version
+from .models import EventoUserResult
+
+RANKING_COMPETITION = 'competition'  # 1, 2, 2, 4
+RANKING_DENSE = 'dense'              # 1, 2, 2, 3
+
+
+def _display_name(user_id, nombre, apellido):
+    return f"{nombre or ''} {apellido or ''}".strip() or user_id
+
+
+class Leaderboard:
+    """
+    Sorted index of an event's participants by points.
+
+    Entries are kept as (-points, user_pk) keys in a sorted list, plus a
+    sorted list of the distinct point values, so rank lookups, top-K and
+    "users around X" are binary searches. Ties are ordered by user pk
+    (registration order) and share the same rank.
+    """
+
+    def __init__(self, evento_id, rows=()):
+        self.evento_id = evento_id
+        self._points = {}        # user_pk -> points
+        self._names = {}         # user_pk -> (user_id, display name)
+        self._keys = []          # sorted (-points, user_pk)
+        self._point_counts = {}  # points -> participants with those points
+        self._distinct = []      # sorted -points, one per distinct value
+
+        keys = []
+        for user_pk, points, user_id, nombre, apellido in rows:
+            self._points[user_pk] = points
+            self._names[user_pk] = (user_id, _display_name(user_id, nombre, apellido))
+            self._point_counts[points] = self._point_counts.get(points, 0) + 1
+            keys.append((-points, user_pk))
+        keys.sort()
+        self._keys = keys
+        self._distinct = sorted(-points for points in self._point_counts)
+
+    @staticmethod
+    def _rows(evento_id):
+        return EventoUserResult.objects.filter(evento_id=evento_id).values_list(
+            'user_id', 'total_points', 'user__user_id', 'user__nombre', 'user__apellido'
+        )
+
+    @classmethod
+    def from_db(cls, evento_id):
+        return cls(evento_id, cls._rows(evento_id))
+
+    @classmethod
+    async def afrom_db(cls, evento_id):
+        return cls(evento_id, [row async for row in cls._rows(evento_id)])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_pk):
+        return user_pk in self._points
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _remove_points(self, points):
+        remaining = self._point_counts[points] - 1
+        if remaining:
+            self._point_counts[points] = remaining
+        else:
+            del self._point_counts[points]
+            del self._distinct[bisect_left(self._distinct, -points)]
+
+    def _add_points(self, points):
+        if points not in self._point_counts:
+            insort(self._distinct, -points)
+            self._point_counts[points] = 0
+        self._point_counts[points] += 1
+
+    def set_points(self, user_pk, points):
+        """Insert a participant or move it to a new total."""
+        previous = self._points.get(user_pk)
+        if previous == points:
+            return
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, user_pk))]
+            self._remove_points(previous)
+        self._points[user_pk] = points
+        insort(self._keys, (-points, user_pk))
+        self._add_points(points)
+
+    def add_points(self, user_pk, delta):
+        if user_pk in self._points:
+            self.set_points(user_pk, self._points[user_pk] + delta)
+
+    def updated(self, deltas=None, totals=None):
+        """
+        Copy of the board with a score change applied (see
+        apply_score_change); the board itself is left untouched.
+        """
+        board = copy.copy(self)
+        board._points = dict(self._points)
+        board._names = dict(self._names)
+        board._keys = list(self._keys)
+        board._point_counts = dict(self._point_counts)
+        board._distinct = list(self._distinct)
+        for user_pk, delta in (deltas or {}).items():
+            board.add_points(user_pk, delta)
+        for user_pk, points in (totals or {}).items():
+            board.set_points(user_pk, points)
+        return board
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def points(self, user_pk):
+        return self._points.get(user_pk)
+
+    def rank_for_points(self, points, ranking=RANKING_COMPETITION):
+        if ranking == RANKING_DENSE:
+            return bisect_left(self._distinct, -points) + 1
+        # Number of participants with strictly more points, plus one
+        return bisect_left(self._keys, (-points,)) + 1
+
+    def rank(self, user_pk, ranking=RANKING_COMPETITION):
+        points = self._points.get(user_pk)
+        if points is None:
+            return None
+        return self.rank_for_points(points, ranking)
+
+    def position(self, user_pk):
+        """Zero-based position of a participant in the sorted order."""
+        points = self._points.get(user_pk)
+        if points is None:
+            return None
+        return bisect_left(self._keys, (-points, user_pk))
+
+    def _entries(self, start, stop, ranking):
+        return self._build_entries(self._keys[max(start, 0):stop], ranking)
+
+    def _missing_names(self, keys):
+        """Query for the names of participants added after the board was built, or None."""
+        missing = [user_pk for _, user_pk in keys if user_pk not in self._names]
+        if not missing:
+            return None
+        return CustomUser.objects.filter(pk__in=missing).values_list('pk', 'user_id', 'nombre', 'apellido')
+
+    def _build_entries(self, keys, ranking):
+        missing = self._missing_names(keys)
+        if missing is not None:
+            for user_pk, user_id, nombre, apellido in missing:
+                self._names[user_pk] = (user_id, _display_name(user_id, nombre, apellido))
+
+        entries = []
+        for negative_points, user_pk in keys:
+            user_id, nombre = self._names.get(user_pk, (str(user_pk), str(user_pk)))
+            entries.append({
+                'rank': self.rank_for_points(-negative_points, ranking),
+                'user': user_id,
+                'nombre': nombre,
+                'points': -negative_points,
+            })
+        return entries
+
+    def entries_for(self, user_pks, ranking=RANKING_COMPETITION):
+        """Entries of the given participants, in ranking order."""
+        keys = sorted((-self._points[user_pk], user_pk) for user_pk in user_pks if user_pk in self._points)
+        return self._build_entries(keys, ranking)
+
+    def top(self, k, ranking=RANKING_COMPETITION):
+        return self._entries(0, k, ranking)
+
+    async def atop(self, k, ranking=RANKING_COMPETITION):
+        """top() for async views: missing names are loaded with the async ORM first."""
+        missing = self._missing_names(self._keys[:k])
+        if missing is not None:
+            async for user_pk, user_id, nombre, apellido in missing:
+                self._names[user_pk] = (user_id, _display_name(user_id, nombre, apellido))
+        return self.top(k, ranking)
+
+    def around(self, user_pk, radius=2, ranking=RANKING_COMPETITION):
+        position = self.position(user_pk)
+        if position is None:
+            return []
+        return self._entries(position - radius, position + radius + 1, ranking)
+
+
+# ============================================================================
+# PER-PROCESS REGISTRY
+# ============================================================================
+# Every worker keeps its own boards. A version counter in the shared cache
+# tells a worker when another one changed the scores so it rebuilds; the
+# worker that made the change swaps in an updated copy of its board instead.
+# A board is never modified once other threads can read it, and _lock only
+# guards the registry itself, never a database or cache call.
+
+_boards = {}  # evento_id -> (version, Leaderboard)
+_lock = threading.Lock()
+
+
+def _version_name(evento_id):
+    return f'leaderboard:{evento_id}'
+
+
+def get_leaderboard(evento_id):
+    version = get_version(_version_name(evento_id))
+    with _lock:
+        cached = _boards.get(evento_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    board = Leaderboard.from_db(evento_id)
+    with _lock:
+        _boards[evento_id] = (version, board)
+    return board
+
+
+async def aget_leaderboard(evento_id):
+    """Async get_leaderboard(), sharing the same per-process boards."""
+    version = await aget_version(_version_name(evento_id))
+    with _lock:
+        cached = _boards.get(evento_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    board = await Leaderboard.afrom_db(evento_id)
+    with _lock:
+        _boards[evento_id] = (version, board)
+    return board
+
+
+def apply_score_change(evento_id, deltas=None, totals=None):
+    """
+    Apply a score change to this worker's board and invalidate the other
+    workers' copies. `deltas` maps user pk -> points gained (or lost),
+    `totals` maps user pk -> new total; with neither the board is dropped
+    and rebuilt on its next read.
+    """
+    with _lock:
+        cached = _boards.pop(evento_id, None)
+    new_version = bump_version(_version_name(evento_id))
+    if cached is None or (deltas is None and totals is None):
+        return
+    version, board = cached
+    if new_version != version + 1:
+        # Another bump happened since this board was built. Bumps are
+        # atomic (see eventos.cache), so consecutive versions mean this
+        # change is the only one the board is missing.
+        return
+    board = board.updated(deltas, totals)
+    with _lock:
+        current = _boards.get(evento_id)
+        # A reader may have rebuilt the board from the database meanwhile
+        if current is None or current[0] < new_version:
+            _boards[evento_id] = (new_version, board)
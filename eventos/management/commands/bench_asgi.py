@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from eventos.models import Evento, NombreEquipo
+
+SERVERS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide peticiones por segundo y latencia (p50/p95/p99) de las vistas de lectura de la "
+        "app móvil con muchos clientes concurrentes, servidas por WSGI (un número fijo de "
+        "workers, como en PythonAnywhere) y por ASGI (un solo proceso con las vistas async). "
+        "Las peticiones se hacen dentro del proceso, sin red; usa el evento activo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=5, help='Peticiones seguidas por cliente')
+        parser.add_argument('--workers', type=int, default=4, help='Workers WSGI')
+        parser.add_argument('--user', help='user_id para check_participation y get_user_results')
+
+    def handle(self, *args, **options):
+        evento = Evento.objects.filter(current=True).first()
+        if evento is None:
+            raise CommandError('No hay evento activo')
+
+        endpoints = [
+            (reverse('get_current_event'), ''),
+            (reverse('get_rankings', args=[evento.id]), ''),
+        ]
+        valor = NombreEquipo.objects.filter(evento=evento).values_list('valor', flat=True).first()
+        if valor is not None:
+            endpoints.append((reverse('buscar_equipo_global'), f'valor={valor}'))
+        if options['user']:
+            endpoints.append((reverse('check_participation'), f"user_id={options['user']}&event_id={evento.id}"))
+            endpoints.append((reverse('get_user_results'), f"user_id={options['user']}"))
+
+        # Per-query SQL logging would dominate the timings
+        logging.getLogger('django.db.backends').setLevel(logging.INFO)
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        for server in SERVERS:
+            result = asyncio.run(self._run(server, endpoints, host, options))
+            latencies = np.array(result['latencies']) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            label = f"wsgi ({options['workers']} workers)" if server == 'wsgi' else 'asgi'
+            self.stdout.write(
+                f"{label:>17}: {len(latencies)} peticiones de {options['clients']} clientes, "
+                f"{len(latencies) / result['elapsed']:8.1f} req/s, "
+                f"p50 {p50:7.1f} ms, p95 {p95:7.1f} ms, p99 {p99:7.1f} ms, max {latencies.max():7.1f} ms, "
+                f"respuestas {dict(sorted(result['statuses'].items()))}"
+            )
+
+    async def _run(self, server, endpoints, host, options):
+        if server == 'wsgi':
+            from QuinielaGalleraDash.wsgi import application as wsgi_app
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+            loop = asyncio.get_running_loop()
+
+            async def call(path, query):
+                return await loop.run_in_executor(pool, self._call_wsgi, wsgi_app, host, path, query)
+        else:
+            from QuinielaGalleraDash.asgi import application as asgi_app
+
+            async def call(path, query):
+                return await self._call_asgi(asgi_app, host, path, query)
+
+        try:
+            # Warm up every endpoint (snapshot, team map, leaderboard) before measuring
+            for path, query in endpoints:
+                await call(path, query)
+
+            latencies = []
+            statuses = Counter()
+
+            async def client(i):
+                for j in range(options['requests']):
+                    path, query = endpoints[(i + j) % len(endpoints)]
+                    started = time.perf_counter()
+                    status = await call(path, query)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client(i) for i in range(options['clients'])))
+            elapsed = time.perf_counter() - started
+        finally:
+            if server == 'wsgi':
+                pool.shutdown()
+
+        return {'latencies': latencies, 'statuses': statuses, 'elapsed': elapsed}
+
+    def _call_wsgi(self, app, host, path, query):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': BytesIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+
+        response = app(environ, start_response)
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return statuses[0]
+
+    async def _call_asgi(self, app, host, path, query):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', host.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (host, 80),
+        }
+        done = asyncio.Event()
+        body_sent = False
+        statuses = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django keeps listening for a disconnect while the view runs
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                done.set()
+
+        await app(scope, receive, send)
+        done.set()
+        return statuses[0]
@@ -0,0 +1,87 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eventos.builder import build_event
+from eventos.models import Evento, NombreEquipo, Pelea, Ronda
+
+FIGHTS_PER_ROUND = 20
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_event_row_by_row(nombre, fecha, ubicacion, teams_data, fights_data):
+    """How crear_evento used to write a card: one INSERT per team, round and fight."""
+    with transaction.atomic():
+        evento = Evento.objects.create(nombre=nombre, fecha=fecha, ubicacion=ubicacion)
+        team_map = {}
+        for team_data in teams_data:
+            team_map[team_data['number']] = NombreEquipo.objects.create(
+                evento=evento, nombre=team_data['name'], valor=int(team_data['number'])
+            )
+
+        fights_by_round = {}
+        for fight_data in fights_data:
+            fights_by_round.setdefault(fight_data.get('round_number', 1), []).append(fight_data)
+
+        for round_num in sorted(fights_by_round):
+            ronda = Ronda.objects.create(evento=evento, numero=round_num)
+            for fight_data in fights_by_round[round_num]:
+                Pelea.objects.create(
+                    ronda=ronda,
+                    equipo1=team_map[fight_data['team1']],
+                    equipo2=team_map[fight_data['team2']],
+                )
+    return evento
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuánto tarda crear un evento completo (equipos, rondas y peleas) insertando "
+        "fila por fila (antes) y con el constructor por lotes de eventos.builder (después). "
+        "Escribe en la base de datos configurada, pero cada medición se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fights', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        teams_data = [{'number': str(n), 'name': f'Equipo {n}'} for n in range(1, options['teams'] + 1)]
+        builders = (('antes', build_event_row_by_row), ('despues', build_event))
+
+        for fights in options['fights']:
+            fights_data = [
+                {
+                    'team1': str(i % options['teams'] + 1),
+                    'team2': str((i + 1) % options['teams'] + 1),
+                    'round_number': i // FIGHTS_PER_ROUND + 1,
+                    'numero_pelea': i + 1,
+                }
+                for i in range(fights)
+            ]
+            timings = {
+                name: min(self._measure(builder, teams_data, fights_data) for _ in range(options['repeat']))
+                for name, builder in builders
+            }
+            self.stdout.write(
+                f"{fights:>6} peleas, {options['teams']} equipos: "
+                f"antes {timings['antes'] * 1000:9.1f} ms, despues {timings['despues'] * 1000:9.1f} ms "
+                f"({timings['antes'] / timings['despues']:.1f}x)"
+            )
+
+    def _measure(self, builder, teams_data, fights_data):
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                builder('Benchmark', datetime.date.today(), 'Benchmark', teams_data, fights_data)
+                elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed
@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from QuinielaGalleraDash.db import LOCK_ERRORS, is_lock_error, retry_on_locked
+
+# Before: what Django does with no OPTIONS (rollback journal, deferred
+# transactions, 5 s busy timeout, no retries).
+# After: the OPTIONS configured in settings.DATABASES['default'].
+PROFILES = ('antes', 'despues')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide transacciones de escritura por segundo en SQLite con varios escritores "
+        "y lectores concurrentes, con la configuración por defecto (antes) y con la "
+        "configurada en settings (después). Usa una base de datos temporal."
+    )
+    # Only the temporary databases are opened, never the configured one
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--users', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("La base de datos configurada no es SQLite.")
+        options_after = database.get('OPTIONS', {})
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self._create_schema(path, options['users'])
+                result = self._run(path, profile, options_after, options)
+            self.stdout.write(
+                f"{profile:>8}: {result['committed'] / options['seconds']:8.1f} tx/s escritas, "
+                f"{result['locked']} fallidas por bloqueo, {result['retries']} reintentos, "
+                f"{result['reads'] / options['seconds']:8.1f} lecturas/s"
+            )
+
+    def _create_schema(self, path, users):
+        db = sqlite3.connect(path)
+        db.executescript(
+            """
+            CREATE TABLE usuario (id INTEGER PRIMARY KEY, tickets INTEGER NOT NULL);
+            CREATE TABLE participacion (
+                id INTEGER PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                puntos INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX participacion_usuario ON participacion (usuario_id);
+            """
+        )
+        db.executemany('INSERT INTO usuario (id, tickets) VALUES (?, ?)', ((i, 1000) for i in range(users)))
+        db.commit()
+        db.close()
+
+    def _connect(self, path, profile, options_after):
+        if profile == 'antes':
+            return sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False), 'BEGIN'
+
+        # The busy timeout comes from the init_command pragmas
+        db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        db.executescript(options_after.get('init_command', ''))
+        return db, f"BEGIN {options_after.get('transaction_mode', 'DEFERRED')}"
+
+    def _run(self, path, profile, options_after, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        totals = {'committed': 0, 'locked': 0, 'retries': 0, 'reads': 0}
+
+        def writer(seed):
+            db, begin = self._connect(path, profile, options_after)
+            state = {'user': seed, 'calls': 0}
+            committed = locked = 0
+
+            def write_transaction():
+                # Same shape as use_ticket / submit_predictions: read, then write
+                state['calls'] += 1
+                try:
+                    db.execute(begin)
+                    db.execute('SELECT tickets FROM usuario WHERE id = ?', (state['user'],)).fetchone()
+                    db.execute('UPDATE usuario SET tickets = tickets - 1 WHERE id = ? AND tickets > 0', (state['user'],))
+                    db.execute('INSERT INTO participacion (usuario_id) VALUES (?)', (state['user'],))
+                    db.execute('COMMIT')
+                except BaseException:
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                    raise
+
+            if profile == 'despues':
+                write_transaction = retry_on_locked(in_transaction=lambda: False)(write_transaction)
+
+            while not stop.is_set():
+                state['user'] = (state['user'] + options['writers']) % options['users']
+                try:
+                    write_transaction()
+                    committed += 1
+                except LOCK_ERRORS as e:
+                    if not is_lock_error(e):
+                        raise
+                    locked += 1
+            db.close()
+            with lock:
+                totals['committed'] += committed
+                totals['locked'] += locked
+                totals['retries'] += state['calls'] - committed - locked
+
+        def reader():
+            db, _ = self._connect(path, profile, options_after)
+            reads = 0
+            while not stop.is_set():
+                try:
+                    db.execute('SELECT COUNT(*), SUM(puntos) FROM participacion').fetchone()
+                    reads += 1
+                except LOCK_ERRORS as e:
+                    if not is_lock_error(e):
+                        raise
+            db.close()
+            with lock:
+                totals['reads'] += reads
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return totals
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.models import Evento
+from eventos.packed import pack_event
+
+
+class Command(BaseCommand):
+    help = (
+        "Empaqueta las predicciones de uno o todos los eventos en PrediccionCompacta "
+        "(2 bits por pelea, una fila por usuario y evento) a partir de Prediccion."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('evento_id', type=int, nargs='?')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        evento_id = options['evento_id']
+        eventos = Evento.objects.order_by('id')
+        if evento_id is not None:
+            eventos = eventos.filter(id=evento_id)
+            if not eventos.exists():
+                raise CommandError(f'Evento {evento_id} no encontrado')
+
+        for evento_id in eventos.values_list('id', flat=True):
+            started = time.perf_counter()
+            packed = pack_event(evento_id, batch_size=options['batch_size'])
+            self.stdout.write(
+                f'Evento {evento_id}: {packed} usuarios empaquetados en {time.perf_counter() - started:.3f}s'
+            )
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.models import Evento
+from eventos.scoring import recompute_event_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los puntos de todos los participantes de un evento en una sola "
+        "pasada vectorizada y repara los totales guardados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('evento_id', type=int)
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Solo reporta las diferencias contra los totales guardados, sin escribir.',
+        )
+        parser.add_argument(
+            '--packed',
+            action='store_true',
+            help='Calcula los puntos desde PrediccionCompacta; el evento se empaqueta de nuevo (en memoria con --verify).',
+        )
+
+    def handle(self, *args, **options):
+        evento_id = options['evento_id']
+        verify = options['verify']
+
+        if not Evento.objects.filter(id=evento_id).exists():
+            raise CommandError(f'Evento {evento_id} no encontrado')
+
+        started = time.perf_counter()
+        result = recompute_event_scores(evento_id, write=not verify, packed=options['packed'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Evento {evento_id}: {result['participants']} participantes x "
+            f"{result['fights']} peleas en {elapsed:.3f}s"
+        )
+
+        drift = result['drift']
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Todos los totales están correctos'))
+            return
+
+        for user_id, stored, computed in drift:
+            self.stdout.write(f'  usuario {user_id}: guardado={stored} calculado={computed}')
+
+        if verify:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} totales con diferencias (sin cambios, --verify)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result['updated']} totales reparados"))
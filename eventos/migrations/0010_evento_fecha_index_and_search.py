@@ -0,0 +1,79 @@
+# Generated by Django 5.1.3 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+# The search index as it was when this migration was written; it must not
+# follow later changes to eventos.search. See accounts.search.FtsIndex for
+# how it works.
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS eventos_evento_fts USING fts5("
+    "nombre, ubicacion, content='eventos_evento', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS eventos_evento_fts_ai AFTER INSERT ON eventos_evento BEGIN "
+    "INSERT INTO eventos_evento_fts(rowid, nombre, ubicacion) VALUES (new.id, new.nombre, new.ubicacion); END",
+    "CREATE TRIGGER IF NOT EXISTS eventos_evento_fts_ad AFTER DELETE ON eventos_evento BEGIN "
+    "INSERT INTO eventos_evento_fts(eventos_evento_fts, rowid, nombre, ubicacion) "
+    "VALUES ('delete', old.id, old.nombre, old.ubicacion); END",
+    "CREATE TRIGGER IF NOT EXISTS eventos_evento_fts_au AFTER UPDATE OF nombre, ubicacion ON eventos_evento BEGIN "
+    "INSERT INTO eventos_evento_fts(eventos_evento_fts, rowid, nombre, ubicacion) "
+    "VALUES ('delete', old.id, old.nombre, old.ubicacion); "
+    "INSERT INTO eventos_evento_fts(rowid, nombre, ubicacion) VALUES (new.id, new.nombre, new.ubicacion); END",
+    "INSERT INTO eventos_evento_fts(eventos_evento_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS eventos_evento_fts_ai",
+    "DROP TRIGGER IF EXISTS eventos_evento_fts_ad",
+    "DROP TRIGGER IF EXISTS eventos_evento_fts_au",
+    "DROP TABLE IF EXISTS eventos_evento_fts",
+]
+
+TRIGRAM_INDEXES = {
+    'eventos_evento_nombre_trgm': 'nombre',
+    'eventos_evento_ubicacion_trgm': 'ubicacion',
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_INSTALL:
+                cursor.execute(sql)
+        elif vendor == 'postgresql':
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                # Server built without contrib: search still works, unindexed
+                return
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, column in TRIGRAM_INDEXES.items():
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON eventos_evento '
+                    f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_UNINSTALL:
+                cursor.execute(sql)
+        elif vendor == 'postgresql':
+            for name in TRIGRAM_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0009_nombreequipo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['-fecha', '-id'], name='evento_fecha_id_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-16 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_one_current_event(apps, schema_editor):
+    # The pre_save signal this constraint replaces kept a single current
+    # event; clean up any leftovers so the unique index can be built.
+    Evento = apps.get_model('eventos', 'Evento')
+    latest = Evento.objects.filter(current=True).order_by('-fecha', '-id').first()
+    if latest:
+        Evento.objects.filter(current=True).exclude(pk=latest.pk).update(current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0010_evento_fecha_index_and_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventouserresult',
+            index=models.Index(fields=['evento', '-total_points'], name='resultado_evento_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediccion',
+            index=models.Index(fields=['pelea', 'user', 'prediccion'], name='prediccion_pelea_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ronda',
+            index=models.Index(fields=['evento', 'numero'], name='ronda_evento_numero_idx'),
+        ),
+        migrations.RunPython(keep_one_current_event, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='evento',
+            constraint=models.UniqueConstraint(condition=models.Q(('current', True)), fields=('current',), name='evento_single_current'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        # Nullable first; filled in by 0013 and made required by 0014
+        migrations.AddField(
+            model_name='prediccion',
+            name='evento',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='predicciones', to='eventos.evento'),
+        ),
+        migrations.AddIndex(
+            model_name='prediccion',
+            index=models.Index(fields=['evento', 'user'], name='prediccion_evento_user_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_evento(apps, schema_editor):
+    Pelea = apps.get_model('eventos', 'Pelea')
+    Prediccion = apps.get_model('eventos', 'Prediccion')
+    # One set-based UPDATE for the whole table
+    Prediccion.objects.filter(evento__isnull=True).update(
+        evento_id=Subquery(
+            Pelea.objects.filter(pk=OuterRef('pelea_id')).values('ronda__evento_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0012_prediccion_evento'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_evento, migrations.RunPython.noop),
+    ]
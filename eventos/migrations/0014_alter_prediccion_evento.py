@@ -0,0 +1,17 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0013_backfill_prediccion_evento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prediccion',
+            name='evento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predicciones', to='eventos.evento'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0014_alter_prediccion_evento'),
+    ]
+
+    operations = [
+        # Added next to the text columns; filled in by 0016, which maps the
+        # names to NombreEquipo rows, and swapped in by 0017
+        migrations.AddField(
+            model_name='pelea',
+            name='equipo1_fk',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='eventos.nombreequipo'),
+        ),
+        migrations.AddField(
+            model_name='pelea',
+            name='equipo2_fk',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='eventos.nombreequipo'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+
+def _key(nombre):
+    return ' '.join((nombre or '').split()).casefold()
+
+
+def link_equipos(apps, schema_editor):
+    """
+    Point every fight at the NombreEquipo rows of its event whose names it
+    copied. Names are compared ignoring case and extra spaces; when several
+    teams share a name the lowest number wins. A name with no team (fights
+    added by hand) gets a new team with the next free number.
+    """
+    Pelea = apps.get_model('eventos', 'Pelea')
+    NombreEquipo = apps.get_model('eventos', 'NombreEquipo')
+
+    evento_ids = Pelea.objects.values_list('ronda__evento_id', flat=True).distinct()
+    for evento_id in evento_ids:
+        teams = {}
+        for equipo_id, nombre in NombreEquipo.objects.filter(evento_id=evento_id).order_by('-valor').values_list('id', 'nombre'):
+            teams[_key(nombre)] = equipo_id
+        next_valor = (NombreEquipo.objects.filter(evento_id=evento_id).aggregate(Max('valor'))['valor__max'] or 0) + 1
+
+        peleas = list(Pelea.objects.filter(ronda__evento_id=evento_id).only('id', 'equipo1', 'equipo2'))
+        for pelea in peleas:
+            for nombre in (pelea.equipo1, pelea.equipo2):
+                if _key(nombre) not in teams:
+                    equipo = NombreEquipo.objects.create(evento_id=evento_id, nombre=nombre[:100], valor=next_valor)
+                    teams[_key(nombre)] = equipo.id
+                    next_valor += 1
+            pelea.equipo1_fk_id = teams[_key(pelea.equipo1)]
+            pelea.equipo2_fk_id = teams[_key(pelea.equipo2)]
+        Pelea.objects.bulk_update(peleas, ['equipo1_fk', 'equipo2_fk'], batch_size=500)
+
+
+def copy_nombres(apps, schema_editor):
+    Pelea = apps.get_model('eventos', 'Pelea')
+    NombreEquipo = apps.get_model('eventos', 'NombreEquipo')
+    Pelea.objects.update(
+        equipo1=Subquery(NombreEquipo.objects.filter(pk=OuterRef('equipo1_fk_id')).values('nombre')[:1]),
+        equipo2=Subquery(NombreEquipo.objects.filter(pk=OuterRef('equipo2_fk_id')).values('nombre')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0015_pelea_equipo_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_equipos, copy_nombres),
+    ]
@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0016_backfill_pelea_equipos'),
+    ]
+
+    operations = [
+        # A default so the text columns can be added back when unapplying
+        migrations.AlterField(
+            model_name='pelea',
+            name='equipo1',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='pelea',
+            name='equipo2',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='pelea',
+            name='equipo1',
+        ),
+        migrations.RemoveField(
+            model_name='pelea',
+            name='equipo2',
+        ),
+        migrations.RenameField(
+            model_name='pelea',
+            old_name='equipo1_fk',
+            new_name='equipo1',
+        ),
+        migrations.RenameField(
+            model_name='pelea',
+            old_name='equipo2_fk',
+            new_name='equipo2',
+        ),
+        migrations.AlterField(
+            model_name='pelea',
+            name='equipo1',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='peleas_como_equipo1', to='eventos.nombreequipo'),
+        ),
+        migrations.AlterField(
+            model_name='pelea',
+            name='equipo2',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='peleas_como_equipo2', to='eventos.nombreequipo'),
+        ),
+    ]
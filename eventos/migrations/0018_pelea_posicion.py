@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def number_fights(apps, schema_editor):
+    """Existing fights get their positions in creation (id) order, per event."""
+    Pelea = apps.get_model('eventos', 'Pelea')
+    evento_ids = Pelea.objects.values_list('ronda__evento_id', flat=True).distinct()
+    for evento_id in evento_ids:
+        peleas = list(Pelea.objects.filter(ronda__evento_id=evento_id).order_by('id').only('id'))
+        for posicion, pelea in enumerate(peleas):
+            pelea.posicion = posicion
+        Pelea.objects.bulk_update(peleas, ['posicion'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0017_pelea_equipos_to_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pelea',
+            name='posicion',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_fights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0018_pelea_posicion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrediccionCompacta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('picks', models.BinaryField(default=b'')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predicciones_compactas', to='eventos.evento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predicciones_compactas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'evento')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_predictions(apps, schema_editor):
+    """Keep the first pick of each (user, pelea); later copies came from double submits."""
+    Prediccion = apps.get_model('eventos', 'Prediccion')
+    keep = (
+        Prediccion.objects.values('user_id', 'pelea_id')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    Prediccion.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0019_prediccioncompacta'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_predictions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prediccion',
+            constraint=models.UniqueConstraint(fields=('user', 'pelea'), name='prediccion_user_pelea_unique'),
+        ),
+    ]
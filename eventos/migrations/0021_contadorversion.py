@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0020_prediccion_user_pelea_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('valor', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from accounts.models import CustomUser
 
 
@@ -10,6 +10,21 @@ class Evento(models.Model):
     results_visible = models.BooleanField(default=False)
     ranking_visible = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Newest-first listing and its keyset pagination
+            models.Index(fields=['-fecha', '-id'], name='evento_fecha_id_idx'),
+        ]
+        constraints = [
+            # At most one current event; the partial index also serves every
+            # Evento.objects.get(current=True) lookup.
+            models.UniqueConstraint(
+                fields=['current'],
+                condition=models.Q(current=True),
+                name='evento_single_current',
+            ),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -18,14 +33,26 @@ class Ronda(models.Model):
     evento = models.ForeignKey(Evento, related_name='rondas', on_delete=models.CASCADE)
     numero = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['evento', 'numero'], name='ronda_evento_numero_idx'),
+        ]
+
     def __str__(self):
         return f'Ronda {self.numero} - Evento: {self.evento.nombre}'
 
 
 class Pelea(models.Model):
     ronda = models.ForeignKey('Ronda', related_name='peleas', on_delete=models.CASCADE)
-    equipo1 = models.CharField(max_length=255)
-    equipo2 = models.CharField(max_length=255)
+    # RESTRICT rather than PROTECT: a team can't be deleted while it has
+    # fights, but deleting the whole event still cascades to both.
+    equipo1 = models.ForeignKey('NombreEquipo', related_name='peleas_como_equipo1', on_delete=models.RESTRICT)
+    equipo2 = models.ForeignKey('NombreEquipo', related_name='peleas_como_equipo2', on_delete=models.RESTRICT)
+    # Order of the fight within its event, from 0; addresses the fight's 2
+    # bits in PrediccionCompacta.picks (deleting a fight clears them, so the
+    # position can be taken again). Filled in by save(); bulk_create callers
+    # must reserve positions themselves.
+    posicion = models.PositiveIntegerField()
     RESULTADOS = [
         ('equipo1', 'Equipo 1 Ganó'),
         ('equipo2', 'Equipo 2 Ganó'),
@@ -39,14 +66,53 @@ class Pelea(models.Model):
         help_text="Resultado del partido (Equipo 1, Equipo 2 o Empate)"
     )
 
+    @staticmethod
+    def next_position(evento_id):
+        """
+        First unused position of an event. Locks the event row until the end
+        of the current transaction, so concurrent writers can't take the
+        same positions.
+        """
+        Evento.objects.select_for_update().filter(pk=evento_id).exists()
+        last = Pelea.objects.filter(ronda__evento_id=evento_id).aggregate(models.Max('posicion'))['posicion__max']
+        return 0 if last is None else last + 1
+
+    def save(self, *args, **kwargs):
+        if self.posicion is None:
+            with transaction.atomic():
+                self.posicion = self.next_position(self.ronda.evento_id)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.equipo1} vs {self.equipo2} - Resultado: {self.get_resultado_display()}"
 
 class Prediccion(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     pelea = models.ForeignKey(Pelea, related_name='predicciones', on_delete=models.CASCADE)
+    # Copy of pelea.ronda.evento so event-wide reads don't join through Pelea and Ronda.
+    # Filled in by save(); bulk_create callers must set it themselves.
+    evento = models.ForeignKey(Evento, related_name='predicciones', on_delete=models.CASCADE)
     prediccion = models.CharField(max_length=10, choices=[('equipo1', 'Equipo 1'), ('empate', 'Empate'), ('equipo2', 'Equipo 2')])
 
+    class Meta:
+        indexes = [
+            # Covers the per-fight scoring queries (who picked what) without touching the table
+            models.Index(fields=['pelea', 'user', 'prediccion'], name='prediccion_pelea_user_idx'),
+            # An event's predictions, and one user's predictions for an event
+            models.Index(fields=['evento', 'user'], name='prediccion_evento_user_idx'),
+        ]
+        constraints = [
+            # One pick per user and fight, even if a submission is sent twice
+            models.UniqueConstraint(fields=['user', 'pelea'], name='prediccion_user_pelea_unique'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.evento_id is None and self.pelea_id is not None:
+            self.evento_id = Ronda.objects.filter(peleas=self.pelea_id).values_list('evento_id', flat=True).get()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Predicción de {self.user} para {self.pelea}"
 
@@ -57,6 +123,10 @@ class EventoUserResult(models.Model):
 
     class Meta:
         unique_together = ('user', 'evento')  # Prevent duplicate results for the same user and event.
+        indexes = [
+            # Rankings: an event's participants by points
+            models.Index(fields=['evento', '-total_points'], name='resultado_evento_points_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.user_id} - {self.evento.nombre}: {self.total_points} points"
@@ -71,3 +141,34 @@ class NombreEquipo(models.Model):
     class Meta:
         unique_together = ('evento', 'valor')
 
+    def __str__(self):
+        return self.nombre
+
+
+class PrediccionCompacta(models.Model):
+    """
+    All of a user's picks for an event in one row, 2 bits per fight at
+    Pelea.posicion (see eventos.packed). Written alongside Prediccion.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='predicciones_compactas')
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='predicciones_compactas')
+    picks = models.BinaryField(default=b'')
+
+    class Meta:
+        unique_together = ('user', 'evento')
+
+    def __str__(self):
+        return f"Predicciones de {self.user} para {self.evento}"
+
+
+class ContadorVersion(models.Model):
+    """
+    Authoritative value of a cache version counter (see eventos.cache).
+    Bumped with an atomic UPDATE, since the file cache's incr() is a plain
+    read-then-write that loses increments across workers.
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    valor = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.nombre} = {self.valor}"
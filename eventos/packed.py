@@ -0,0 +1,216 @@
+import numpy as np
+from django.db import transaction
+
+from .models import Pelea, Prediccion, PrediccionCompacta
+
+# 2-bit codes for picks and results. 'empate' and 'tie' share a code so the
+# normalization is baked into the data; 0 means "no pick" / "no result yet".
+# Fight n (Pelea.posicion) sits in bits 2n and 2n + 1 of the byte string
+# read as a little-endian int.
+PREDICTION_CODES = {'equipo1': 1, 'equipo2': 2, 'empate': 3, 'tie': 3}
+PICK_VALUES = {1: 'equipo1', 2: 'equipo2', 3: 'empate'}
+
+# Low bit of every 2-bit slot
+LOW_BITS = 0x55
+
+
+# ============================================================================
+# PACKING
+# ============================================================================
+
+def pack(codes):
+    """Byte string holding {posicion: code}."""
+    value = 0
+    for posicion, code in codes.items():
+        value |= (code & 3) << (2 * posicion)
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def unpack(data):
+    """{posicion: code} of every slot set in `data`."""
+    value = int.from_bytes(bytes(data), 'little')
+    codes = {}
+    posicion = 0
+    while value:
+        if value & 3:
+            codes[posicion] = value & 3
+        value >>= 2
+        posicion += 1
+    return codes
+
+
+def set_codes(data, codes):
+    """`data` with the given {posicion: code} slots overwritten (code 0 clears)."""
+    value = int.from_bytes(bytes(data), 'little')
+    for posicion, code in codes.items():
+        shift = 2 * posicion
+        value = (value & ~(3 << shift)) | ((code & 3) << shift)
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def _slot_mask(nbytes):
+    return int.from_bytes(bytes([LOW_BITS]) * nbytes, 'little')
+
+
+def score(picks, results):
+    """
+    Points of one packed pick row against the packed results: slots whose
+    result is set and whose two bits equal the pick's, counted with one
+    XOR and a popcount.
+    """
+    p = int.from_bytes(bytes(picks), 'little')
+    r = int.from_bytes(bytes(results), 'little')
+    low = _slot_mask(max(len(picks), len(results)))
+    same = ~(p ^ r)
+    matched = same & (same >> 1) & low
+    decided = (r | (r >> 1)) & low
+    return (matched & decided).bit_count()
+
+
+def score_rows(rows, results):
+    """score() for many pick rows at once, as a NumPy array."""
+    width = max([len(results)] + [len(row) for row in rows])
+    picks = np.zeros((len(rows), width), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        picks[i, :len(row)] = np.frombuffer(bytes(row), dtype=np.uint8)
+    r = np.zeros(width, dtype=np.uint8)
+    r[:len(results)] = np.frombuffer(bytes(results), dtype=np.uint8)
+
+    same = ~(picks ^ r)
+    matched = same & (same >> 1) & LOW_BITS
+    decided = (r | (r >> 1)) & LOW_BITS
+    return np.bitwise_count(matched & decided).sum(axis=1, dtype=np.int32)
+
+
+# ============================================================================
+# EVENT DATA
+# ============================================================================
+
+def event_results(evento_id):
+    """The results of an event's fights, packed like the picks."""
+    return pack({
+        posicion: PREDICTION_CODES.get(resultado, 0)
+        for posicion, resultado in Pelea.objects.filter(
+            ronda__evento_id=evento_id,
+        ).exclude(resultado='').values_list('posicion', 'resultado')
+    })
+
+
+def score_event(evento_id, rows=None):
+    """
+    {user pk: points} of every packed row of an event. Pass `rows` ({user
+    pk: packed picks}, see event_rows()) to score rows not stored yet.
+    """
+    if rows is None:
+        rows = dict(PrediccionCompacta.objects.filter(evento_id=evento_id).values_list('user_id', 'picks'))
+    if not rows:
+        return {}
+    points = score_rows(list(rows.values()), event_results(evento_id))
+    return {user_id: int(p) for user_id, p in zip(rows, points)}
+
+
+# ============================================================================
+# COMPATIBILITY WITH Prediccion
+# ============================================================================
+# Prediccion stays the table every existing query reads. Its writes are
+# mirrored here: bulk paths call store_picks(), single saves and deletes go
+# through the signals in eventos.signals. Events submitted before this store
+# existed are read from Prediccion until `pack_predictions` packs them.
+
+def store_picks(user_id, evento_id, picks):
+    """Replace a user's packed row for an event with {posicion: prediction value}."""
+    data = pack({posicion: PREDICTION_CODES[value] for posicion, value in picks.items()})
+    PrediccionCompacta.objects.update_or_create(user_id=user_id, evento_id=evento_id, defaults={'picks': data})
+
+
+def update_picks(user_id, evento_id, codes):
+    """
+    Overwrite some slots of a user's packed row. A missing row (event not
+    packed yet) is built from all the user's Prediccion rows instead, so it
+    never holds only the slots of this one write.
+    """
+    with transaction.atomic():
+        row = PrediccionCompacta.objects.select_for_update().filter(user_id=user_id, evento_id=evento_id).first()
+        if row is None:
+            pack_user(user_id, evento_id)
+            return
+        row.picks = set_codes(row.picks, codes)
+        row.save(update_fields=['picks'])
+
+
+def pack_user(user_id, evento_id):
+    """(Re)build one user's packed row for an event from their Prediccion rows."""
+    picks = dict(
+        Prediccion.objects.filter(user_id=user_id, evento_id=evento_id).values_list('pelea__posicion', 'prediccion')
+    )
+    if picks:
+        store_picks(user_id, evento_id, picks)
+
+
+def clear_positions(evento_id, posiciones):
+    """Clear some slots in every packed row of an event, when their fights are deleted."""
+    cleared = {posicion: 0 for posicion in posiciones}
+    if not cleared:
+        return
+    with transaction.atomic():
+        rows = list(PrediccionCompacta.objects.select_for_update().filter(evento_id=evento_id))
+        for row in rows:
+            row.picks = set_codes(row.picks, cleared)
+        PrediccionCompacta.objects.bulk_update(rows, ['picks'], batch_size=1000)
+
+
+def event_rows(evento_id, batch_size=1000):
+    """{user pk: packed picks} of an event, built from its Prediccion rows; nothing is written."""
+    picks = {}
+    for user_id, posicion, value in Prediccion.objects.filter(evento_id=evento_id).values_list(
+        'user_id', 'pelea__posicion', 'prediccion'
+    ).iterator(chunk_size=batch_size):
+        picks.setdefault(user_id, {})[posicion] = PREDICTION_CODES[value]
+    return {user_id: pack(codes) for user_id, codes in picks.items()}
+
+
+def store_event_rows(evento_id, rows, batch_size=1000):
+    """Write the packed rows returned by event_rows(), replacing the stored ones."""
+    with transaction.atomic():
+        PrediccionCompacta.objects.bulk_create(
+            [PrediccionCompacta(user_id=user_id, evento_id=evento_id, picks=data) for user_id, data in rows.items()],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user', 'evento'],
+            update_fields=['picks'],
+        )
+
+
+def pack_event(evento_id, batch_size=1000):
+    """(Re)build every packed row of an event from its Prediccion rows."""
+    rows = event_rows(evento_id, batch_size=batch_size)
+    store_event_rows(evento_id, rows, batch_size=batch_size)
+    return len(rows)
+
+
+def user_picks(user_id, evento_id):
+    """
+    {posicion: prediction value} of a user for an event, decoded from the
+    packed row, or read from Prediccion if the event was never packed.
+    """
+    data = PrediccionCompacta.objects.filter(user_id=user_id, evento_id=evento_id).values_list('picks', flat=True).first()
+    if data is None:
+        return dict(
+            Prediccion.objects.filter(user_id=user_id, evento_id=evento_id).values_list('pelea__posicion', 'prediccion')
+        )
+    return {posicion: PICK_VALUES[code] for posicion, code in unpack(data).items()}
+
+
+async def auser_picks(user_id, evento_id):
+    """Async user_picks()."""
+    data = await PrediccionCompacta.objects.filter(
+        user_id=user_id, evento_id=evento_id,
+    ).values_list('picks', flat=True).afirst()
+    if data is None:
+        return {
+            posicion: value
+            async for posicion, value in Prediccion.objects.filter(
+                user_id=user_id, evento_id=evento_id,
+            ).values_list('pelea__posicion', 'prediccion')
+        }
+    return {posicion: PICK_VALUES[code] for posicion, code in unpack(data).items()}
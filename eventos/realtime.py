@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from .cache import bump_version, get_version
+
+logger = logging.getLogger('eventos')
+
+# Updates kept in the cache for Last-Event-ID resume
+STREAM_BACKLOG = 200
+STREAM_BACKLOG_TIMEOUT = 60 * 60
+# Seconds between keep-alive comments on idle SSE connections
+STREAM_HEARTBEAT = 15
+# Reconnection delay suggested to SSE clients, in milliseconds
+STREAM_RETRY_MS = 3000
+
+
+def evento_group(evento_id):
+    """Channel layer group every subscriber of an event joins."""
+    return f'evento_{evento_id}'
+
+
+def _stream_version(evento_id):
+    return f'stream:{evento_id}'
+
+
+def _stream_key(evento_id, update_id):
+    return f'eventos:stream:{evento_id}:{update_id}'
+
+
+def publish_event_update(evento_id, payload):
+    """
+    Push a compact update to every client subscribed to an event.
+
+    Each update gets a unique, increasing id (an atomic version bump, see
+    eventos.cache) and is also stored in the cache under it for a while,
+    so SSE clients can resume with Last-Event-ID. Concurrent publishers
+    may deliver their updates out of id order. Broadcasting is
+    best effort: a failure is logged and never breaks the request that
+    triggered it.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        update_id = bump_version(_stream_version(evento_id))
+        cache.set(_stream_key(evento_id, update_id), payload, timeout=STREAM_BACKLOG_TIMEOUT)
+        async_to_sync(channel_layer.group_send)(
+            evento_group(evento_id),
+            {'type': 'evento.update', 'id': update_id, 'payload': payload},
+        )
+    except Exception as e:
+        logger.error(f"Error broadcasting update for evento {evento_id}: {str(e)}")
+
+
+def publish_result(pelea, evento_id):
+    publish_event_update(evento_id, {
+        'type': 'result',
+        'pelea_id': pelea.id,
+        'resultado': pelea.resultado or None,
+    })
+
+
+def publish_visibility(evento):
+    publish_event_update(evento.id, {
+        'type': 'visibility',
+        'results_visible': evento.results_visible,
+        'ranking_visible': evento.ranking_visible,
+    })
+
+
+def publish_rank_changes(evento_id, board, user_pks):
+    """
+    Send the new rank and points of the participants whose totals changed,
+    as compact [user_id, rank, points] rows. `user_pks=None` means every
+    total may have changed, so clients are told to reload the ranking.
+    """
+    if user_pks is None:
+        publish_event_update(evento_id, {'type': 'ranks', 'reload': True})
+        return
+
+    changes = [
+        [entry['user'], entry['rank'], entry['points']]
+        for entry in board.entries_for(user_pks)
+    ]
+    if changes:
+        publish_event_update(evento_id, {'type': 'ranks', 'changes': changes})
+
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+
+def format_sse(payload, update_id=None):
+    lines = []
+    if update_id is not None:
+        lines.append(f'id: {update_id}')
+    lines.append(f"event: {payload.get('type', 'message')}")
+    lines.append(f'data: {json.dumps(payload)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _replay(evento_id, last_id):
+    """
+    SSE frames for the updates published after `last_id`. If some of them
+    are no longer in the cache, a single 'reset' frame tells the client to
+    reload its state instead. Returns (frames, id of the last update they
+    cover).
+    """
+    current = await sync_to_async(get_version)(_stream_version(evento_id))
+    if last_id == current:
+        return [], current
+    if last_id > current:
+        # Not an id this stream handed out (e.g. from before a reset)
+        return [format_sse({'type': 'reset'}, current)], current
+
+    missed = range(last_id + 1, current + 1)
+    if len(missed) > STREAM_BACKLOG:
+        return [format_sse({'type': 'reset'}, current)], current
+
+    stored = await cache.aget_many([_stream_key(evento_id, update_id) for update_id in missed])
+    if len(stored) != len(missed):
+        return [format_sse({'type': 'reset'}, current)], current
+
+    frames = [
+        format_sse(stored[_stream_key(evento_id, update_id)], update_id)
+        for update_id in missed
+    ]
+    return frames, current
+
+
+async def event_stream(evento_id, last_id=None):
+    """
+    Async generator of SSE frames for an event: the missed updates when
+    resuming, then live updates from the channel layer group, with a
+    heartbeat comment whenever the connection is idle.
+    """
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    group = evento_group(evento_id)
+    # Join before replaying so nothing published in between is lost
+    await channel_layer.group_add(group, channel)
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+
+        # Updates up to this id were replayed (or the client already had
+        # them). Live ids are unique but may arrive out of order, so only
+        # these are skipped; the threshold never moves with live traffic.
+        replayed_through = last_id
+        if last_id is not None:
+            frames, replayed_through = await _replay(evento_id, last_id)
+            for frame in frames:
+                yield frame
+
+        while True:
+            try:
+                message = await asyncio.wait_for(channel_layer.receive(channel), timeout=STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+                continue
+
+            update_id = message.get('id')
+            if replayed_through is not None and update_id is not None and update_id <= replayed_through:
+                continue  # Already replayed
+            yield format_sse(message['payload'], update_id)
+    finally:
+        await channel_layer.group_discard(group, channel)
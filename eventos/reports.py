@@ -0,0 +1,190 @@
+import csv
+
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import EventoUserResult, Pelea, Prediccion
+from .scoring import correct_prediction_q, is_prediction_correct
+
+PENDING_RESULT_Q = Q(pelea__resultado='') | Q(pelea__resultado__isnull=True)
+
+
+# ============================================================================
+# COMPACT REPORT RECORDS
+# ============================================================================
+# Plain __slots__ records instead of dicts holding model instances: one
+# FightRow per fight is shared by every participant's predictions.
+
+class FightRow:
+    __slots__ = ('id', 'ronda_numero', 'equipo1', 'equipo2', 'resultado')
+
+    def __init__(self, id, ronda_numero, equipo1, equipo2, resultado):
+        self.id = id
+        self.ronda_numero = ronda_numero
+        self.equipo1 = equipo1
+        self.equipo2 = equipo2
+        self.resultado = resultado
+
+
+class PredictionRow:
+    __slots__ = ('pelea', 'prediccion', 'es_correcta')
+
+    def __init__(self, pelea, prediccion):
+        self.pelea = pelea
+        self.prediccion = prediccion
+        self.es_correcta = is_prediction_correct(prediccion, pelea.resultado)
+
+    @property
+    def resultado_real(self):
+        return self.pelea.resultado
+
+
+class UserResultRow:
+    __slots__ = (
+        'user_id', 'total_points', 'predicciones',
+        'correctas', 'incorrectas', 'pendientes', 'precision', 'total_predicciones',
+    )
+
+    def __init__(self, user_id, total_points, correctas=0, pendientes=0, total_predicciones=0):
+        self.user_id = user_id
+        self.total_points = total_points
+        self.predicciones = []
+        self.correctas = correctas
+        self.pendientes = pendientes
+        self.total_predicciones = total_predicciones
+        self.incorrectas = total_predicciones - correctas - pendientes
+
+        total_con_resultado = correctas + self.incorrectas
+        precision = (correctas / total_con_resultado * 100) if total_con_resultado > 0 else 0
+        self.precision = round(precision, 1)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def fight_stats(evento):
+    """Total, resolved and pending fights of an event in one aggregate query."""
+    stats = Pelea.objects.filter(ronda__evento=evento).aggregate(
+        total_peleas=Count('id'),
+        peleas_resueltas=Count('id', filter=~Q(resultado='') & Q(resultado__isnull=False)),
+    )
+    stats['peleas_pendientes'] = stats['total_peleas'] - stats['peleas_resueltas']
+    return stats
+
+
+def build_user_results(evento, participaciones):
+    """
+    Build UserResultRow records for a page of EventoUserResult rows.
+
+    Correct/pending counts come from one grouped aggregate query; the
+    prediction details from one ordered query over all the page's users,
+    grouped in Python.
+    """
+    participaciones = list(participaciones)
+    user_ids = [participacion.user_id for participacion in participaciones]
+    if not user_ids:
+        return []
+
+    predicciones = Prediccion.objects.filter(evento=evento, user_id__in=user_ids)
+
+    stats = {
+        row['user_id']: row
+        for row in predicciones.values('user_id').annotate(
+            correctas=Count('id', filter=correct_prediction_q()),
+            pendientes=Count('id', filter=PENDING_RESULT_Q),
+            total=Count('id'),
+        )
+    }
+
+    rows = {}
+    for participacion in participaciones:
+        user_stats = stats.get(participacion.user_id, {})
+        rows[participacion.user_id] = UserResultRow(
+            participacion.user.user_id,
+            participacion.total_points,
+            correctas=user_stats.get('correctas', 0),
+            pendientes=user_stats.get('pendientes', 0),
+            total_predicciones=user_stats.get('total', 0),
+        )
+
+    fights = {}
+    for user_pk, prediccion, pelea_id, ronda_numero, equipo1, equipo2, resultado in predicciones.order_by(
+        'user_id', 'pelea__ronda__numero', 'pelea_id'
+    ).values_list(
+        'user_id', 'prediccion', 'pelea_id', 'pelea__ronda__numero',
+        'pelea__equipo1__nombre', 'pelea__equipo2__nombre', 'pelea__resultado',
+    ):
+        pelea = fights.get(pelea_id)
+        if pelea is None:
+            pelea = fights[pelea_id] = FightRow(pelea_id, ronda_numero, equipo1, equipo2, resultado)
+        rows[user_pk].predicciones.append(PredictionRow(pelea, prediccion))
+
+    return list(rows.values())
+
+
+# ============================================================================
+# CSV EXPORT
+# ============================================================================
+
+CSV_HEADER = [
+    'user_id', 'nombre', 'apellido', 'total_points',
+    'ronda', 'pelea_id', 'equipo1', 'equipo2', 'prediccion', 'resultado', 'correcta',
+]
+
+
+# A cell starting with one of these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_safe(value):
+    """Text cell with a leading quote if a spreadsheet would read it as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class Echo:
+    """File-like object whose write() hands the formatted line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_event_results_csv(evento, chunk_size=2000):
+    """
+    Yield the per-user, per-fight prediction grid of an event as CSV lines.
+    Cells that would start a formula are escaped with csv_safe().
+
+    The header goes out before the query runs, and rows are read from the
+    database cursor in chunks, so memory stays flat with any number of
+    participants.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+
+    total_points = EventoUserResult.objects.filter(
+        user_id=OuterRef('user_id'),
+        evento=evento,
+    ).values('total_points')[:1]
+
+    rows = Prediccion.objects.filter(
+        evento=evento
+    ).annotate(
+        total_points=Subquery(total_points)
+    ).order_by(
+        'user__user_id', 'pelea__ronda__numero', 'pelea_id'
+    ).values_list(
+        'user__user_id', 'user__nombre', 'user__apellido', 'total_points',
+        'pelea__ronda__numero', 'pelea_id', 'pelea__equipo1__nombre', 'pelea__equipo2__nombre',
+        'prediccion', 'pelea__resultado',
+    )
+
+    for (user_id, nombre, apellido, points, ronda_numero, pelea_id,
+         equipo1, equipo2, prediccion, resultado) in rows.iterator(chunk_size=chunk_size):
+        correcta = is_prediction_correct(prediccion, resultado)
+        # Names are user input and the sheet is opened in spreadsheet apps
+        yield writer.writerow([csv_safe(cell) for cell in (
+            user_id, nombre or '', apellido or '', points if points is not None else '',
+            ronda_numero, pelea_id, equipo1, equipo2, prediccion, resultado or '',
+            '' if correcta is None else int(correcta),
+        )])
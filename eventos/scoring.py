@@ -0,0 +1,322 @@
+import itertools
+import logging
+
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from .models import Pelea, Prediccion, EventoUserResult
+from .packed import PREDICTION_CODES, event_rows, score_event, store_event_rows
+from .signals import send_scores_changed
+
+logger = logging.getLogger('eventos')
+
+
+# ============================================================================
+# PREDICTION / RESULT NORMALIZATION
+# ============================================================================
+
+def normalize_prediction_value(value):
+    """
+    Normalize prediction/result values to handle the mismatch between
+    'empate' (predictions) and 'tie' (results)
+    """
+    if value in ['empate', 'tie']:
+        return 'tie'
+    return value
+
+
+def is_prediction_correct(prediction_value, result_value):
+    """
+    Check if a prediction is correct, handling the empate/tie mismatch
+    """
+    if not result_value:
+        return None  # Result not yet available
+
+    normalized_prediction = normalize_prediction_value(prediction_value)
+    normalized_result = normalize_prediction_value(result_value)
+
+    return normalized_prediction == normalized_result
+
+
+def prediction_values_for_result(result_value):
+    """
+    Stored prediction values that score a point for the given fight result.
+    Returns an empty list when the fight has no result yet.
+    """
+    if not result_value:
+        return []
+    if normalize_prediction_value(result_value) == 'tie':
+        return ['empate', 'tie']
+    return [result_value]
+
+
+def correct_prediction_q(prefix=''):
+    """
+    Q object matching predictions that scored a point, so correctness can be
+    evaluated inside SQL instead of row by row in Python.
+    `prefix` is the lookup path to the Prediccion model (e.g. 'prediccion__').
+    """
+    return (
+        Q(**{f'{prefix}prediccion': F(f'{prefix}pelea__resultado')}) |
+        Q(**{f'{prefix}prediccion': 'empate', f'{prefix}pelea__resultado': 'tie'})
+    )
+
+
+# ============================================================================
+# INCREMENTAL (DELTA) SCORING
+# ============================================================================
+
+def _ensure_participations(pelea, evento_id):
+    """
+    Create the missing EventoUserResult rows for users that predicted this
+    fight without a participation record. Participations are normally created
+    by `use_ticket`, so this is an empty no-op on the hot path.
+    Totals are computed against the results stored *before* the change, so the
+    delta applied afterwards stays consistent. Returns True if rows were added.
+    """
+    missing_users = list(
+        Prediccion.objects.filter(pelea=pelea)
+        .exclude(user__event_results__evento_id=evento_id)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    if not missing_users:
+        return False
+
+    totals = dict(
+        Prediccion.objects.filter(
+            user_id__in=missing_users,
+            evento_id=evento_id,
+        )
+        .filter(correct_prediction_q())
+        .values('user_id')
+        .annotate(points=Count('id'))
+        .values_list('user_id', 'points')
+    )
+    EventoUserResult.objects.bulk_create(
+        [
+            EventoUserResult(user_id=user_id, evento_id=evento_id, total_points=totals.get(user_id, 0))
+            for user_id in missing_users
+        ],
+        ignore_conflicts=True,
+    )
+    return True
+
+
+def _apply_point_delta(pelea, evento_id, prediction_values, delta):
+    """Add `delta` points to every participant that predicted one of `prediction_values`."""
+    if not prediction_values:
+        return 0
+
+    voters = Prediccion.objects.filter(
+        pelea=pelea,
+        prediccion__in=prediction_values,
+    ).values('user_id')
+
+    return EventoUserResult.objects.filter(
+        evento_id=evento_id,
+        user_id__in=voters,
+    ).update(total_points=F('total_points') + delta)
+
+
+def _point_deltas(pelea, lost_values, gained_values):
+    """Per-user point change for this fight, as {user_pk: +1/-1}."""
+    deltas = {}
+    for user_id, prediccion in Prediccion.objects.filter(
+        pelea=pelea,
+        prediccion__in=lost_values + gained_values,
+    ).values_list('user_id', 'prediccion'):
+        deltas[user_id] = (prediccion in gained_values) - (prediccion in lost_values)
+    return {user_id: delta for user_id, delta in deltas.items() if delta}
+
+
+def apply_result_change(pelea, resultado):
+    """
+    Set the result of a fight and update participant totals incrementally.
+
+    Only the users that predicted this fight are touched: those whose pick
+    matched the previous result lose one point and those whose pick matches
+    the new result gain one, in two set-based UPDATEs. Works both for a
+    result set for the first time and for a corrected result.
+
+    Returns a dict with the previous result and how many participants gained
+    and lost a point.
+    """
+    with transaction.atomic():
+        previous = (
+            Pelea.objects.select_for_update()
+            .filter(pk=pelea.pk)
+            .values_list('resultado', flat=True)
+            .get()
+        )
+        evento_id = pelea.ronda.evento_id
+
+        pelea.resultado = resultado
+        if normalize_prediction_value(previous) == normalize_prediction_value(resultado):
+            pelea.save(update_fields=['resultado'])
+            return {'previous': previous, 'gained': 0, 'lost': 0}
+
+        created = _ensure_participations(pelea, evento_id)
+
+        lost_values = prediction_values_for_result(previous)
+        gained_values = prediction_values_for_result(resultado)
+        lost = _apply_point_delta(pelea, evento_id, lost_values, -1)
+        gained = _apply_point_delta(pelea, evento_id, gained_values, +1)
+
+        pelea.save(update_fields=['resultado'])
+
+        if created:
+            send_scores_changed(evento_id)
+        else:
+            send_scores_changed(evento_id, deltas=_point_deltas(pelea, lost_values, gained_values))
+
+    logger.info(
+        f"Pelea {pelea.pk} result {previous or '-'} -> {resultado or '-'}: "
+        f"{gained} participants gained, {lost} lost a point"
+    )
+    return {'previous': previous, 'gained': gained, 'lost': lost}
+
+
+# ============================================================================
+# VECTORIZED WHOLE-EVENT RECOMPUTATION
+# ============================================================================
+
+# The users x fights matrix holds the same codes as the packed store
+# (eventos.packed.PREDICTION_CODES) as int8.
+
+
+def _prediction_code_expression(field):
+    cases = [When(**{field: value}, then=Value(code)) for value, code in PREDICTION_CODES.items()]
+    return Case(*cases, default=Value(0), output_field=IntegerField())
+
+
+def _fetch_int_matrix(queryset, columns):
+    """
+    Read an all-integer values_list() straight into a (rows, columns) int64
+    array. The SQL runs on a plain cursor to skip the per-row model field
+    converters, which dominate the cost on events with 100k+ predictions.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return np.empty((0, columns), dtype=np.int64)
+    return np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * columns
+    ).reshape(len(rows), columns)
+
+
+def load_event_matrix(evento_id):
+    """
+    Load an event's participants, fights and predictions into NumPy arrays.
+
+    Returns a dict with:
+      - participation_ids / user_ids / stored_points: one entry per EventoUserResult
+      - fight_ids / results: one entry per Pelea, results as int8 codes
+      - picks: users x fights int8 matrix of prediction codes
+    Three queries in total, whatever the size of the event.
+    """
+    fights = _fetch_int_matrix(
+        Pelea.objects.filter(ronda__evento_id=evento_id)
+        .order_by('id')
+        .annotate(code=_prediction_code_expression('resultado'))
+        .values_list('id', 'code'),
+        2,
+    )
+    participants = _fetch_int_matrix(
+        EventoUserResult.objects.filter(evento_id=evento_id)
+        .order_by('user_id')
+        .values_list('id', 'user_id', 'total_points'),
+        3,
+    )
+    predictions = _fetch_int_matrix(
+        Prediccion.objects.filter(evento_id=evento_id)
+        .annotate(code=_prediction_code_expression('prediccion'))
+        .values_list('user_id', 'pelea_id', 'code'),
+        3,
+    )
+
+    fight_ids = fights[:, 0]
+    user_ids = participants[:, 1]
+    picks = np.zeros((len(user_ids), len(fight_ids)), dtype=np.int8)
+
+    if len(predictions) and len(user_ids) and len(fight_ids):
+        rows = np.searchsorted(user_ids, predictions[:, 0]).clip(max=len(user_ids) - 1)
+        cols = np.searchsorted(fight_ids, predictions[:, 1]).clip(max=len(fight_ids) - 1)
+        # Predictions from users without a participation record have nowhere
+        # to be written back to, so they are dropped here.
+        known = (user_ids[rows] == predictions[:, 0]) & (fight_ids[cols] == predictions[:, 1])
+        picks[rows[known], cols[known]] = predictions[known, 2]
+
+    return {
+        'participation_ids': participants[:, 0],
+        'user_ids': user_ids,
+        'stored_points': participants[:, 2],
+        'fight_ids': fight_ids,
+        'results': fights[:, 1].astype(np.int8),
+        'picks': picks,
+    }
+
+
+def compute_points(picks, results):
+    """Points per user: picks equal to a decided result, summed across fights."""
+    decided = results != 0
+    return ((picks == results) & decided).sum(axis=1, dtype=np.int32)
+
+
+def packed_points(evento_id, user_ids, write=True):
+    """
+    Points of the given users from the packed store, in the same order.
+    The event is packed again first, so rows never stored there are
+    counted; with write=False the rows are only packed in memory.
+    """
+    rows = event_rows(evento_id)
+    if write:
+        store_event_rows(evento_id, rows)
+    points = score_event(evento_id, rows)
+    return np.array([points.get(int(user_id), 0) for user_id in user_ids], dtype=np.int32)
+
+
+def recompute_event_scores(evento_id, write=True, packed=False):
+    """
+    Recompute every EventoUserResult.total_points of an event in one
+    vectorized pass and write back the ones that drifted with a single
+    bulk update. With `packed`, the points are scored from the packed
+    store (eventos.packed) instead of the users x fights matrix.
+
+    Returns a dict with the matrix shape and the list of drifted rows as
+    (user_id, stored_points, computed_points) tuples.
+    """
+    matrix = load_event_matrix(evento_id)
+    if packed:
+        computed = packed_points(evento_id, matrix['user_ids'], write=write)
+    else:
+        computed = compute_points(matrix['picks'], matrix['results'])
+    drifted = np.flatnonzero(computed != matrix['stored_points'])
+
+    drift = [
+        (int(matrix['user_ids'][i]), int(matrix['stored_points'][i]), int(computed[i]))
+        for i in drifted
+    ]
+
+    updated = 0
+    if write and len(drifted):
+        with transaction.atomic():
+            updated = EventoUserResult.objects.bulk_update(
+                [
+                    EventoUserResult(id=int(matrix['participation_ids'][i]), total_points=int(computed[i]))
+                    for i in drifted
+                ],
+                ['total_points'],
+            )
+            send_scores_changed(evento_id)
+        logger.info(f"Evento {evento_id}: recomputed scores, {updated} totals repaired")
+
+    return {
+        'participants': len(matrix['user_ids']),
+        'fights': len(matrix['fight_ids']),
+        'drift': drift,
+        'updated': updated,
+    }
@@ -0,0 +1,70 @@
+import datetime
+import re
+
+from django.utils.dateparse import parse_date
+
+from accounts.search import FtsIndex, keyset_page
+from .models import Evento
+
+EVENTO_SEARCH_FIELDS = ('nombre', 'ubicacion')
+EVENTO_ORDERING = ('-fecha', '-id')
+
+evento_search_index = FtsIndex(Evento, EVENTO_SEARCH_FIELDS)
+
+# Words of the search box that are dates: 2025, 2025-03 or 2025-03-14
+_DATE_TERM = re.compile(r'^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?$')
+
+
+def _date_term_range(term):
+    """(first_day, last_day) covered by a year/month/day search term, or None."""
+    match = _DATE_TERM.match(term)
+    if not match:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    try:
+        if day:
+            first = last = datetime.date(year, month, day)
+        elif month:
+            first = datetime.date(year, month, 1)
+            last = (first + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        else:
+            first, last = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    except ValueError:
+        return None
+    return first, last
+
+
+def parse_date_param(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def search_eventos(query='', desde=None, hasta=None, cursor=None, size=20):
+    """
+    Events matching `query`, newest first, one keyset page at a time.
+
+    Words of the query go to the full-text index on name and location;
+    date-like words (2025, 2025-03, 2025-03-14) and `desde` / `hasta` become
+    a range on the indexed `fecha` column instead of a text match.
+    Returns (eventos, next_cursor).
+    """
+    eventos = Evento.objects.all()
+
+    text_terms = []
+    for term in query.split():
+        date_range = _date_term_range(term)
+        if date_range:
+            eventos = eventos.filter(fecha__range=date_range)
+        else:
+            text_terms.append(term)
+
+    if text_terms:
+        eventos = evento_search_index.filter(eventos, ' '.join(text_terms))
+    if desde:
+        eventos = eventos.filter(fecha__gte=desde)
+    if hasta:
+        eventos = eventos.filter(fecha__lte=hasta)
+
+    return keyset_page(eventos, EVENTO_ORDERING, cursor=cursor, size=size)
@@ -1,8 +1,113 @@
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
-from .models import Evento
-
-@receiver(pre_save, sender=Evento)
-def ensure_single_current_event(sender, instance, **kwargs):
-    if instance.current:  # If an event is marked as current
-        sender.objects.filter(current=True).exclude(pk=instance.pk).update(current=False)
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver, Signal
+from . import equipos, leaderboard, packed, realtime
+from .cache import invalidate_current_event
+from .models import Evento, Ronda, Pelea, Prediccion, EventoUserResult, NombreEquipo
+
+# Sent after commit whenever participant totals change outside of a model
+# save (set-based UPDATEs, bulk writes). Arguments: evento_id, and either
+# deltas={user_pk: points gained} or totals={user_pk: new total}; with
+# neither, every total of the event may have changed.
+scores_changed = Signal()
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+@receiver(post_save, sender=Ronda)
+@receiver(post_delete, sender=Ronda)
+@receiver(post_save, sender=Pelea)
+@receiver(post_delete, sender=Pelea)
+@receiver(post_save, sender=NombreEquipo)
+@receiver(post_delete, sender=NombreEquipo)
+def invalidate_current_event_snapshot(sender, instance, **kwargs):
+    # Wait for the commit so no reader can cache the pre-change rows under the new version
+    transaction.on_commit(invalidate_current_event, robust=True)
+
+
+@receiver(post_save, sender=NombreEquipo)
+@receiver(post_delete, sender=NombreEquipo)
+def invalidate_team_map(sender, instance, **kwargs):
+    evento_id = instance.evento_id
+    transaction.on_commit(lambda: equipos.invalidate_team_map(evento_id), robust=True)
+
+
+# Single Prediccion writes (admin, shell) are mirrored into the packed store;
+# bulk writes call eventos.packed.store_picks() themselves.
+
+@receiver(post_save, sender=Prediccion)
+def prediction_saved(sender, instance, **kwargs):
+    code = packed.PREDICTION_CODES[instance.prediccion]
+    packed.update_picks(instance.user_id, instance.evento_id, {instance.pelea.posicion: code})
+
+
+def _deleted_through(origin, model):
+    """Whether a delete was started on `model` (an instance or a queryset)."""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_delete, sender=Prediccion)
+def prediction_deleted(sender, instance, origin=None, **kwargs):
+    # Predictions deleted along with their user or event need nothing, the
+    # packed row goes with them; deleted fights are handled below.
+    if _deleted_through(origin, Prediccion):
+        packed.update_picks(instance.user_id, instance.evento_id, {instance.pelea.posicion: 0})
+
+
+# The positions of deleted fights are handed out again, so their old picks
+# must not survive in the packed rows. A round clears all of its fights'
+# slots in one pass before they are deleted; deleting the event removes the
+# packed rows themselves.
+
+@receiver(pre_delete, sender=Ronda)
+def round_deleting(sender, instance, origin=None, **kwargs):
+    if not _deleted_through(origin, Evento):
+        packed.clear_positions(instance.evento_id, instance.peleas.values_list('posicion', flat=True))
+
+
+@receiver(post_delete, sender=Pelea)
+def fight_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_through(origin, Evento) or _deleted_through(origin, Ronda):
+        return
+    evento_id = Ronda.objects.filter(pk=instance.ronda_id).values_list('evento_id', flat=True).first()
+    if evento_id is not None:
+        packed.clear_positions(evento_id, [instance.posicion])
+
+
+@receiver(post_save, sender=EventoUserResult)
+def participation_saved(sender, instance, **kwargs):
+    send_scores_changed(instance.evento_id, totals={instance.user_id: instance.total_points})
+
+
+@receiver(post_delete, sender=EventoUserResult)
+def participation_deleted(sender, instance, **kwargs):
+    send_scores_changed(instance.evento_id)
+
+
+# scores_changed receivers run in connection order: the leaderboard must be
+# updated before the new ranks are broadcast.
+
+@receiver(scores_changed)
+def update_leaderboard(sender, evento_id, deltas=None, totals=None, **kwargs):
+    leaderboard.apply_score_change(evento_id, deltas=deltas, totals=totals)
+
+
+@receiver(scores_changed)
+def broadcast_rank_changes(sender, evento_id, deltas=None, totals=None, **kwargs):
+    if not Evento.objects.filter(pk=evento_id, ranking_visible=True).exists():
+        return
+    if deltas is None and totals is None:
+        user_pks = None
+    else:
+        user_pks = set(deltas or ()) | set(totals or ())
+    realtime.publish_rank_changes(evento_id, leaderboard.get_leaderboard(evento_id), user_pks)
+
+
+def send_scores_changed(evento_id, deltas=None, totals=None):
+    """
+    Notify scores_changed once the current transaction commits. A failing
+    receiver is logged, never raised: the scores are already committed.
+    """
+    transaction.on_commit(lambda: scores_changed.send(
+        sender=EventoUserResult, evento_id=evento_id, deltas=deltas, totals=totals
+    ), robust=True)
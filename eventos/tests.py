@@ -1,3 +1,977 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import RestrictedError
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from accounts.tokens import issue_token
+from QuinielaGalleraDash.db import retry_on_locked
+from . import leaderboard, packed, realtime
+from .cache import (
+    CURRENT_EVENT_VERSION, aget_version, bump_version, current_event_etag, get_version, invalidate_current_event,
+)
+from .models import Evento, EventoUserResult, NombreEquipo, Pelea, Prediccion, PrediccionCompacta, Ronda
+from .packed import pack, pack_event, score, score_event, score_rows, unpack, user_picks
+from .reports import CSV_HEADER, csv_safe, iter_event_results_csv
+from .search import search_eventos
+from .scoring import apply_result_change, compute_points, recompute_event_scores
+from .views import MAX_REPORTED_CARD_ERRORS
+
+# A full table scan in SQLite's EXPLAIN QUERY PLAN output: "SCAN <table>",
+# optionally "USING [COVERING] INDEX ..." (which still reads the whole index)
+SCAN = re.compile(r'\bSCAN (?!CONSTANT|SUBQUERY)(\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+
+# Scanning a partial index only reads the rows it covers, not the table
+PARTIAL_INDEXES = {'evento_single_current'}
+
+# Keep tests out of the shared file cache in BASE_DIR/cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def teams(evento):
+    """equipo1 / equipo2 kwargs for a Pelea of `evento`."""
+    return {
+        'equipo1': NombreEquipo.objects.create(evento=evento, valor=1, nombre='Rojo'),
+        'equipo2': NombreEquipo.objects.create(evento=evento, valor=2, nombre='Azul'),
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+@override_settings(CACHES=TEST_CACHES)
+class HotQueryPlanTests(TestCase):
+    """
+    Every query on the request hot path must be answered from an index.
+    A failure here means a change to a query or to the indexes made one of
+    them fall back to scanning a whole table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(user_id='plan-user', password='x')
+        cls.evento = Evento.objects.create(nombre='Plan', fecha='2025-01-01', ubicacion='X', current=True)
+        cls.ronda = Ronda.objects.create(evento=cls.evento, numero=1)
+        cls.pelea = Pelea.objects.create(ronda=cls.ronda, **teams(cls.evento))
+        Prediccion.objects.create(user=cls.user, pelea=cls.pelea, prediccion='equipo1')
+        EventoUserResult.objects.create(user=cls.user, evento=cls.evento, total_points=0)
+
+    def plan(self, queryset):
+        return queryset.explain()
+
+    def assertNoFullScan(self, queryset):
+        plan = self.plan(queryset)
+        full_scans = [match.group(0) for match in SCAN.finditer(plan) if match.group(2) not in PARTIAL_INDEXES]
+        self.assertFalse(full_scans, f'Full scan in query plan:\n{plan}\n\nSQL: {queryset.query}')
+
+    def assertOrderedByIndex(self, queryset):
+        plan = self.plan(queryset)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f'Sort not served by an index:\n{plan}')
+
+    def test_current_event(self):
+        self.assertNoFullScan(Evento.objects.filter(current=True))
+
+    def test_event_listing(self):
+        eventos = Evento.objects.filter(fecha__lt='2025-06-01').order_by('-fecha', '-id')[:21]
+        self.assertNoFullScan(eventos)
+        self.assertOrderedByIndex(eventos)
+
+    def test_event_rounds(self):
+        rondas = Ronda.objects.filter(evento=self.evento).order_by('numero')
+        self.assertNoFullScan(rondas)
+        self.assertOrderedByIndex(rondas)
+
+    def test_fights_by_round(self):
+        self.assertNoFullScan(Pelea.objects.filter(ronda_id__in=[self.ronda.id]))
+        self.assertNoFullScan(Pelea.objects.filter(ronda__evento=self.evento))
+
+    def test_user_predictions_for_event(self):
+        self.assertNoFullScan(Prediccion.objects.filter(evento=self.evento, user=self.user))
+
+    def test_fight_voters(self):
+        voters = Prediccion.objects.filter(
+            pelea=self.pelea,
+            prediccion__in=['empate', 'tie'],
+        ).values_list('user_id', 'prediccion')
+        self.assertNoFullScan(voters)
+        self.assertIn('COVERING INDEX', self.plan(voters))
+
+    def test_event_predictions(self):
+        self.assertNoFullScan(
+            Prediccion.objects.filter(evento_id=self.evento.id).values_list('user_id', 'pelea_id')
+        )
+
+    def test_participation_lookup(self):
+        self.assertNoFullScan(EventoUserResult.objects.filter(user=self.user, evento=self.evento))
+
+    def test_rankings(self):
+        top = EventoUserResult.objects.filter(evento=self.evento).order_by('-total_points')[:10]
+        self.assertNoFullScan(top)
+        self.assertOrderedByIndex(top)
+
+    def test_leaderboard_load(self):
+        self.assertNoFullScan(
+            EventoUserResult.objects.filter(evento_id=self.evento.id).values_list(
+                'user_id', 'total_points', 'user__user_id', 'user__nombre', 'user__apellido'
+            )
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SingleCurrentEventTests(TestCase):
+
+    def test_second_current_event_is_rejected(self):
+        Evento.objects.create(nombre='A', fecha='2025-01-01', ubicacion='X', current=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Evento.objects.create(nombre='B', fecha='2025-01-02', ubicacion='X', current=True)
+
+    def test_many_inactive_events_are_allowed(self):
+        Evento.objects.create(nombre='A', fecha='2025-01-01', ubicacion='X')
+        Evento.objects.create(nombre='B', fecha='2025-01-02', ubicacion='X')
+        self.assertEqual(Evento.objects.filter(current=False).count(), 2)
+
+
+# ============================================================================
+# BACKEND-AGNOSTIC BEHAVIOUR (run with DB_ENGINE=postgresql as well)
+# ============================================================================
+
+@override_settings(CACHES=TEST_CACHES)
+class ScoringUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True)
+        ronda = Ronda.objects.create(evento=cls.evento, numero=1)
+        cls.pelea = Pelea.objects.create(ronda=ronda, **teams(cls.evento))
+        cls.users = {}
+        for user_id, pick in (('uno', 'equipo1'), ('dos', 'equipo2'), ('tres', 'empate')):
+            user = CustomUser.objects.create(user_id=user_id, password='x')
+            Prediccion.objects.create(user=user, pelea=cls.pelea, evento=cls.evento, prediccion=pick)
+            EventoUserResult.objects.create(user=user, evento=cls.evento, total_points=0)
+            cls.users[user_id] = user
+
+    def points(self):
+        return dict(
+            EventoUserResult.objects.filter(evento=self.evento).values_list('user__user_id', 'total_points')
+        )
+
+    def test_first_result_awards_points(self):
+        apply_result_change(self.pelea, 'equipo1')
+        self.assertEqual(self.points(), {'uno': 1, 'dos': 0, 'tres': 0})
+
+    def test_corrected_result_moves_points(self):
+        apply_result_change(self.pelea, 'equipo1')
+        apply_result_change(self.pelea, 'equipo2')
+        self.assertEqual(self.points(), {'uno': 0, 'dos': 1, 'tres': 0})
+
+    def test_tie_result_matches_empate_prediction(self):
+        apply_result_change(self.pelea, 'tie')
+        self.assertEqual(self.points(), {'uno': 0, 'dos': 0, 'tres': 1})
+
+    def test_cleared_result_takes_points_back(self):
+        apply_result_change(self.pelea, 'equipo1')
+        apply_result_change(self.pelea, '')
+        self.assertEqual(self.points(), {'uno': 0, 'dos': 0, 'tres': 0})
+
+    def test_recompute_agrees_with_incremental_updates(self):
+        apply_result_change(self.pelea, 'tie')
+        result = recompute_event_scores(self.evento.id, write=False)
+        self.assertEqual(result['drift'], [])
+
+        # Verifying from the packed store packs in memory only
+        PrediccionCompacta.objects.all().delete()
+        result = recompute_event_scores(self.evento.id, write=False, packed=True)
+        self.assertEqual(result['drift'], [])
+        self.assertFalse(PrediccionCompacta.objects.exists())
+        recompute_event_scores(self.evento.id, packed=True)
+        self.assertEqual(PrediccionCompacta.objects.filter(evento=self.evento).count(), 3)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResultsListingTests(TestCase):
+
+    def test_counts_are_not_multiplied_by_joins(self):
+        evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X')
+        equipos = teams(evento)
+        for numero in (1, 2):
+            ronda = Ronda.objects.create(evento=evento, numero=numero)
+            for _ in range(2):
+                Pelea.objects.create(ronda=ronda, **equipos)
+        for user_id in ('a', 'b', 'c'):
+            user = CustomUser.objects.create(user_id=user_id, password='x')
+            EventoUserResult.objects.create(user=user, evento=evento)
+        Evento.objects.create(nombre='Vacio', fecha='2025-02-01', ubicacion='X')
+
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+        response = self.client.get(reverse('lista_eventos_resultados'))
+
+        counts = {e.nombre: (e.num_participantes, e.total_peleas) for e in response.context['eventos']}
+        self.assertEqual(counts, {'E': (3, 4), 'Vacio': (0, 0)})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventResultsPageTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+
+    def event_with(self, participants):
+        evento = Evento.objects.create(nombre=f'E{participants}', fecha='2025-01-01', ubicacion='X')
+        ronda = Ronda.objects.create(evento=evento, numero=1)
+        equipos = teams(evento)
+        peleas = [
+            Pelea.objects.create(ronda=ronda, resultado=resultado, **equipos)
+            for resultado in ('equipo1', 'tie', '')
+        ]
+        for i in range(participants):
+            user = CustomUser.objects.create(user_id=f'{evento.id}-{i:02}', password='x')
+            # Even users get 2 right, odd users 1 right and 1 wrong; the last fight is pending
+            picks = ('equipo1' if i % 2 == 0 else 'equipo2', 'empate', 'equipo1')
+            Prediccion.objects.bulk_create([
+                Prediccion(user=user, pelea=pelea, evento=evento, prediccion=pick) for pelea, pick in zip(peleas, picks)
+            ])
+            EventoUserResult.objects.create(user=user, evento=evento, total_points=2 if i % 2 == 0 else 1)
+        return evento
+
+    def get(self, evento, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('ver_resultados_evento', args=[evento.id]), params)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_participants(self):
+        _, one = self.get(self.event_with(1))
+        response, thirty = self.get(self.event_with(30))
+        self.assertEqual(thirty, one)
+
+        context = response.context
+        self.assertEqual(len(context['resultados_usuarios']), 25)
+        self.assertEqual(context['total_participantes'], 30)
+        self.assertEqual(
+            (context['total_peleas'], context['peleas_resueltas'], context['peleas_pendientes']), (3, 2, 1),
+        )
+        first = context['resultados_usuarios'][0]
+        self.assertEqual((first.total_points, first.correctas, first.incorrectas, first.pendientes), (2, 2, 0, 1))
+        self.assertEqual((first.total_predicciones, first.precision), (3, 100.0))
+        self.assertEqual([p.es_correcta for p in first.predicciones], [True, True, None])
+
+    def test_last_page(self):
+        evento = self.event_with(30)
+        response, _ = self.get(evento, page=2)
+        rows = response.context['resultados_usuarios']
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row.total_points == 1 for row in rows))
+        self.assertEqual((rows[0].correctas, rows[0].incorrectas, rows[0].precision), (1, 1, 50.0))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResultsExportTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X')
+        ronda = Ronda.objects.create(evento=self.evento, numero=1)
+        rojo = NombreEquipo.objects.create(evento=self.evento, valor=1, nombre='=cmd|"/c calc"!A1')
+        azul = NombreEquipo.objects.create(evento=self.evento, valor=2, nombre='Azul')
+        self.peleas = [
+            Pelea.objects.create(ronda=ronda, equipo1=rojo, equipo2=azul, resultado='equipo1'),
+            Pelea.objects.create(ronda=ronda, equipo1=azul, equipo2=rojo),
+        ]
+        self.user = CustomUser.objects.create(user_id='@uno', password='x', nombre='+Ana', apellido='-Ruiz')
+        EventoUserResult.objects.create(user=self.user, evento=self.evento, total_points=1)
+        for pelea in self.peleas:
+            Prediccion.objects.create(user=self.user, pelea=pelea, prediccion='equipo1')
+
+    def test_one_row_per_pick_with_formulas_escaped(self):
+        rows = list(csv.reader(iter_event_results_csv(self.evento)))
+        self.assertEqual(rows[0], CSV_HEADER)
+        self.assertEqual(rows[1:], [
+            ["'@uno", "'+Ana", "'-Ruiz", '1', '1', str(self.peleas[0].id),
+             '\'=cmd|"/c calc"!A1', 'Azul', 'equipo1', 'equipo1', '1'],
+            ["'@uno", "'+Ana", "'-Ruiz", '1', '1', str(self.peleas[1].id),
+             'Azul', '\'=cmd|"/c calc"!A1', 'equipo1', '', ''],
+        ])
+        self.assertEqual([csv_safe(v) for v in ('\tx', '\rx', 'x-y', -1)], ["'\tx", "'\rx", 'x-y', -1])
+
+    def test_export_view_streams_the_sheet_to_admins(self):
+        url = reverse('exportar_resultados_csv', args=[self.evento.id])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="resultados_evento_{self.evento.id}.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][6], '\'=cmd|"/c calc"!A1')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventoSearchTests(TestCase):
+    """Event search; runs against SQLite (FTS5) and PostgreSQL (pg_trgm)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, ubicacion, fecha in [
+            ('Gran Derby', 'Santiago', '2025-03-14'),
+            ('Copa Norte', 'Puerto Plata', '2025-03-02'),
+            ('Copa Sur', 'Barahona', '2025-07-20'),
+            ('Derby Anual', 'Santo Domingo', '2024-12-31'),
+        ]:
+            Evento.objects.create(nombre=nombre, ubicacion=ubicacion, fecha=fecha)
+        for i in range(5):
+            Evento.objects.create(nombre=f'Torneo {i}', ubicacion='Moca', fecha='2025-05-01')
+
+    def nombres(self, query='', **kwargs):
+        return [evento.nombre for evento in search_eventos(query, **kwargs)[0]]
+
+    def test_date_terms(self):
+        self.assertEqual(len(self.nombres('2025')), 8)
+        self.assertEqual(self.nombres('2025-03'), ['Gran Derby', 'Copa Norte'])
+        self.assertEqual(self.nombres('2025-03-14'), ['Gran Derby'])
+        self.assertEqual(self.nombres('derby 2025'), ['Gran Derby'])
+        # Not a date, so it is searched as text
+        self.assertEqual(self.nombres('2025-13'), [])
+
+    def test_desde_and_hasta(self):
+        desde, hasta = datetime.date(2025, 3, 5), datetime.date(2025, 7, 20)
+        self.assertEqual(self.nombres('copa', desde=desde), ['Copa Sur'])
+        self.assertEqual(len(self.nombres(desde=desde, hasta=hasta)), 7)
+        self.assertEqual(self.nombres(hasta=datetime.date(2025, 1, 1)), ['Derby Anual'])
+
+    def test_name_and_location_match(self):
+        self.assertEqual(self.nombres('santiago'), ['Gran Derby'])
+        self.assertEqual(self.nombres('SANTO dom'), ['Derby Anual'])
+        self.assertEqual(self.nombres('copa plata'), ['Copa Norte'])
+        self.assertEqual(self.nombres('derby'), ['Gran Derby', 'Derby Anual'])
+
+    def test_keyset_pages_follow_fecha_then_id(self):
+        seen = []
+        cursor = None
+        while True:
+            eventos, cursor = search_eventos(cursor=cursor, size=4)
+            seen += [evento.pk for evento in eventos]
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(Evento.objects.order_by('-fecha', '-id').values_list('pk', flat=True)))
+        self.assertEqual(len(seen), 9)
+
+    def test_list_view_filters(self):
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+        response = self.client.get(reverse('listar_eventos'), {'search': 'copa', 'desde': '2025-03-05', 'hasta': 'mal'})
+        self.assertEqual([evento.nombre for evento in response.context['eventos']], ['Copa Sur'])
+        self.assertEqual(response.context['filters_query'], 'search=copa&desde=2025-03-05')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TeamLookupTests(TestCase):
+
+    def setUp(self):
+        # Cache invalidation runs on commit, which TestCase never reaches on its own
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True)
+            self.rojo = NombreEquipo.objects.create(evento=self.evento, valor=1, nombre='Rojo')
+            NombreEquipo.objects.create(evento=self.evento, valor=2, nombre='Azul')
+
+    def lookup(self, valor):
+        return self.client.get(reverse('buscar_equipo_global'), {'valor': valor})
+
+    def test_lookup_is_served_from_memory(self):
+        self.lookup(1)
+        with self.assertNumQueries(0):
+            response = self.lookup(1)
+        self.assertEqual(response.json(), {'nombre': 'Rojo'})
+
+    def test_renamed_team_is_seen(self):
+        self.lookup(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rojo.nombre = 'Carmesí'
+            self.rojo.save()
+        self.assertEqual(self.lookup(1).json(), {'nombre': 'Carmesí'})
+
+    def test_deleted_team_is_not_found(self):
+        self.lookup(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rojo.delete()
+        self.assertEqual(self.lookup(1).status_code, 404)
+
+    def test_no_current_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento.current = False
+            self.evento.save()
+        self.assertEqual(self.lookup(1).status_code, 404)
+
+    def test_batch_lookup(self):
+        url = reverse('buscar_equipos_global')
+        response = self.client.get(url, {'valores': '2,1,9,1'})
+        self.assertEqual(response.json(), {
+            'evento_id': self.evento.id,
+            'nombres': {'2': 'Azul', '1': 'Rojo'},
+            'no_encontrados': [9],
+        })
+        response = self.client.post(url, json.dumps({'valores': [1, 'x']}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CrearRondasTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X')
+        for valor in range(1, 11):
+            NombreEquipo.objects.create(evento=self.evento, valor=valor, nombre=f'Equipo {valor}')
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+        self.url = reverse('crear_rondas', args=[self.evento.id])
+
+    def card(self, rondas, peleas):
+        data = {}
+        for ronda in range(1, rondas + 1):
+            for pelea in range(1, peleas + 1):
+                data[f'equipo1-round-{ronda}-match-{pelea}'] = '1'
+                data[f'equipo2-round-{ronda}-match-{pelea}'] = f'{pelea % 9 + 2}: Equipo'
+        return data
+
+    def test_card_is_written_with_a_constant_number_of_queries(self):
+        Ronda.objects.create(evento=self.evento, numero=1)
+        # session, user, event, team map, existing rounds, one insert for the
+        # new rounds, the event lock and last fight position, one insert for
+        # all the fights, plus the savepoint pair
+        with self.assertNumQueries(11), self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, self.card(rondas=3, peleas=20))
+        self.assertRedirects(response, reverse('detalle_evento', args=[self.evento.id]), fetch_redirect_response=False)
+        self.assertEqual(Ronda.objects.filter(evento=self.evento).count(), 3)
+        self.assertEqual(Pelea.objects.filter(ronda__evento=self.evento).count(), 60)
+        # The snapshot invalidation that bulk_create would otherwise skip
+        self.assertEqual(len(callbacks), 1)
+
+    def test_invalid_card_writes_nothing_and_reports_each_fight(self):
+        data = self.card(rondas=2, peleas=2)
+        data['equipo2-round-1-match-2'] = '99'
+        data['equipo1-round-2-match-1'] = 'abc'
+        del data['equipo2-round-2-match-2']
+        response = self.client.post(self.url, data, follow=True)
+
+        self.assertFalse(Ronda.objects.filter(evento=self.evento).exists())
+        self.assertEqual([str(m) for m in response.context['messages']], [
+            '❌ Ronda 1, pelea 2: equipo con valor 99 no encontrado',
+            '❌ Ronda 2, pelea 1: el valor "abc" del equipo1 debe ser numérico',
+            '❌ Ronda 2, pelea 2: falta el equipo2',
+        ])
+
+    def test_long_error_lists_are_summarized(self):
+        data = {key: '99' for key in self.card(rondas=1, peleas=30) if key.startswith('equipo2')}
+        data['equipo1-round-1-match-1'] = '1'
+        response = self.client.post(self.url, data, follow=True)
+
+        messages = [str(m) for m in response.context['messages']]
+        self.assertEqual(len(messages), MAX_REPORTED_CARD_ERRORS + 1)
+        self.assertEqual(messages[0], '❌ Ronda 1, pelea 1: equipo con valor 99 no encontrado')
+        self.assertEqual(messages[-1], f'❌ ... y {59 - MAX_REPORTED_CARD_ERRORS} errores más')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventBuilderTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(user_id='admin', password='x', is_staff=True))
+        self.teams = [{'number': str(n), 'name': f'Equipo {n}'} for n in range(1, 6)]
+        self.fights = [
+            {'team1': '1', 'team2': '2', 'round_number': 1, 'numero_pelea': 1},
+            {'team1': '3', 'team2': '4', 'round_number': 1, 'numero_pelea': 2},
+            {'team1': '5', 'team2': '1', 'round_number': 2, 'numero_pelea': 3},
+        ]
+
+    def crear_evento(self, teams, fights):
+        return self.client.post(reverse('crear_evento'), {
+            'nombre': 'Derby', 'fecha_evento': '2025-05-01', 'ubicacion': 'Arena',
+            'teams_data': json.dumps(teams), 'fights_data': json.dumps(fights),
+        })
+
+    def messages_of(self, response):
+        return [str(m) for m in response.context['messages']]
+
+    def test_event_is_created_with_one_insert_per_level(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.crear_evento(self.teams, self.fights)
+        evento = Evento.objects.get()
+        self.assertRedirects(response, reverse('detalle_evento', args=[evento.id]), fetch_redirect_response=False)
+        inserts = [q['sql'].split('"')[1] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(inserts.count('eventos_nombreequipo'), 1)
+        self.assertEqual(inserts.count('eventos_ronda'), 1)
+        self.assertEqual(inserts.count('eventos_pelea'), 1)
+        self.assertEqual(
+            list(Pelea.objects.filter(ronda__evento=evento).order_by('id').values_list('ronda__numero', 'equipo1__nombre', 'equipo2__nombre')),
+            [(1, 'Equipo 1', 'Equipo 2'), (1, 'Equipo 3', 'Equipo 4'), (2, 'Equipo 5', 'Equipo 1')],
+        )
+
+    def test_invalid_card_writes_nothing(self):
+        response = self.crear_evento(self.teams + [{'number': '1', 'name': 'Repetido'}], self.fights)
+        self.assertEqual(self.messages_of(response), ['❌ Equipo #1: número repetido'])
+
+        fights = self.fights + [{'team1': '1', 'team2': '99', 'numero_pelea': 4}]
+        response = self.crear_evento(self.teams, fights)
+        self.assertEqual(self.messages_of(response), ['❌ Pelea #4: el equipo #99 no está registrado'])
+
+        self.assertFalse(Evento.objects.exists())
+
+    def test_add_round_rejects_an_existing_round(self):
+        self.crear_evento(self.teams, self.fights)
+        evento = Evento.objects.get()
+        url = reverse('add_round', args=[evento.id])
+        fights = [{'team1': '2', 'team2': '3', 'numero_pelea': 1}]
+
+        self.client.post(url, {'round_number': 2, 'fights_data': json.dumps(fights)})
+        self.assertEqual(Pelea.objects.filter(ronda__evento=evento).count(), 3)
+
+        self.client.post(url, {'round_number': 3, 'fights_data': json.dumps(fights)})
+        self.assertEqual(Pelea.objects.filter(ronda__evento=evento, ronda__numero=3).count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PeleaEquipoTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True)
+            ronda = Ronda.objects.create(evento=self.evento, numero=1)
+            self.equipos = teams(self.evento)
+            self.pelea = Pelea.objects.create(ronda=ronda, **self.equipos)
+
+    def test_renamed_team_is_seen_by_every_fight(self):
+        self.client.get(reverse('get_current_event'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipos['equipo1'].nombre = 'Carmesí'
+            self.equipos['equipo1'].save()
+        pelea = self.client.get(reverse('get_current_event')).json()['rondas'][0]['peleas'][0]
+        self.assertEqual((pelea['equipo1'], pelea['equipo2']), ('Carmesí', 'Azul'))
+
+    def test_team_with_fights_cannot_be_deleted(self):
+        with self.assertRaises(RestrictedError):
+            self.equipos['equipo1'].delete()
+
+    def test_deleting_the_event_deletes_teams_and_fights(self):
+        self.evento.delete()
+        self.assertFalse(NombreEquipo.objects.exists())
+        self.assertFalse(Pelea.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PackedPredictionTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True, results_visible=True)
+        ronda = Ronda.objects.create(evento=self.evento, numero=1)
+        equipos = teams(self.evento)
+        self.peleas = [Pelea.objects.create(ronda=ronda, **equipos) for _ in range(6)]
+        self.user = CustomUser.objects.create(user_id='uno', password='x')
+        EventoUserResult.objects.create(user=self.user, evento=self.evento)
+
+    def test_fights_get_consecutive_positions(self):
+        self.assertEqual([p.posicion for p in self.peleas], list(range(6)))
+        Prediccion.objects.create(user=self.user, pelea=self.peleas[5], prediccion='equipo1')
+        self.peleas[5].delete()
+        self.assertEqual(user_picks(self.user.pk, self.evento.id), {})
+
+        ronda = Ronda.objects.create(evento=self.evento, numero=2)
+        nueva = Pelea.objects.create(ronda=ronda, equipo1=self.peleas[0].equipo1, equipo2=self.peleas[0].equipo2)
+        self.assertEqual(nueva.posicion, 5)
+
+        otro = Evento.objects.create(nombre='F', fecha='2025-01-01', ubicacion='X')
+        otra_ronda = Ronda.objects.create(evento=otro, numero=1)
+        self.assertEqual(Pelea.objects.create(ronda=otra_ronda, **teams(otro)).posicion, 0)
+
+    def test_packed_scores_match_the_matrix(self):
+        rng = np.random.default_rng(7)
+        picks = rng.integers(0, 4, size=(50, 37))
+        results = rng.integers(0, 4, size=37)
+        rows = [pack({i: int(code) for i, code in enumerate(row)}) for row in picks]
+        packed_results = pack({i: int(code) for i, code in enumerate(results)})
+
+        expected = compute_points(picks, results)
+        self.assertEqual(list(score_rows(rows, packed_results)), list(expected))
+        self.assertEqual([score(row, packed_results) for row in rows], list(expected))
+        self.assertEqual(unpack(rows[0]), {i: int(c) for i, c in enumerate(picks[0]) if c})
+
+    def test_submission_is_stored_packed_and_read_back(self):
+        picks = ['equipo1', 'equipo2', 'empate', 'equipo1']
+        response = self.client.post(reverse('submit_predictions'), json.dumps({
+            'user_id': 'uno', 'event_id': self.evento.id,
+            'predictions': [{'pelea_id': p.id, 'prediccion': v} for p, v in zip(self.peleas, picks)],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        row = PrediccionCompacta.objects.get(user=self.user, evento=self.evento)
+        self.assertEqual(len(row.picks), 1)  # 4 fights x 2 bits
+        self.assertEqual(unpack(row.picks), {0: 1, 1: 2, 2: 3, 3: 1})
+
+        for pelea, resultado in zip(self.peleas, ['equipo1', 'equipo1', 'tie']):
+            apply_result_change(pelea, resultado)
+        self.assertEqual(score_event(self.evento.id), {self.user.pk: 2})
+
+        with self.assertNumQueries(4):  # user, event, packed row, fights
+            data = self.client.get(reverse('get_user_results'), {'user_id': 'uno'}).json()
+        self.assertEqual(
+            [(r['pelea_id'], r['prediccion'], r['correct']) for r in data['predictionResults']],
+            [(self.peleas[0].id, 'equipo1', True), (self.peleas[1].id, 'equipo2', False),
+             (self.peleas[2].id, 'empate', True), (self.peleas[3].id, 'equipo1', None)],
+        )
+        self.assertEqual(data['totalPoints'], 2)
+
+    def test_single_writes_are_mirrored(self):
+        prediccion = Prediccion.objects.create(user=self.user, pelea=self.peleas[2], prediccion='equipo2')
+        Prediccion.objects.create(user=self.user, pelea=self.peleas[4], prediccion='empate')
+        self.assertEqual(user_picks(self.user.pk, self.evento.id), {2: 'equipo2', 4: 'empate'})
+
+        prediccion.delete()
+        self.assertEqual(user_picks(self.user.pk, self.evento.id), {4: 'empate'})
+
+    def test_single_write_to_an_unpacked_event_packs_every_pick(self):
+        # Submitted before the packed store existed
+        Prediccion.objects.bulk_create([
+            Prediccion(user=self.user, pelea=self.peleas[0], evento=self.evento, prediccion='equipo1'),
+            Prediccion(user=self.user, pelea=self.peleas[1], evento=self.evento, prediccion='equipo2'),
+        ])
+        prediccion = Prediccion.objects.get(pelea=self.peleas[1])
+        prediccion.prediccion = 'empate'
+        prediccion.save()
+        self.assertEqual(
+            unpack(PrediccionCompacta.objects.get(user=self.user, evento=self.evento).picks), {0: 1, 1: 3},
+        )
+        self.assertEqual(user_picks(self.user.pk, self.evento.id), {0: 'equipo1', 1: 'empate'})
+
+    def test_deleted_fights_are_cleared_once_per_delete(self):
+        Prediccion.objects.create(user=self.user, pelea=self.peleas[5], prediccion='equipo1')
+        Prediccion.objects.create(user=self.user, pelea=self.peleas[0], prediccion='equipo2')
+        otra = Ronda.objects.create(evento=self.evento, numero=2)
+        Prediccion.objects.create(
+            user=self.user, pelea=Pelea.objects.create(ronda=otra, equipo1=self.peleas[0].equipo1, equipo2=self.peleas[0].equipo2),
+            prediccion='empate',
+        )
+
+        with mock.patch.object(packed, 'clear_positions', wraps=packed.clear_positions) as clear:
+            self.peleas[5].delete()
+            self.assertEqual(clear.call_count, 1)
+            otra.delete()
+            self.assertEqual(clear.call_count, 2)
+            self.assertEqual(user_picks(self.user.pk, self.evento.id), {0: 'equipo2'})
+
+            self.evento.delete()
+            self.assertEqual(clear.call_count, 2)
+
+    def test_unpacked_events_fall_back_to_prediccion(self):
+        Prediccion.objects.create(user=self.user, pelea=self.peleas[1], prediccion='equipo1')
+        PrediccionCompacta.objects.all().delete()
+        self.assertEqual(user_picks(self.user.pk, self.evento.id), {1: 'equipo1'})
+
+        self.assertEqual(pack_event(self.evento.id), 1)
+        self.assertEqual(unpack(PrediccionCompacta.objects.get().picks), {1: 1})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsyncApiTests(TestCase):
+    """The mobile read endpoints are async views; none of them may fall back to the sync ORM."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento = Evento.objects.create(
+                nombre='E', fecha='2025-01-01', ubicacion='X', current=True, results_visible=True, ranking_visible=True,
+            )
+            ronda = Ronda.objects.create(evento=self.evento, numero=1)
+            self.pelea = Pelea.objects.create(ronda=ronda, **teams(self.evento))
+        self.user = CustomUser.objects.create(user_id='uno', password='x', nombre='Ana', event_tickets=3)
+        EventoUserResult.objects.create(user=self.user, evento=self.evento, total_points=2)
+        self.token = issue_token(self.user)
+
+    async def test_token_user_gets_the_live_ticket_count(self):
+        response = await self.async_client.get(
+            reverse('check_participation'), {'event_id': self.evento.id}, headers={'X-Api-Token': self.token},
+        )
+        self.assertEqual(response.json(), {
+            'participated': True, 'event_id': self.evento.id, 'event_name': 'E', 'tickets_available': 3,
+        })
+
+    async def test_team_lookup_and_results(self):
+        response = await self.async_client.get(reverse('buscar_equipo_global'), {'valor': 2})
+        self.assertEqual(response.json(), {'nombre': 'Azul'})
+
+        await Prediccion.objects.acreate(user=self.user, pelea=self.pelea, evento=self.evento, prediccion='equipo2')
+        response = await self.async_client.get(reverse('get_user_results'), headers={'X-Api-Token': self.token})
+        self.assertEqual(response.json()['predictionResults'][0]['prediccion'], 'equipo2')
+
+    def test_rankings_load_names_of_new_participants(self):
+        url = reverse('get_rankings', args=[self.evento.id])
+        self.assertEqual([r['nombre'] for r in self.client.get(url).json()['rankings']], ['Ana'])
+
+        otro = CustomUser.objects.create(user_id='dos', password='x', nombre='Beto')
+        EventoUserResult.objects.create(user=otro, evento=self.evento, total_points=5)
+        leaderboard.apply_score_change(self.evento.id, totals={otro.pk: 5})
+        self.assertEqual([r['nombre'] for r in self.client.get(url).json()['rankings']], ['Beto', 'Ana'])
+
+    def test_unchanged_current_event_is_not_modified(self):
+        url = reverse('get_current_event')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    async def test_etag_and_body_share_one_version_read(self):
+        url = reverse('get_current_event')
+        # The sync getter would block the event loop
+        with mock.patch('eventos.cache.get_version', side_effect=AssertionError):
+            first = await self.async_client.get(url)
+            await Evento.objects.filter(pk=self.evento.pk).aupdate(nombre='Nuevo')
+            await sync_to_async(invalidate_current_event)()
+            second = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['ETag'], current_event_etag(await aget_version(CURRENT_EVENT_VERSION)))
+        self.assertEqual(second.json()['nombre'], 'Nuevo')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SubmitPredictionsTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True)
+        ronda = Ronda.objects.create(evento=self.evento, numero=1)
+        self.pelea = Pelea.objects.create(ronda=ronda, **teams(self.evento))
+        self.user = CustomUser.objects.create(user_id='uno', password='x')
+        EventoUserResult.objects.create(user=self.user, evento=self.evento)
+
+    def submit(self):
+        return self.client.post(reverse('submit_predictions'), json.dumps({
+            'user_id': 'uno', 'event_id': self.evento.id,
+            'predictions': [{'pelea_id': self.pelea.id, 'prediccion': 'equipo1'}],
+        }), content_type='application/json')
+
+    def test_second_submission_is_rejected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.submit().status_code, 200)
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('FOR UPDATE' in q['sql'] for q in queries.captured_queries))
+
+        self.assertEqual(self.submit().status_code, 400)
+        self.assertEqual(Prediccion.objects.filter(user=self.user).count(), 1)
+
+    def test_one_pick_per_user_and_fight(self):
+        Prediccion.objects.create(user=self.user, pelea=self.pelea, prediccion='equipo1')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Prediccion.objects.create(user=self.user, pelea=self.pelea, prediccion='equipo2')
+
+
+def locked_once(func):
+    """`func`, raising "database is locked" on its first call only."""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OperationalError('database is locked')
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@override_settings(CACHES=TEST_CACHES)
+@mock.patch('QuinielaGalleraDash.db.time.sleep')
+class RetryOnLockedTests(TransactionTestCase):
+
+    def test_lock_errors_are_retried(self, sleep):
+        write = retry_on_locked()(locked_once(lambda: 'ok'))
+        self.assertEqual(write(), 'ok')
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_other_errors_and_the_last_attempt_are_raised(self, sleep):
+        def broken():
+            raise OperationalError('no such table: x')
+        with self.assertRaisesMessage(OperationalError, 'no such table'):
+            retry_on_locked()(broken)()
+
+        def locked():
+            raise OperationalError('database is locked')
+        with self.assertRaises(OperationalError):
+            retry_on_locked(attempts=3)(locked)()
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_calls_inside_a_transaction_are_not_retried(self, sleep):
+        write = retry_on_locked()(locked_once(lambda: 'ok'))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write()
+        sleep.assert_not_called()
+
+    def test_in_transaction_replaces_the_default_connection_check(self, sleep):
+        write = retry_on_locked(in_transaction=lambda: False)(locked_once(lambda: 'ok'))
+        with transaction.atomic():
+            self.assertEqual(write(), 'ok')
+        self.assertEqual(sleep.call_count, 1)
+
+        write = retry_on_locked(in_transaction=lambda: True)(locked_once(lambda: 'ok'))
+        with self.assertRaises(OperationalError):
+            write()
+
+    def test_lock_error_after_the_commit_is_not_retried(self, sleep):
+        evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', current=True)
+        pelea = Pelea.objects.create(ronda=Ronda.objects.create(evento=evento, numero=1), **teams(evento))
+        user = CustomUser.objects.create(user_id='uno', password='x')
+        EventoUserResult.objects.create(user=user, evento=evento)
+
+        # The leaderboard update runs on commit
+        with mock.patch('eventos.leaderboard.bump_version', locked_once(bump_version)), \
+                self.assertLogs('django.db.backends.base', 'ERROR'):
+            response = self.client.post(reverse('submit_predictions'), json.dumps({
+                'user_id': 'uno', 'event_id': evento.id,
+                'predictions': [{'pelea_id': pelea.id, 'prediccion': 'equipo1'}],
+            }), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Prediccion.objects.filter(user=user).count(), 1)
+        sleep.assert_not_called()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VersionCounterTests(TransactionTestCase):
+    """Concurrent bumps must each get their own, increasing version."""
+
+    WORKERS = 8
+    BUMPS = 50
+
+    def test_flushed_cache_moves_to_a_new_version(self):
+        version = get_version('pruebas')
+        self.assertEqual(get_version('pruebas'), version)
+        cache.clear()
+        self.assertGreater(get_version('pruebas'), version)
+
+    def test_concurrent_bumps_are_not_lost(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Needs a file-backed test database to share between threads')
+        start = get_version('pruebas')
+        barrier = threading.Barrier(self.WORKERS)
+
+        def bump(_):
+            try:
+                barrier.wait()
+                return [bump_version('pruebas') for _ in range(self.BUMPS)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            versions = [v for batch in pool.map(bump, range(self.WORKERS)) for v in batch]
+
+        total = self.WORKERS * self.BUMPS
+        self.assertEqual(len(set(versions)), total)
+        self.assertEqual(max(versions), start + total)
+        self.assertEqual(get_version('pruebas'), start + total)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()  # Version counters are rolled back with each test, cached copies aren't
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X', ranking_visible=True)
+        self.users = []
+        for user_id, points in [('a', 10), ('b', 8), ('c', 8), ('d', 5), ('e', 1)]:
+            user = CustomUser.objects.create(user_id=user_id, password='x')
+            EventoUserResult.objects.create(user=user, evento=self.evento, total_points=points)
+            self.users.append(user)
+
+    def test_competition_and_dense_ranks_with_ties(self):
+        board = leaderboard.Leaderboard.from_db(self.evento.id)
+        self.assertEqual([e['rank'] for e in board.top(5)], [1, 2, 2, 4, 5])
+        self.assertEqual([e['rank'] for e in board.top(5, ranking=leaderboard.RANKING_DENSE)], [1, 2, 2, 3, 4])
+        self.assertEqual([e['user'] for e in board.top(5)], ['a', 'b', 'c', 'd', 'e'])  # ties by registration
+
+    def test_around_is_clipped_at_both_ends(self):
+        board = leaderboard.Leaderboard.from_db(self.evento.id)
+        self.assertEqual([e['user'] for e in board.around(self.users[0].pk)], ['a', 'b', 'c'])
+        self.assertEqual([e['user'] for e in board.around(self.users[-1].pk)], ['c', 'd', 'e'])
+        self.assertEqual([e['user'] for e in board.around(self.users[2].pk, radius=1)], ['b', 'c', 'd'])
+
+    def test_my_ranking(self):
+        url = reverse('get_my_ranking', args=[self.evento.id])
+        data = self.client.get(url, {'user_id': 'd', 'radius': 1}).json()
+        self.assertEqual((data['rank'], data['points'], data['total_participants']), (4, 5, 5))
+        self.assertEqual([e['user'] for e in data['around']], ['c', 'd', 'e'])
+
+        data = self.client.get(url, {'user_id': 'd', 'ranking': 'dense'}).json()
+        self.assertEqual(data['rank'], 3)
+
+        CustomUser.objects.create(user_id='z', password='x')
+        self.assertEqual(self.client.get(url, {'user_id': 'z'}).status_code, 404)
+
+        Evento.objects.filter(pk=self.evento.pk).update(ranking_visible=False)
+        self.assertEqual(self.client.get(url, {'user_id': 'd'}).status_code, 403)
+
+    def test_change_from_another_worker_forces_a_rebuild(self):
+        board = leaderboard.get_leaderboard(self.evento.id)
+        # Another worker commits +3 for "e" and bumps the version first
+        EventoUserResult.objects.filter(user=self.users[-1]).update(total_points=4)
+        bump_version(leaderboard._version_name(self.evento.id))
+
+        leaderboard.apply_score_change(self.evento.id, deltas={self.users[0].pk: 1})
+        EventoUserResult.objects.filter(user=self.users[0]).update(total_points=11)
+
+        rebuilt = leaderboard.get_leaderboard(self.evento.id)
+        self.assertIsNot(rebuilt, board)
+        self.assertEqual((rebuilt.points(self.users[0].pk), rebuilt.points(self.users[-1].pk)), (11, 4))
+
+    def test_own_change_swaps_in_an_updated_copy(self):
+        board = leaderboard.get_leaderboard(self.evento.id)
+
+        def bump(name):
+            # Readers must not wait on a database write
+            self.assertFalse(leaderboard._lock.locked())
+            return bump_version(name)
+
+        with mock.patch.object(leaderboard, 'bump_version', bump):
+            leaderboard.apply_score_change(self.evento.id, deltas={self.users[-1].pk: 9})
+        with self.assertNumQueries(0):
+            updated = leaderboard.get_leaderboard(self.evento.id)
+        self.assertEqual(updated.rank(self.users[-1].pk), 1)
+        # Readers still holding the old board keep a consistent view
+        self.assertIsNot(updated, board)
+        self.assertEqual(board.rank(self.users[-1].pk), 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.evento = Evento.objects.create(nombre='E', fecha='2025-01-01', ubicacion='X')
+
+    def test_each_update_gets_its_own_id_and_payload(self):
+        realtime.publish_event_update(self.evento.id, {'type': 'result', 'pelea_id': 1})
+        realtime.publish_event_update(self.evento.id, {'type': 'result', 'pelea_id': 2})
+        last = get_version(realtime._stream_version(self.evento.id))
+        self.assertEqual(cache.get(realtime._stream_key(self.evento.id, last - 1))['pelea_id'], 1)
+        self.assertEqual(cache.get(realtime._stream_key(self.evento.id, last))['pelea_id'], 2)
+
+    async def test_out_of_order_live_updates_are_all_sent(self):
+        stream_version = realtime._stream_version(self.evento.id)
+        first = await sync_to_async(bump_version)(stream_version)
+        await cache.aset(realtime._stream_key(self.evento.id, first), {'type': 'result', 'pelea_id': 1})
+
+        stream = realtime.event_stream(self.evento.id, last_id=first - 1)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        self.assertIn(f'id: {first}\n', await anext(stream))  # replayed
+
+        layer = get_channel_layer()
+        group = realtime.evento_group(self.evento.id)
+        for update_id in (first, first + 2, first + 1):
+            await layer.group_send(group, {'type': 'evento.update', 'id': update_id, 'payload': {'type': 'ranks'}})
+        self.assertIn(f'id: {first + 2}\n', await anext(stream))
+        self.assertIn(f'id: {first + 1}\n', await anext(stream))
+        await stream.aclose()
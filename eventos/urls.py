@@ -14,15 +14,19 @@ urlpatterns = [
     path('api/submit-predictions/', views.submit_predictions, name='submit_predictions'),
     path('api/check-participation/', views.check_participation, name='check_participation'),
     path('api/user-results/', views.get_user_results, name='get_user_results'),
+    path('api/events/<int:evento_id>/stream/', views.stream_evento, name='stream_evento'),
     path('eventos/<int:evento_id>/toggle-results/', views.toggle_results_visibility, name='toggle_results'),
     path('api/rankings/<int:evento_id>/', views.get_rankings, name='get_rankings'),
+    path('api/rankings/<int:evento_id>/me/', views.get_my_ranking, name='get_my_ranking'),
     path('api/toggle-ranking/<int:evento_id>/', views.toggle_ranking_visibility, name='toggle_ranking_visibility'),
     path('equipos/<int:evento_id>/', views.gestionar_equipos, name='gestionar_equipos'),
     #path('api/evento/<int:evento_id>/equipo-nombre/', views.get_team_name, name='get_team_name'),
     path('api/evento/<int:evento_id>/equipo-nombre/', views.obtener_nombre_equipo, name='obtener_nombre_equipo'),
     path('api/equipo-nombre/', views.buscar_equipo_global, name='buscar_equipo_global'),
+    path('api/equipo-nombre/batch/', views.buscar_equipos_global, name='buscar_equipos_global'),
     path('eventos/<int:evento_id>/crear-rondas/', views.crear_rondas, name='crear_rondas'),
     path('api/has-submitted-predictions/', views.has_user_submitted_predictions, name='has-submitted-predictions'),
     path('admin/resultados/', views.lista_eventos_resultados, name='lista_eventos_resultados'),
     path('admin/resultados/<int:event_id>/', views.ver_resultados_evento, name='ver_resultados_evento'),
+    path('admin/resultados/<int:event_id>/export.csv', views.exportar_resultados_csv, name='exportar_resultados_csv'),
 ]
\ No newline at end of file
@@ -1,18 +1,35 @@
 import json
 import logging
+from urllib.parse import urlencode
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db import transaction
-from django.db.models import Q, Count, Sum
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch, Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 
+from QuinielaGalleraDash.db import retry_on_locked
 from accounts.models import CustomUser
+from accounts.tokens import InvalidApiToken, aresolve_api_user, resolve_api_user
+from .builder import CardError, build_event, build_round, insert_fights, team_ids
+from .cache import CURRENT_EVENT_VERSION, aget_current_event_snapshot, aget_version, current_event_etag
+from .equipos import (
+    MAX_BATCH_VALORES, aget_current_event_id, aget_team_map, get_current_event_id, get_team_map, parse_valores,
+)
 from .forms import EventoForm, NombreEquipoForm
+from .leaderboard import RANKING_COMPETITION, RANKING_DENSE, aget_leaderboard, get_leaderboard
 from .models import Evento, Ronda, Pelea, Prediccion, NombreEquipo, EventoUserResult
+from .packed import auser_picks, store_picks
+from .realtime import event_stream, publish_result, publish_visibility
+from .reports import build_user_results, fight_stats, iter_event_results_csv
+from .search import parse_date_param, search_eventos
+from .scoring import is_prediction_correct, apply_result_change
+from .signals import send_scores_changed
 
 logger = logging.getLogger('eventos')
 
@@ -26,57 +43,59 @@ def is_admin(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
 
-def normalize_prediction_value(value):
-    """
-    Normalize prediction/result values to handle the mismatch between
-    'empate' (predictions) and 'tie' (results)
-    """
-    if value in ['empate', 'tie']:
-        return 'tie'
-    return value
-
-
-def is_prediction_correct(prediction_value, result_value):
-    """
-    Check if a prediction is correct, handling the empate/tie mismatch
-    """
-    if not result_value:
-        return None  # Result not yet available
-    
-    normalized_prediction = normalize_prediction_value(prediction_value)
-    normalized_result = normalize_prediction_value(result_value)
-    
-    return normalized_prediction == normalized_result
-
-
 # ============================================================================
 # EVENT MANAGEMENT VIEWS
 # ============================================================================
 
-@login_required
-def listar_eventos(request):
-    search_query = request.GET.get('search', '')
-    eventos = Evento.objects.all().order_by('-fecha')
+EVENTOS_POR_PAGINA = 20
 
-    if search_query:
-        eventos = eventos.filter(
-            Q(nombre__icontains=search_query) |
-            Q(fecha__icontains=search_query)
-        )
 
+@login_required
+def listar_eventos(request):
+    search_query = request.GET.get('search', '').strip()
+    desde = parse_date_param(request.GET.get('desde'))
+    hasta = parse_date_param(request.GET.get('hasta'))
+
+    eventos, next_cursor = search_eventos(
+        search_query,
+        desde=desde,
+        hasta=hasta,
+        cursor=request.GET.get('after'),
+        size=EVENTOS_POR_PAGINA,
+    )
+
+    filters = {'search': search_query, 'desde': desde or '', 'hasta': hasta or ''}
     return render(request, 'eventos/listar_eventos.html', {
         'eventos': eventos,
-        'search': search_query
+        'search': search_query,
+        'desde': desde,
+        'hasta': hasta,
+        'filters_query': urlencode({key: value for key, value in filters.items() if value}),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
     })
 
 
 @login_required
 def detalle_evento(request, evento_id):
     evento = get_object_or_404(Evento, id=evento_id)
-    rondas = evento.rondas.all().order_by('numero')
+    rondas = evento.rondas.order_by('numero').prefetch_related(
+        Prefetch('peleas', queryset=Pelea.objects.select_related('equipo1', 'equipo2'))
+    )
     return render(request, 'eventos/detalle_evento.html', {'evento': evento, 'rondas': rondas})
 
 
+# Beyond this many, a card's errors are summarized in one last message
+MAX_REPORTED_CARD_ERRORS = 20
+
+
+def _report_card_errors(request, errors):
+    for error in errors[:MAX_REPORTED_CARD_ERRORS]:
+        messages.error(request, f'❌ {error}')
+    if len(errors) > MAX_REPORTED_CARD_ERRORS:
+        messages.error(request, f'❌ ... y {len(errors) - MAX_REPORTED_CARD_ERRORS} errores más')
+
+
 @login_required
 def crear_evento(request):
     """
@@ -99,69 +118,15 @@ def crear_evento(request):
                 messages.error(request, '❌ Completa todos los campos del evento')
                 return render(request, 'eventos/crear_evento.html')
 
-            if len(teams_data) < 2:
-                messages.error(request, '❌ Debes registrar al menos 2 equipos')
-                return render(request, 'eventos/crear_evento.html')
-
-            if len(fights_data) == 0:
-                messages.error(request, '❌ Debes crear al menos 1 pelea')
-                return render(request, 'eventos/crear_evento.html')
-
-            # Create everything in ONE atomic transaction
-            with transaction.atomic():
-                # 1. Create Event
-                evento = Evento.objects.create(
-                    nombre=nombre,
-                    fecha=fecha_evento,
-                    ubicacion=ubicacion
-                )
-
-                # 2. Create Teams
-                team_map = {}  # Map team numbers to team names
-                for team_data in teams_data:
-                    NombreEquipo.objects.create(
-                        evento=evento,
-                        nombre=team_data['name'],
-                        valor=int(team_data['number'])
-                    )
-                    team_map[team_data['number']] = team_data['name']
-
-                # 3. Group fights by round number
-                fights_by_round = {}
-                for fight_data in fights_data:
-                    round_num = fight_data.get('round_number', 1)
-                    if round_num not in fights_by_round:
-                        fights_by_round[round_num] = []
-                    fights_by_round[round_num].append(fight_data)
-
-                # 4. Create rounds and their fights
-                total_fights_created = 0
-                for round_num in sorted(fights_by_round.keys()):
-                    ronda = Ronda.objects.create(
-                        evento=evento,
-                        numero=round_num
-                    )
-
-                    for fight_data in fights_by_round[round_num]:
-                        team1_number = fight_data['team1']
-                        team2_number = fight_data['team2']
-
-                        equipo1_nombre = team_map.get(team1_number)
-                        equipo2_nombre = team_map.get(team2_number)
-
-                        if not equipo1_nombre or not equipo2_nombre:
-                            raise ValueError(f"Invalid team numbers in fight")
-
-                        Pelea.objects.create(
-                            ronda=ronda,
-                            equipo1=equipo1_nombre,
-                            equipo2=equipo2_nombre
-                        )
-                        total_fights_created += 1
-
-                messages.success(request, f'✅ Evento "{nombre}" creado exitosamente con {len(teams_data)} equipos, {len(fights_by_round)} rondas y {total_fights_created} peleas!')
-                return redirect('detalle_evento', evento_id=evento.id)
+            evento, num_equipos, num_rondas, num_peleas = build_event(
+                nombre, fecha_evento, ubicacion, teams_data, fights_data
+            )
+            messages.success(request, f'✅ Evento "{nombre}" creado exitosamente con {num_equipos} equipos, {num_rondas} rondas y {num_peleas} peleas!')
+            return redirect('detalle_evento', evento_id=evento.id)
 
+        except CardError as e:
+            _report_card_errors(request, e.errors)
+            return render(request, 'eventos/crear_evento.html')
         except json.JSONDecodeError:
             messages.error(request, '❌ Error al procesar los datos. Intenta nuevamente.')
             return render(request, 'eventos/crear_evento.html')
@@ -175,54 +140,68 @@ def crear_evento(request):
     return render(request, 'eventos/crear_evento.html')
 
 
+def _parse_round_fields(post, valores):
+    """
+    Read the equipo{1,2}-round-<ronda>-match-<pelea> fields of the crear_rondas
+    form and check each team number against the registered `valores`.
+    Returns ({ronda: {pelea: (valor1, valor2)}}, [errors]); every problem is
+    reported against its fight, and nothing is written by this function.
+    """
+    fields = {}
+    errors = []
+    for key, value in post.items():
+        if not (key.startswith("equipo1-round-") or key.startswith("equipo2-round-")):
+            continue
+        try:
+            parts = key.split('-')
+            fight = (int(parts[2]), int(parts[4]))
+        except (IndexError, ValueError):
+            logger.error(f"Error processing match key={key}")
+            continue
+        fields.setdefault(fight, {})[parts[0]] = value
+
+    rounds_data = {}
+    for (round_number, match_number), teams in sorted(fields.items()):
+        label = f'Ronda {round_number}, pelea {match_number}'
+        pair = {}
+        for lado in ('equipo1', 'equipo2'):
+            valor_str = teams.get(lado, '').split(':')[0].strip()
+            if not valor_str:
+                errors.append(f'{label}: falta el {lado}')
+                continue
+            try:
+                valor_int = int(valor_str)
+            except ValueError:
+                errors.append(f'{label}: el valor "{valor_str}" del {lado} debe ser numérico')
+                continue
+            if valor_int not in valores:
+                errors.append(f'{label}: equipo con valor {valor_int} no encontrado')
+                continue
+            pair[lado] = valor_int
+
+        if len(pair) == 2:
+            rounds_data.setdefault(round_number, {})[match_number] = (pair['equipo1'], pair['equipo2'])
+
+    return rounds_data, errors
+
+
 @login_required
 def crear_rondas(request, evento_id):
     evento = get_object_or_404(Evento, id=evento_id)
 
     if request.method == "POST":
-        rounds_data = {}
+        equipo_ids = team_ids(evento)
+        rounds_data, errors = _parse_round_fields(request.POST, equipo_ids)
 
-        for key, value in request.POST.items():
-            if key.startswith("equipo1-round-") or key.startswith("equipo2-round-"):
-                try:
-                    parts = key.split('-')
-                    round_number = int(parts[2])
-                    match_number = int(parts[4])
-
-                    if round_number not in rounds_data:
-                        rounds_data[round_number] = {}
-                    if match_number not in rounds_data[round_number]:
-                        rounds_data[round_number][match_number] = {}
-
-                    valor_str = value.split(':')[0].strip()
-                    valor_int = int(valor_str)
-
-                    try:
-                        equipo = NombreEquipo.objects.get(evento_id=evento_id, valor=valor_int)
-                        nombre_equipo = equipo.nombre
-                    except NombreEquipo.DoesNotExist:
-                        messages.error(request, f'Equipo con valor {valor_int} no encontrado')
-                        continue
-
-                    if key.startswith("equipo1-"):
-                        rounds_data[round_number][match_number]['equipo1'] = nombre_equipo
-                    elif key.startswith("equipo2-"):
-                        rounds_data[round_number][match_number]['equipo2'] = nombre_equipo
-
-                except Exception as e:
-                    logger.error(f"Error processing match key={key}: {e}")
-                    continue
-
-        if rounds_data:
-            for round_number, matches in rounds_data.items():
-                ronda, created = Ronda.objects.get_or_create(evento=evento, numero=round_number)
-                for match_number, teams in matches.items():
-                    if 'equipo1' in teams and 'equipo2' in teams:
-                        Pelea.objects.create(
-                            ronda=ronda,
-                            equipo1=teams['equipo1'],
-                            equipo2=teams['equipo2']
-                        )
+        if errors:
+            # Nothing is saved unless the whole card is valid
+            _report_card_errors(request, errors)
+        elif rounds_data:
+            with transaction.atomic():
+                insert_fights(evento, {
+                    round_number: [matches[match_number] for match_number in sorted(matches)]
+                    for round_number, matches in rounds_data.items()
+                }, equipo_ids)
 
             messages.success(request, 'Rondas y peleas creadas exitosamente!')
             return redirect('detalle_evento', evento_id=evento.id)
@@ -249,49 +228,14 @@ def add_round(request, evento_id):
             round_number = int(request.POST.get('round_number', next_round_number))
             fights_data = json.loads(request.POST.get('fights_data', '[]'))
 
-            if len(fights_data) == 0:
-                messages.error(request, '❌ Debes crear al menos 1 pelea')
-                return render(request, 'eventos/crear_ronda.html', {
-                    'evento': evento,
-                    'equipos': equipos,
-                    'next_round_number': next_round_number
-                })
-
-            team_map = {str(equipo.valor): equipo.nombre for equipo in equipos}
+            equipo_ids = {equipo.valor: equipo.id for equipo in equipos}
+            num_peleas = build_round(evento, round_number, fights_data, equipo_ids=equipo_ids)
 
-            with transaction.atomic():
-                if Ronda.objects.filter(evento=evento, numero=round_number).exists():
-                    messages.error(request, f'❌ La ronda {round_number} ya existe')
-                    return render(request, 'eventos/crear_ronda.html', {
-                        'evento': evento,
-                        'equipos': equipos,
-                        'next_round_number': next_round_number
-                    })
-
-                ronda = Ronda.objects.create(
-                    evento=evento,
-                    numero=round_number
-                )
-
-                for fight_data in fights_data:
-                    team1_number = fight_data['team1']
-                    team2_number = fight_data['team2']
-
-                    equipo1_nombre = team_map.get(team1_number)
-                    equipo2_nombre = team_map.get(team2_number)
-
-                    if not equipo1_nombre or not equipo2_nombre:
-                        raise ValueError(f"Invalid team numbers in fight {fight_data['numero_pelea']}")
-
-                    Pelea.objects.create(
-                        ronda=ronda,
-                        equipo1=equipo1_nombre,
-                        equipo2=equipo2_nombre
-                    )
-
-                messages.success(request, f'✅ Ronda {round_number} creada con {len(fights_data)} peleas!')
-                return redirect('detalle_evento', evento_id=evento.id)
+            messages.success(request, f'✅ Ronda {round_number} creada con {num_peleas} peleas!')
+            return redirect('detalle_evento', evento_id=evento.id)
 
+        except CardError as e:
+            _report_card_errors(request, e.errors)
         except json.JSONDecodeError:
             messages.error(request, '❌ Error al procesar los datos')
         except ValueError as e:
@@ -314,8 +258,10 @@ def add_match(request, ronda_id):
     equipos = NombreEquipo.objects.filter(evento=ronda.evento).order_by('valor')
 
     if request.method == "POST":
-        equipo1 = request.POST.get("equipo1")
-        equipo2 = request.POST.get("equipo2")
+        # The form posts team numbers (valor) of the round's event
+        por_valor = {str(equipo.valor): equipo for equipo in equipos}
+        equipo1 = por_valor.get(request.POST.get("equipo1", '').strip())
+        equipo2 = por_valor.get(request.POST.get("equipo2", '').strip())
 
         if equipo1 and equipo2:
             Pelea.objects.create(ronda=ronda, equipo1=equipo1, equipo2=equipo2)
@@ -333,43 +279,20 @@ def add_match(request, ronda_id):
 @login_required
 def update_result(request, pelea_id):
     """
-    FIXED VERSION: Properly updates fight results and recalculates points
+    Updates a fight result and applies only the point delta for that fight
+    to the affected participants (see eventos.scoring.apply_result_change)
     """
-    pelea = get_object_or_404(Pelea, id=pelea_id)
+    pelea = get_object_or_404(Pelea.objects.select_related('ronda', 'equipo1', 'equipo2'), id=pelea_id)
 
     if request.method == "POST":
         resultado = request.POST.get("resultado")
 
         if resultado in ['equipo1', 'equipo2', 'tie']:
-            with transaction.atomic():
-                pelea.resultado = resultado
-                pelea.save()
-
-                evento = pelea.ronda.evento
-                predictions = Prediccion.objects.filter(pelea=pelea)
-                users_to_update = set(pred.user for pred in predictions)
-
-                for user in users_to_update:
-                    user_predictions = Prediccion.objects.filter(
-                        user=user,
-                        pelea__ronda__evento=evento
-                    )
-
-                    # FIXED: Use the new helper function
-                    total_points = sum(
-                        1 for pred in user_predictions
-                        if is_prediction_correct(pred.prediccion, pred.pelea.resultado)
-                    )
-
-                    EventoUserResult.objects.update_or_create(
-                        user=user,
-                        evento=evento,
-                        defaults={'total_points': total_points}
-                    )
-
-                messages.success(request, f'✅ Resultado actualizado correctamente')
-
-            return redirect("detalle_evento", evento_id=pelea.ronda.evento.id)
+            apply_result_change(pelea, resultado)
+            publish_result(pelea, pelea.ronda.evento_id)
+            messages.success(request, f'✅ Resultado actualizado correctamente')
+
+            return redirect("detalle_evento", evento_id=pelea.ronda.evento_id)
         else:
             messages.error(request, '❌ Resultado inválido')
 
@@ -388,9 +311,12 @@ def toggle_event_status(request, evento_id):
                 evento.save()
                 messages.success(request, f'Evento "{evento.nombre}" desactivado')
             else:
-                Evento.objects.filter(current=True).update(current=False)
-                evento.current = True
-                evento.save()
+                # Only one event may be current (evento_single_current), so
+                # demote the previous one in the same transaction
+                with transaction.atomic():
+                    Evento.objects.filter(current=True).update(current=False)
+                    evento.current = True
+                    evento.save()
                 messages.success(request, f'Evento "{evento.nombre}" activado')
 
             return redirect('listar_eventos')
@@ -464,19 +390,18 @@ def obtener_nombre_equipo(request, evento_id):
         return JsonResponse({'error': 'Falta valor'}, status=400)
 
     try:
-        valor_int = int(valor)
-        equipo = NombreEquipo.objects.get(evento_id=evento_id, valor=valor_int)
-        return JsonResponse({'nombre': equipo.nombre}, status=200)
+        nombre = get_team_map(evento_id).get(int(valor))
+        if nombre is None:
+            return JsonResponse({'error': 'Equipo no encontrado'}, status=404)
+        return JsonResponse({'nombre': nombre}, status=200)
     except ValueError:
         return JsonResponse({'error': 'Valor debe ser numérico'}, status=400)
-    except NombreEquipo.DoesNotExist:
-        return JsonResponse({'error': 'Equipo no encontrado'}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @csrf_exempt
-def buscar_equipo_global(request):
+async def buscar_equipo_global(request):
     """Search for team globally (for mobile app)"""
     valor = request.GET.get('valor')
 
@@ -485,71 +410,121 @@ def buscar_equipo_global(request):
 
     try:
         valor_int = int(valor)
-        current_event = Evento.objects.get(current=True)
-        equipo = NombreEquipo.objects.get(evento=current_event, valor=valor_int)
-        return JsonResponse({'nombre': equipo.nombre}, status=200)
+        evento_id = await aget_current_event_id()
+        if evento_id is None:
+            return JsonResponse({'error': 'No hay evento activo'}, status=404)
+        nombre = (await aget_team_map(evento_id)).get(valor_int)
+        if nombre is None:
+            return JsonResponse({'error': 'Equipo no encontrado'}, status=404)
+        return JsonResponse({'nombre': nombre}, status=200)
     except ValueError:
         return JsonResponse({'error': 'Valor debe ser numérico'}, status=400)
-    except Evento.DoesNotExist:
-        return JsonResponse({'error': 'No hay evento activo'}, status=404)
-    except NombreEquipo.DoesNotExist:
-        return JsonResponse({'error': 'Equipo no encontrado'}, status=404)
     except Exception as e:
         logger.error(f"Error in buscar_equipo_global: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-# ============================================================================
-# API ENDPOINTS FOR MOBILE APP
-# ============================================================================
-
 @csrf_exempt
-def get_current_event(request):
-    """Get the currently active event with all its rounds and fights"""
+def buscar_equipos_global(request):
+    """
+    Resolve many team numbers of the current event in one request (for
+    mobile app). GET ?valores=1,2,3 or POST {"valores": [1, 2, 3]}.
+    """
     try:
-        current_event = Evento.objects.get(current=True)
-        rondas = Ronda.objects.filter(evento=current_event).order_by('numero')
-
-        rounds_data = []
-        for ronda in rondas:
-            peleas = Pelea.objects.filter(ronda=ronda)
-            fights_data = [
-                {
-                    'id': pelea.id,
-                    'equipo1': pelea.equipo1,
-                    'equipo2': pelea.equipo2,
-                    'resultado': pelea.resultado if pelea.resultado else None
-                }
-                for pelea in peleas
-            ]
+        if request.method == 'POST':
+            raw = json.loads(request.body).get('valores')
+        else:
+            raw = request.GET.get('valores')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    if not raw:
+        return JsonResponse({'error': 'Falta valores'}, status=400)
+
+    try:
+        valores = parse_valores(raw)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Valores deben ser numéricos'}, status=400)
+
+    if len(valores) > MAX_BATCH_VALORES:
+        return JsonResponse({'error': f'Máximo {MAX_BATCH_VALORES} valores por consulta'}, status=400)
 
-            rounds_data.append({
-                'id': ronda.id,
-                'numero': ronda.numero,
-                'peleas': fights_data
-            })
+    try:
+        evento_id = get_current_event_id()
+        if evento_id is None:
+            return JsonResponse({'error': 'No hay evento activo'}, status=404)
 
+        team_map = get_team_map(evento_id)
         return JsonResponse({
-            'id': current_event.id,
-            'nombre': current_event.nombre,
-            'fecha': str(current_event.fecha),
-            'ubicacion': current_event.ubicacion,
-            'rondas': rounds_data,
-            'results_visible': current_event.results_visible,
-            'ranking_visible': current_event.ranking_visible
+            'evento_id': evento_id,
+            'nombres': {str(valor): team_map[valor] for valor in valores if valor in team_map},
+            'no_encontrados': [valor for valor in valores if valor not in team_map],
         }, status=200)
+    except Exception as e:
+        logger.error(f"Error in buscar_equipos_global: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+# ============================================================================
+# API ENDPOINTS FOR MOBILE APP
+# ============================================================================
+# The read endpoints the app polls (current event, rankings, results,
+# participation, team lookup) are async views. Under ASGI a worker keeps
+# serving other requests while they wait on the database or the cache;
+# under WSGI Django runs each one in its own event loop, so they still work.
+
+@csrf_exempt
+async def get_current_event(request):
+    """
+    Get the currently active event with all its rounds and fights.
+    Served from a cached, versioned snapshot; clients sending a matching
+    If-None-Match get a 304 without touching the database.
+    """
+    try:
+        # The ETag and the body come from the same version read
+        version = await aget_version(CURRENT_EVENT_VERSION)
+        etag = current_event_etag(version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            status, body = await aget_current_event_snapshot(version)
+            response = HttpResponse(body, status=status, content_type='application/json')
+            patch_cache_control(response, no_cache=True)
+        response['ETag'] = etag
+        return response
 
-    except Evento.DoesNotExist:
-        return JsonResponse({'error': 'No hay evento activo'}, status=404)
     except Exception as e:
         logger.error(f"Error getting current event: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@retry_on_locked()
+def _save_predictions(predicciones, posiciones, participation, total_points):
+    """
+    Write a submission. Returns False, writing nothing, if the user already
+    submitted picks for the event. The check runs inside the write
+    transaction with the participation row locked, so two concurrent
+    submissions can't both pass it; the unique (user, pelea) constraint
+    backs it up.
+    """
+    with transaction.atomic():
+        EventoUserResult.objects.select_for_update().filter(pk=participation.pk).exists()
+        if Prediccion.objects.filter(evento_id=participation.evento_id, user_id=participation.user_id).exists():
+            return False
+
+        Prediccion.objects.bulk_create(predicciones)
+        store_picks(participation.user_id, participation.evento_id, {
+            posiciones[pred.pelea_id]: pred.prediccion for pred in predicciones
+        })
+        EventoUserResult.objects.filter(pk=participation.pk).update(total_points=total_points)
+        send_scores_changed(participation.evento_id, totals={participation.user_id: total_points})
+    return True
+
+
 @csrf_exempt
 def submit_predictions(request):
     """
     Submit predictions for an event - ONE TIME ONLY
+    Runs a constant number of queries regardless of how many fights are picked.
     """
     if request.method == "POST":
         try:
@@ -558,13 +533,14 @@ def submit_predictions(request):
             event_id = data.get('event_id')
             predictions_data = data.get('predictions', [])
 
-            if not all([user_id, event_id]):
+            user = resolve_api_user(request, user_id)
+
+            if not all([user, event_id]):
                 return JsonResponse({'error': 'Datos incompletos'}, status=400)
 
             if not predictions_data or not isinstance(predictions_data, list):
                 return JsonResponse({'error': 'Debe enviar al menos una predicción'}, status=400)
 
-            user = CustomUser.objects.get(user_id=user_id)
             evento = Evento.objects.get(id=event_id, current=True)
 
             participation = EventoUserResult.objects.filter(
@@ -577,50 +553,49 @@ def submit_predictions(request):
                     'error': 'Debes participar en el evento primero. Usa un ticket para participar.'
                 }, status=403)
 
-            existing_predictions = Prediccion.objects.filter(
-                user=user,
-                pelea__ronda__evento=evento
-            ).exists()
+            # Keep one valid pick per fight (the last one sent wins)
+            picks = {}
+            for pred_data in predictions_data:
+                prediccion = pred_data.get('prediccion')
+                if prediccion not in ['equipo1', 'equipo2', 'empate']:
+                    continue
+                try:
+                    picks[int(pred_data.get('pelea_id'))] = prediccion
+                except (TypeError, ValueError):
+                    continue
 
-            if existing_predictions:
+            # One lookup for every fight referenced by the submission
+            peleas = {}
+            posiciones = {}
+            for pelea_id, resultado, posicion in Pelea.objects.filter(
+                id__in=list(picks),
+                ronda__evento=evento
+            ).values_list('id', 'resultado', 'posicion'):
+                peleas[pelea_id] = resultado
+                posiciones[pelea_id] = posicion
+
+            nuevas_predicciones = [
+                Prediccion(user=user, pelea_id=pelea_id, evento=evento, prediccion=prediccion)
+                for pelea_id, prediccion in picks.items()
+                if pelea_id in peleas
+            ]
+            saved_count = len(nuevas_predicciones)
+
+            # Score against the in-memory fight map instead of re-reading the rows
+            total_points = sum(
+                1 for pred in nuevas_predicciones
+                if is_prediction_correct(pred.prediccion, peleas[pred.pelea_id])
+            )
+
+            try:
+                saved = _save_predictions(nuevas_predicciones, posiciones, participation, total_points)
+            except IntegrityError:
+                saved = False
+            if not saved:
                 return JsonResponse({
                     'error': 'Ya has enviado tus predicciones para este evento. No puedes modificarlas.'
                 }, status=400)
 
-            saved_count = 0
-            with transaction.atomic():
-                for pred_data in predictions_data:
-                    pelea_id = pred_data.get('pelea_id')
-                    prediccion = pred_data.get('prediccion')
-
-                    if prediccion not in ['equipo1', 'equipo2', 'empate']:
-                        continue
-
-                    try:
-                        pelea = Pelea.objects.get(id=pelea_id, ronda__evento=evento)
-                        Prediccion.objects.create(
-                            user=user,
-                            pelea=pelea,
-                            prediccion=prediccion
-                        )
-                        saved_count += 1
-                    except Pelea.DoesNotExist:
-                        continue
-
-                # FIXED: Calculate points with proper empate/tie handling
-                total_points = 0
-                user_predictions = Prediccion.objects.filter(
-                    user=user,
-                    pelea__ronda__evento=evento
-                )
-
-                for pred in user_predictions:
-                    if is_prediction_correct(pred.prediccion, pred.pelea.resultado):
-                        total_points += 1
-
-                participation.total_points = total_points
-                participation.save()
-
             return JsonResponse({
                 'success': True,
                 'message': f'{saved_count} predicciones guardadas exitosamente',
@@ -630,6 +605,8 @@ def submit_predictions(request):
 
         except CustomUser.DoesNotExist:
             return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+        except InvalidApiToken:
+            return JsonResponse({'error': 'Token inválido'}, status=401)
         except Evento.DoesNotExist:
             return JsonResponse({'error': 'Evento no encontrado o no está activo'}, status=404)
         except Exception as e:
@@ -640,22 +617,26 @@ def submit_predictions(request):
 
 
 @csrf_exempt
-def check_participation(request):
+async def check_participation(request):
     """Check if a user has already participated in an event"""
     try:
         user_id = request.GET.get('user_id')
         event_id = request.GET.get('event_id')
 
-        if not user_id or not event_id:
+        user = await aresolve_api_user(request, user_id)
+
+        if not user or not event_id:
             return JsonResponse({'error': 'Faltan parámetros'}, status=400)
 
-        user = CustomUser.objects.get(user_id=user_id)
-        evento = Evento.objects.get(id=event_id)
+        evento = await Evento.objects.aget(id=event_id)
 
-        participated = EventoUserResult.objects.filter(
+        participated = await EventoUserResult.objects.filter(
             user=user,
             evento=evento
-        ).exists()
+        ).aexists()
+
+        if 'event_tickets' in user.get_deferred_fields():
+            await user.arefresh_from_db(fields=['event_tickets'])
 
         return JsonResponse({
             'participated': participated,
@@ -666,6 +647,8 @@ def check_participation(request):
 
     except CustomUser.DoesNotExist:
         return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+    except InvalidApiToken:
+        return JsonResponse({'error': 'Token inválido'}, status=401)
     except Evento.DoesNotExist:
         return JsonResponse({'error': 'Evento no encontrado'}, status=404)
     except Exception as e:
@@ -680,10 +663,11 @@ def get_user_predictions(request):
             user_id = request.GET.get('user_id')
             event_id = request.GET.get('event_id')
 
-            if not user_id or not event_id:
+            user = resolve_api_user(request, user_id)
+
+            if not user or not event_id:
                 return JsonResponse({'error': 'Faltan parámetros'}, status=400)
 
-            user = CustomUser.objects.get(user_id=user_id)
             evento = Evento.objects.get(id=event_id)
 
             participated = EventoUserResult.objects.filter(user=user, evento=evento).exists()
@@ -695,6 +679,8 @@ def get_user_predictions(request):
 
         except CustomUser.DoesNotExist:
             return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+        except InvalidApiToken:
+            return JsonResponse({'error': 'Token inválido'}, status=401)
         except Evento.DoesNotExist:
             return JsonResponse({'error': 'Evento no encontrado'}, status=404)
         except Exception as e:
@@ -704,33 +690,36 @@ def get_user_predictions(request):
 
 
 @csrf_exempt
-def get_user_results(request):
+async def get_user_results(request):
     try:
         user_id = request.GET.get('user_id')
 
-        if not user_id:
+        user = await aresolve_api_user(request, user_id)
+
+        if not user:
             return JsonResponse({'error': 'Falta user_id'}, status=400)
 
-        user = CustomUser.objects.get(user_id=user_id)
-        current_event = Evento.objects.get(current=True)
+        current_event = await Evento.objects.aget(current=True)
 
         prediction_results = []
         total_points = 0
 
         if current_event.results_visible:
-            predictions = Prediccion.objects.filter(
-                user=user,
-                pelea__ronda__evento=current_event
-            ).select_related('pelea')
-
-            for pred in predictions:
-                is_correct = is_prediction_correct(pred.prediccion, pred.pelea.resultado)
+            # All the user's picks come from one packed row
+            picks = await auser_picks(user.pk, current_event.id)
+            peleas = Pelea.objects.filter(
+                ronda__evento=current_event,
+                posicion__in=list(picks)
+            ).order_by('posicion').values_list('id', 'posicion', 'equipo1__nombre', 'equipo2__nombre', 'resultado')
+
+            async for pelea_id, posicion, equipo1, equipo2, resultado in peleas:
+                is_correct = is_prediction_correct(picks[posicion], resultado)
                 prediction_results.append({
-                    'pelea_id': pred.pelea.id,
-                    'equipo1': pred.pelea.equipo1,
-                    'equipo2': pred.pelea.equipo2,
-                    'prediccion': pred.prediccion,
-                    'resultado': pred.pelea.resultado,
+                    'pelea_id': pelea_id,
+                    'equipo1': equipo1,
+                    'equipo2': equipo2,
+                    'prediccion': picks[posicion],
+                    'resultado': resultado,
                     'correct': is_correct,
                 })
                 if is_correct:
@@ -744,6 +733,8 @@ def get_user_results(request):
 
     except CustomUser.DoesNotExist:
         return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+    except InvalidApiToken:
+        return JsonResponse({'error': 'Token inválido'}, status=401)
     except Evento.DoesNotExist:
         return JsonResponse({'error': 'No hay evento activo'}, status=404)
     except Exception as e:
@@ -751,6 +742,27 @@ def get_user_results(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+async def stream_evento(request, evento_id):
+    """
+    Server-Sent Events stream of an event's updates (fight results, rank
+    changes, visibility flags). Async so one worker can hold thousands of
+    idle connections; supports resuming with the Last-Event-ID header.
+    """
+    if not await Evento.objects.filter(id=evento_id).aexists():
+        return JsonResponse({'error': 'Evento no encontrado'}, status=404)
+
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    response = StreamingHttpResponse(event_stream(evento_id, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+
 @csrf_exempt
 def toggle_results_visibility(request, evento_id):
     if request.method in ['GET', 'POST']:
@@ -758,6 +770,7 @@ def toggle_results_visibility(request, evento_id):
             evento = Evento.objects.get(id=evento_id)
             evento.results_visible = not evento.results_visible
             evento.save()
+            publish_visibility(evento)
 
             status = "visibles" if evento.results_visible else "ocultos"
             messages.success(request, f'Resultados {status} para "{evento.nombre}"')
@@ -773,23 +786,20 @@ def toggle_results_visibility(request, evento_id):
     return JsonResponse({'error': 'Método inválido'}, status=405)
 
 
+def _ranking_mode(request):
+    return RANKING_DENSE if request.GET.get('ranking') == RANKING_DENSE else RANKING_COMPETITION
+
+
 @csrf_exempt
-def get_rankings(request, evento_id):
+async def get_rankings(request, evento_id):
     try:
-        evento = Evento.objects.get(id=evento_id)
+        evento = await Evento.objects.aget(id=evento_id)
 
         if not evento.ranking_visible:
             return JsonResponse({'error': 'Ranking actualmente oculto'}, status=403)
 
-        results = EventoUserResult.objects.filter(evento=evento).order_by('-total_points')[:10]
-        rankings = [
-            {
-                'user': result.user.user_id,
-                'nombre': f"{result.user.nombre or ''} {result.user.apellido or ''}".strip() or result.user.user_id,
-                'points': result.total_points
-            }
-            for result in results
-        ]
+        board = await aget_leaderboard(evento.id)
+        rankings = await board.atop(10, ranking=_ranking_mode(request))
 
         return JsonResponse({'rankings': rankings}, status=200)
 
@@ -800,6 +810,52 @@ def get_rankings(request, evento_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+def get_my_ranking(request, evento_id):
+    """Rank, points and nearby participants for one user"""
+    try:
+        user_id = request.GET.get('user_id')
+
+        user = resolve_api_user(request, user_id)
+
+        if not user:
+            return JsonResponse({'error': 'Falta user_id'}, status=400)
+
+        try:
+            radius = min(max(int(request.GET.get('radius', 2)), 0), 25)
+        except ValueError:
+            return JsonResponse({'error': 'radius debe ser numérico'}, status=400)
+
+        evento = Evento.objects.get(id=evento_id)
+
+        if not evento.ranking_visible:
+            return JsonResponse({'error': 'Ranking actualmente oculto'}, status=403)
+
+        user_pk = user.pk
+        board = get_leaderboard(evento.id)
+
+        if user_pk not in board:
+            return JsonResponse({'error': 'No participas en este evento'}, status=404)
+
+        ranking = _ranking_mode(request)
+        return JsonResponse({
+            'rank': board.rank(user_pk, ranking=ranking),
+            'points': board.points(user_pk),
+            'total_participants': len(board),
+            'around': board.around(user_pk, radius=radius, ranking=ranking),
+        }, status=200)
+
+    except CustomUser.DoesNotExist:
+        return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+    except InvalidApiToken:
+        return JsonResponse({'error': 'Token inválido'}, status=401)
+    except Evento.DoesNotExist:
+        return JsonResponse({'error': 'Evento no encontrado'}, status=404)
+    except Exception as e:
+        logger.error(f"Error getting user ranking: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 def toggle_ranking_visibility(request, evento_id):
     if request.method in ['GET', 'POST']:
@@ -807,6 +863,7 @@ def toggle_ranking_visibility(request, evento_id):
             evento = Evento.objects.get(id=evento_id)
             evento.ranking_visible = not evento.ranking_visible
             evento.save()
+            publish_visibility(evento)
 
             return JsonResponse({
                 'message': 'Visibilidad del ranking actualizada',
@@ -827,15 +884,16 @@ def has_user_submitted_predictions(request):
         user_id = request.GET.get('user_id')
         event_id = request.GET.get('event_id')
 
-        if not user_id or not event_id:
+        user = resolve_api_user(request, user_id)
+
+        if not user or not event_id:
             return JsonResponse({'error': 'Faltan parámetros'}, status=400)
 
-        user = CustomUser.objects.get(user_id=user_id)
         evento = Evento.objects.get(id=event_id)
 
         has_predictions = Prediccion.objects.filter(
-            user=user,
-            pelea__ronda__evento=evento
+            evento=evento,
+            user=user
         ).exists()
 
         return JsonResponse({
@@ -846,6 +904,8 @@ def has_user_submitted_predictions(request):
 
     except CustomUser.DoesNotExist:
         return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+    except InvalidApiToken:
+        return JsonResponse({'error': 'Token inválido'}, status=401)
     except Evento.DoesNotExist:
         return JsonResponse({'error': 'Evento no encontrado'}, status=404)
     except Exception as e:
@@ -874,11 +934,15 @@ def lista_eventos_resultados(request):
     return render(request, 'eventos/lista_eventos_resultados.html', context)
 
 
+RESULTADOS_POR_PAGINA = 25
+
+
 @user_passes_test(is_admin)
 def ver_resultados_evento(request, event_id):
     """
-    FIXED VERSION: View all user results for a specific event
-    Shows detailed predictions and scores for each participant
+    View all user results for a specific event, one page of participants at a time.
+    Shows detailed predictions and scores for each participant; statistics
+    come from SQL aggregates and the page is built with a fixed number of queries.
     """
     evento = get_object_or_404(Evento, id=event_id)
 
@@ -887,71 +951,30 @@ def ver_resultados_evento(request, event_id):
         evento=evento
     ).select_related('user').order_by('-total_points', 'user__user_id')
 
-    # Prepare data for each participant
-    resultados_usuarios = []
-
-    for participacion in participaciones:
-        # Get all predictions for this user in this event
-        predicciones = Prediccion.objects.filter(
-            user=participacion.user,
-            pelea__ronda__evento=evento
-        ).select_related('pelea', 'pelea__ronda').order_by('pelea__ronda__numero', 'pelea__id')
-
-        # Build prediction details
-        predicciones_detalle = []
-        correctas = 0
-        incorrectas = 0
-        pendientes = 0
-
-        for pred in predicciones:
-            pelea = pred.pelea
-
-            # FIXED: Use the helper function to check correctness
-            es_correcta = is_prediction_correct(pred.prediccion, pelea.resultado)
-            
-            if es_correcta is True:
-                correctas += 1
-            elif es_correcta is False:
-                incorrectas += 1
-            else:
-                pendientes += 1
-
-            predicciones_detalle.append({
-                'pelea': pelea,
-                'prediccion': pred.prediccion,
-                'es_correcta': es_correcta,
-                'resultado_real': pelea.resultado,
-            })
-
-        # Calculate accuracy
-        total_con_resultado = correctas + incorrectas
-        precision = (correctas / total_con_resultado * 100) if total_con_resultado > 0 else 0
-
-        resultados_usuarios.append({
-            'user': participacion.user,
-            'total_points': participacion.total_points,
-            'predicciones': predicciones_detalle,
-            'correctas': correctas,
-            'incorrectas': incorrectas,
-            'pendientes': pendientes,
-            'precision': round(precision, 1),
-            'total_predicciones': len(predicciones_detalle),
-        })
+    paginator = Paginator(participaciones, RESULTADOS_POR_PAGINA)
+    page = paginator.get_page(request.GET.get('page'))
 
-    # Get event statistics
-    total_participantes = participaciones.count()
-    total_peleas = Pelea.objects.filter(ronda__evento=evento).count()
-    peleas_resueltas = Pelea.objects.filter(
-        ronda__evento=evento
-    ).exclude(resultado__isnull=True).exclude(resultado='').count()
+    resultados_usuarios = build_user_results(evento, page.object_list)
 
     context = {
         'evento': evento,
         'resultados_usuarios': resultados_usuarios,
-        'total_participantes': total_participantes,
-        'total_peleas': total_peleas,
-        'peleas_resueltas': peleas_resueltas,
-        'peleas_pendientes': total_peleas - peleas_resueltas,
+        'page': page,
+        'total_participantes': paginator.count,
+        **fight_stats(evento),
     }
 
-    return render(request, 'eventos/ver_resultados_evento.html', context)
\ No newline at end of file
+    return render(request, 'eventos/ver_resultados_evento.html', context)
+
+
+@user_passes_test(is_admin)
+def exportar_resultados_csv(request, event_id):
+    """Stream every participant's predictions for an event as CSV"""
+    evento = get_object_or_404(Evento, id=event_id)
+
+    response = StreamingHttpResponse(
+        iter_event_results_csv(evento),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="resultados_evento_{evento.id}.csv"'
+    return response